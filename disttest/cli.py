@@ -7,11 +7,15 @@ import argparse
 import importlib
 import os
 import sys
-from typing import List, Type
+from typing import List, Tuple, Type
 
-from .core import TestCase
-from .runner import TestRunner
-from .plugins import HTMLReportPlugin, ConsoleReporterPlugin, JSONLoggerPlugin
+from .core import TestCase, HistoryStore, RegressionDetector, Selection
+from .core.capture import DEFAULT_CAPTURE_LIMIT, CapturePolicy
+from .core.discovery import (DEFAULT_PATTERNS, PARALLEL_IMPORT_THRESHOLD, TestIndex,
+                             import_in_subprocesses)
+from .runner import TestRunner, WorkerPolicy, RemoteWorker, AutoscalePolicy, PlacementPolicy
+from .plugins import (HTMLReportPlugin, ConsoleReporterPlugin, JSONLoggerPlugin, MetricsExporterPlugin,
+                      TraceExportPlugin, HistoryRecorderPlugin)
 
 
 def import_test_case(module_path: str) -> List[Type[TestCase]]:
@@ -38,64 +42,394 @@ def import_test_case(module_path: str) -> List[Type[TestCase]]:
         sys.exit(1)
 
 
+def history_main(argv: List[str]) -> None:
+    """disttest history 子命令: 查询执行历史数据库
+    
+    Args:
+        argv: 子命令参数
+    """
+    parser = argparse.ArgumentParser(prog="disttest history", description="查询测试执行历史")
+    parser.add_argument("--db", default=HistoryStore.DEFAULT_PATH,
+                        help=f"历史数据库路径 [默认: {HistoryStore.DEFAULT_PATH}]")
+    subparsers = parser.add_subparsers(dest="query", required=True)
+    
+    runs_parser = subparsers.add_parser("runs", help="最近的执行记录")
+    runs_parser.add_argument("--limit", type=int, default=20, help="显示条数 [默认: 20]")
+    
+    trend_parser = subparsers.add_parser("trend", help="单个测试的耗时趋势")
+    trend_parser.add_argument("test_name", help="测试ID (模块.类名.方法名)")
+    trend_parser.add_argument("--limit", type=int, default=50, help="最近执行次数 [默认: 50]")
+    
+    failures_parser = subparsers.add_parser("failures", help="失败率最高的测试")
+    flaky_parser = subparsers.add_parser("flaky", help="结果不稳定的测试")
+    baseline_parser = subparsers.add_parser("baseline", help="管理命名性能基线")
+    baseline_parser.add_argument("action", choices=["save", "list"], help="save: 保存基线, list: 列出基线")
+    baseline_parser.add_argument("name", nargs="?", help="基线名称 (save时必填)")
+    baseline_parser.add_argument("--last", type=int, default=10, help="使用最近N次执行计算基线 [默认: 10]")
+    
+    for sub_parser in (failures_parser, flaky_parser):
+        sub_parser.add_argument("--last", type=int, default=50, help="只统计最近N次执行 [默认: 50]")
+        sub_parser.add_argument("--top", type=int, default=20, help="显示条数 [默认: 20]")
+        sub_parser.add_argument("--min-runs", type=int, default=2, help="最少执行次数 [默认: 2]")
+    
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        print(f"错误: 历史数据库不存在: {args.db}")
+        sys.exit(1)
+    
+    with HistoryStore(args.db) as store:
+        if args.query == "runs":
+            print(f"{'批次':>6}  {'开始时间':<19}  {'模式':<11} {'总数':>6} {'通过':>6} {'失败':>6} {'耗时(秒)':>9}")
+            for run in store.list_runs(args.limit):
+                print(f"{run['run_id']:>6}  {store.format_time(run['started_at']):<19}  {run['mode']:<11} "
+                      f"{run['total']:>6} {run['passed']:>6} {run['failed']:>6} {run['duration']:>9.2f}")
+        elif args.query == "trend":
+            trend = store.duration_trend(args.test_name, args.limit)
+            if not trend:
+                print(f"没有找到测试 {args.test_name} 的执行记录")
+                return
+            longest = max(row["duration"] for row in trend) or 1.0
+            for row in trend:
+                bar = "█" * max(1, int(row["duration"] / longest * 40))
+                status = "通过" if row["success"] else "失败"
+                print(f"#{row['run_id']:<6} {store.format_time(row['started_at'])}  {status}  "
+                      f"{row['duration']:>9.4f}s  {bar}")
+            durations = sorted(row["duration"] for row in trend)
+            print(f"共 {len(trend)} 次, 最短: {durations[0]:.4f}s, 中位数: {durations[len(durations) // 2]:.4f}s, "
+                  f"最长: {durations[-1]:.4f}s")
+        elif args.query == "baseline":
+            if args.action == "list":
+                for baseline in store.list_baselines():
+                    print(f"{baseline['name']:<20} {baseline['tests']:>6} 个测试  "
+                          f"保存于 {store.format_time(baseline['created_at'])}")
+                return
+            if not args.name:
+                parser.error("保存基线时需要指定基线名称")
+            baseline = {test_name: (*RegressionDetector.summarize(durations), len(durations))
+                        for test_name, durations in store.recent_durations(args.last).items()}
+            store.save_baseline(args.name, baseline)
+            print(f"基线 {args.name} 已保存: {len(baseline)} 个测试, 基于最近 {args.last} 次执行")
+        elif args.query == "failures":
+            for row in store.failure_rates(args.last, args.top, args.min_runs):
+                print(f"{row['failure_rate'] * 100:>6.1f}%  {row['failures']:>5}/{row['runs']:<5} "
+                      f"平均耗时: {row['avg_duration']:.4f}s  {row['test_name']}")
+        else:
+            for row in store.flaky_tests(args.last, args.top, args.min_runs):
+                print(f"不稳定度: {row['flakiness']:.2f}  翻转: {row['flips']:>4}  "
+                      f"失败: {row['failures']:>4}/{row['runs']:<5} {row['test_name']}")
+
+
+def _parse_address(address: str) -> Tuple[str, int]:
+    """解析 HOST:PORT 形式的地址"""
+    host, separator, port = address.rpartition(":")
+    if not separator or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"地址格式应为 HOST:PORT: {address}")
+    return host or "0.0.0.0", int(port)
+
+
+def worker_main(argv: List[str]) -> None:
+    """disttest worker 子命令: 作为远程工作者连接主控节点并执行派发的测试
+    
+    Args:
+        argv: 子命令参数
+    """
+    parser = argparse.ArgumentParser(prog="disttest worker", description="连接主控节点执行测试")
+    parser.add_argument("address", type=_parse_address, help="主控节点地址 HOST:PORT")
+    parser.add_argument("--id", default=None, help="工作者ID [默认: 主机名和进程号]")
+    parser.add_argument("--path", action="append", default=[],
+                        help="导入测试模块前加入 sys.path 的目录，可重复指定")
+    parser.add_argument("--capture", choices=CapturePolicy.MODES, default="failures",
+                        help="测试输出的捕获方式，同主命令的 --capture [默认: failures]")
+    args = parser.parse_args(argv)
+    
+    for path in reversed(args.path):
+        sys.path.insert(0, os.path.abspath(path))
+    host, port = args.address
+    worker = RemoteWorker(host, port, worker_id=args.id, capture=CapturePolicy(args.capture))
+    print(f"工作者 {worker.worker_id} 连接主控节点 {host}:{port}")
+    try:
+        units = worker.run()
+    except OSError as e:
+        print(f"错误: 无法连接主控节点 {host}:{port}: {e}")
+        sys.exit(1)
+    print(f"工作者 {worker.worker_id} 退出，共执行 {units} 个工作单元")
+
+
 def main():
     """命令行工具入口点"""
+    if len(sys.argv) > 1 and sys.argv[1] == "history":
+        history_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "selfbench":
+        from .selfbench import main as selfbench_main
+        selfbench_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        worker_main(sys.argv[2:])
+        return
+    
     parser = argparse.ArgumentParser(description="分布式测试框架命令行工具")
-    parser.add_argument("test_modules", nargs="+", help="测试模块路径列表 (例如: path.to.module)")
-    parser.add_argument("--mode", choices=["local", "distributed"], default="local",
-                        help="运行模式: local (本地) 或 distributed (分布式) [默认: local]")
+    parser.add_argument("test_modules", nargs="+",
+                        help="测试模块、目录、源文件或通配符 (例如: path.to.module、tests/、"
+                             "\"tests/**/test_*.py\")")
+    parser.add_argument("--pattern", action="append", default=None,
+                        help=f"遍历目录时匹配的测试文件名，可重复指定 [默认: {', '.join(DEFAULT_PATTERNS)}]")
+    parser.add_argument("--import-workers", type=int, default=None,
+                        help="并行解析和导入测试模块的子进程数，为1时在主进程中串行导入 [默认: CPU核数]")
+    parser.add_argument("-k", dest="keyword", default=None,
+                        help="只执行测试ID (模块.类名.方法名) 匹配关键字表达式的测试，"
+                             "例如: -k \"login and not slow\"")
+    parser.add_argument("-m", dest="marks", default=None,
+                        help="只执行标记匹配表达式的测试 (标记由 @mark 添加)，例如: -m \"db and not slow\"")
+    parser.add_argument("--mode", choices=["local", "distributed", "remote"], default="local",
+                        help="运行模式: local (本地)、distributed (分布式) 或 remote (远程工作者，"
+                             "工作者通过 disttest worker 连接) [默认: local]")
     parser.add_argument("--nodes", type=int, default=3, 
                         help="分布式模式下的节点数量 [默认: 3]")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread",
+                        help="分布式模式下的执行后端: thread (线程) 或 process (子进程) [默认: thread]")
+    parser.add_argument("--transport", choices=["pipe", "shm", "wire"], default="pipe",
+                        help="process后端的结果通道: pipe (管道)、shm (共享内存环形缓冲区) 或 wire (二进制消息格式) [默认: pipe]")
+    parser.add_argument("--max-tests-per-worker", type=int, default=None,
+                        help="单个工作者最多执行的测试用例数，超过后回收工作者")
+    parser.add_argument("--max-worker-rss", type=float, default=None,
+                        help="工作进程常驻内存上限(MB)，超过后回收工作者 (仅process后端)")
+    parser.add_argument("--max-worker-age", type=float, default=None,
+                        help="工作者最长存活时间(秒)，超过后回收工作者")
+    parser.add_argument("--node-cpu", type=float, default=None,
+                        help="每个节点的CPU容量，节点在容量范围内并发执行多个工作单元 [默认: 1]")
+    parser.add_argument("--node-memory", type=float, default=None,
+                        help="每个节点的内存容量(MB) [默认: 不限制]")
+    parser.add_argument("--autoscale", action="store_true",
+                        help="分布式模式下根据队列深度和主机负载自动调整并发的工作者数量，忽略 --nodes")
+    parser.add_argument("--min-nodes", type=int, default=1,
+                        help="自动伸缩的最少工作者数量 [默认: 1]")
+    parser.add_argument("--max-nodes", type=int, default=None,
+                        help="自动伸缩的最多工作者数量 [默认: CPU核数]")
+    parser.add_argument("--target-load", type=float, default=1.0,
+                        help="自动伸缩时每个CPU核的目标负载，主机负载超过该值时不再增加工作者 [默认: 1.0]")
+    parser.add_argument("--speculative", action="store_true",
+                        help="分布式模式下，队列为空后由有剩余容量的节点为执行时间明显偏长的、标记为 idempotent 的"
+                             "测试用例类启动副本，先完成的一份生效")
+    parser.add_argument("--speculate-after", type=float, default=1.0,
+                        help="推测执行的最短执行时间(秒)，执行时间还需超过已完成测试用例类耗时中位数的2倍 [默认: 1.0]")
+    parser.add_argument("--pin-cpus", action="store_true",
+                        help="把每个工作进程绑定到固定的CPU核心，工作进程分散到各个CPU插槽 (仅process后端)")
+    parser.add_argument("--cores-per-worker", type=int, default=1,
+                        help="--pin-cpus 时每个工作进程绑定的核心数 [默认: 1]")
+    parser.add_argument("--benchmark-cores", type=int, default=0,
+                        help="--pin-cpus 时为基准测试保留的核心数，优先使用内核隔离 (isolcpus) 的核心，"
+                             "普通测试不使用这些核心 [默认: 0]")
+    parser.add_argument("--listen", type=_parse_address, default=("0.0.0.0", 7480),
+                        help="remote模式下主控节点的监听地址 HOST:PORT [默认: 0.0.0.0:7480]")
+    parser.add_argument("--min-workers", type=int, default=1,
+                        help="remote模式下开始派发前需要连接的工作者数量 [默认: 1]")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="执行过程中把已完成的测试结果写入执行日志，中断后可用 --resume 继续")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="执行日志目录 [默认: .disttest/runs]")
+    parser.add_argument("--resume", metavar="RUN_ID", default=None,
+                        help="从指定执行的日志恢复已完成的结果，只执行剩余的测试 (需要加载相同的测试模块)")
     parser.add_argument("--verbose", "-v", action="store_true", 
                         help="显示详细输出")
+    parser.add_argument("--capture", choices=CapturePolicy.MODES, default="failures",
+                        help="测试输出 (print、标准错误和日志) 的捕获方式: failures (捕获并只为失败的测试保留)、"
+                             "all (为所有测试保留) 或 off (不捕获，直接输出) [默认: failures]")
+    parser.add_argument("--capture-limit", type=int, default=DEFAULT_CAPTURE_LIMIT,
+                        help=f"每个测试每个输出流保留的最大字符数，超出时只保留末尾 [默认: {DEFAULT_CAPTURE_LIMIT}]")
     parser.add_argument("--html-report", action="store_true", 
                         help="生成HTML报告")
+    parser.add_argument("--html-report-mode", choices=["single", "paged"], default="single",
+                        help="HTML报告模式: single (单页) 或 paged (分页按需加载，适合大量结果) [默认: single]")
+    parser.add_argument("--report-page-size", type=int, default=500,
+                        help="paged模式下每个数据文件包含的测试结果数 [默认: 500]")
     parser.add_argument("--report-dir", default="reports", 
                         help="报告输出目录 [默认: reports]")
     parser.add_argument("--json-log", action="store_true", 
                         help="生成JSON日志")
     parser.add_argument("--log-dir", default="logs", 
                         help="日志输出目录 [默认: logs]")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="在本地指定端口提供Prometheus格式的 /metrics 指标接口")
+    parser.add_argument("--trace", choices=["chrome", "otlp"], default=None,
+                        help="导出执行时间线: chrome (trace_event格式，可用Perfetto查看) 或 otlp")
+    parser.add_argument("--trace-dir", default="traces",
+                        help="时间线输出目录 [默认: traces]")
+    parser.add_argument("--record-history", action="store_true",
+                        help="将本次执行结果写入历史数据库，可用 disttest history 查询")
+    parser.add_argument("--history-db", default=HistoryStore.DEFAULT_PATH,
+                        help=f"历史数据库路径 [默认: {HistoryStore.DEFAULT_PATH}]")
+    parser.add_argument("--detect-regressions", action="store_true",
+                        help="将测试耗时与历史基线比较，标记性能回归的测试")
+    parser.add_argument("--baseline", default=None,
+                        help="使用命名基线 (由 disttest history baseline save 保存)")
+    parser.add_argument("--baseline-runs", type=int, default=10,
+                        help="未指定命名基线时，使用最近N次执行作为基线 [默认: 10]")
+    parser.add_argument("--regression-threshold", type=float, default=3.0,
+                        help="耗时超出基线中位数的MAD倍数阈值 [默认: 3.0]")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="存在性能回归时以非零退出码退出")
+    parser.add_argument("--detect-leaks", action="store_true",
+                        help="使用tracemalloc检测测试残留的内存")
+    parser.add_argument("--leak-threshold", type=float, default=100.0,
+                        help="残留内存超过该值(KB)时标记为疑似泄漏 [默认: 100]")
+    parser.add_argument("--leak-scope", choices=["method", "class"], default="method",
+                        help="内存快照粒度: method (测试方法) 或 class (测试类) [默认: method]")
+    parser.add_argument("--memory-budget", type=float, default=None,
+                        help="单个工作者累计残留内存上限(MB)，超过后自动回收该工作者")
     
     args = parser.parse_args()
     
+    try:
+        selection = Selection(keyword=args.keyword, marks=args.marks)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.pin_cpus and args.executor != "process":
+        parser.error("--pin-cpus 只支持process后端 (--executor process)")
+    if args.detect_leaks and args.mode == "distributed" and args.executor != "process":
+        parser.error("分布式模式下 --detect-leaks 只支持process后端 (--executor process)")
+    
+    if args.capture_limit <= 0:
+        parser.error("--capture-limit 必须大于0")
+    
     # 创建测试运行器
     runner = TestRunner()
+    runner.set_output_capture(args.capture, args.capture_limit)
     
-    # 导入所有测试模块并添加测试用例
-    for module_path in args.test_modules:
-        test_cases = import_test_case(module_path)
-        if not test_cases:
+    # 发现测试: 解析模块源码建立索引，只导入可能包含（被选中的）测试的模块
+    try:
+        index = TestIndex.discover(args.test_modules, patterns=args.pattern or DEFAULT_PATTERNS,
+                                   workers=args.import_workers)
+    except ImportError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+    # 按模块名指定的模块总是导入（测试用例类可能是从其它模块导入的）
+    explicit = [module_path for module_path in args.test_modules if module_path in index.modules]
+    module_paths = index.modules_to_import(selection, explicit)
+    matched = f", 静态匹配 {len(index.select(selection))} 个测试" if selection else ""
+    print(f"测试发现: {len(index.modules)} 个模块, 静态发现 {sum(1 for _ in index.tests)} 个测试{matched}, "
+          f"需要导入 {len(module_paths)} 个模块")
+    if args.verbose:
+        for module in index.modules.values():
+            if not module.exact:
+                print(f"  {module.name} 无法静态确定全部测试，需要导入: {module.reason}")
+    
+    # 无法静态确定测试的模块较多时先在子进程中并行导入，集中报告导入错误，并跳过实际没有测试用例的模块。
+    # 静态索引精确的模块已知包含测试，不做预导入，其模块级代码只在主进程中执行一次
+    import_workers = args.import_workers or os.cpu_count() or 1
+    inexact = [module_path for module_path in module_paths
+               if module_path not in index.modules or not index.modules[module_path].exact]
+    if import_workers > 1 and len(inexact) >= PARALLEL_IMPORT_THRESHOLD:
+        imported = import_in_subprocesses(inexact, workers=import_workers)
+        errors = [(module_path, error) for module_path, (_, error) in imported.items() if error]
+        for module_path, error in errors:
+            print(f"错误: 无法导入模块 {module_path}: {error}")
+        if errors:
+            sys.exit(1)
+        for module_path in explicit:
+            if module_path in imported and not imported[module_path][0]:
+                print(f"警告: 在模块 {module_path} 中没有找到测试用例")
+        module_paths = [module_path for module_path in module_paths
+                        if module_path not in imported or imported[module_path][0]]
+    
+    # 导入测试模块并添加测试用例（多个模块导入同一个测试用例类时只添加一次）
+    added = set()
+    for module_path in module_paths:
+        found = import_test_case(module_path)
+        if not found and module_path in explicit:
             print(f"警告: 在模块 {module_path} 中没有找到测试用例")
+        test_cases = [test_case for test_case in found if test_case not in added]
+        if not test_cases:
             continue
-            
-        print(f"从模块 {module_path} 中加载了 {len(test_cases)} 个测试用例")
+        if args.verbose or len(module_paths) <= 20:
+            print(f"从模块 {module_path} 中加载了 {len(test_cases)} 个测试用例")
+        added.update(test_cases)
         for test_case in test_cases:
             runner.add_test_case(test_case)
+    if not added:
+        print("警告: 没有找到测试用例")
+    elif len(module_paths) > 20:
+        print(f"从 {len(module_paths)} 个模块中加载了 {len(added)} 个测试用例")
+    
+    if selection:
+        print(f"选择了 {runner.select(selection)} 个测试方法")
+    
+    # 如果需要，开启内存泄漏检测
+    if args.detect_leaks:
+        runner.enable_leak_detection(threshold_kb=args.leak_threshold, scope=args.leak_scope,
+                                     memory_budget_mb=args.memory_budget)
+    
+    # 如果需要，开启断点续跑
+    if args.checkpoint or args.resume:
+        runner.enable_checkpoint(directory=args.checkpoint_dir, resume=args.resume)
+    
+    # 如果需要，开启性能回归检测
+    if args.detect_regressions or args.fail_on_regression:
+        runner.enable_regression_detection(db_path=args.history_db, baseline_runs=args.baseline_runs,
+                                           baseline_name=args.baseline, threshold=args.regression_threshold)
     
     # 添加控制台报告插件
-    runner.add_plugin(ConsoleReporterPlugin(verbose=args.verbose))
+    runner.add_plugin(ConsoleReporterPlugin(verbose=args.verbose, history_db=args.history_db))
     
     # 如果需要，添加HTML报告插件
     if args.html_report:
-        runner.add_plugin(HTMLReportPlugin(output_dir=args.report_dir))
+        runner.add_plugin(HTMLReportPlugin(output_dir=args.report_dir,
+                                           paged=args.html_report_mode == "paged",
+                                           page_size=args.report_page_size))
         
     # 如果需要，添加JSON日志插件
     if args.json_log:
         runner.add_plugin(JSONLoggerPlugin(log_dir=args.log_dir))
+    
+    # 如果需要，添加指标导出插件
+    if args.metrics_port is not None:
+        runner.add_plugin(MetricsExporterPlugin(port=args.metrics_port))
+    
+    # 如果需要，添加时间线导出插件
+    if args.trace:
+        runner.add_plugin(TraceExportPlugin(output_dir=args.trace_dir, trace_format=args.trace))
+    
+    # 如果需要，添加执行历史记录插件
+    if args.record_history:
+        runner.add_plugin(HistoryRecorderPlugin(db_path=args.history_db))
         
     # 运行测试
     if args.mode == "local":
         print("以本地模式运行测试...")
         result = runner.run_local()
+    elif args.mode == "remote":
+        print(f"以远程模式运行测试，至少 {args.min_workers} 个工作者...")
+        host, port = args.listen
+        result = runner.run_remote(host=host, port=port, min_workers=args.min_workers)
     else:
-        print(f"以分布式模式运行测试，节点数量: {args.nodes}...")
-        result = runner.run_distributed(nodes=args.nodes)
+        autoscale = None
+        if args.autoscale:
+            autoscale = AutoscalePolicy(min_workers=args.min_nodes, max_workers=args.max_nodes,
+                                        target_load=args.target_load)
+            print("以分布式模式运行测试，节点数量自动伸缩...")
+        else:
+            print(f"以分布式模式运行测试，节点数量: {args.nodes}...")
+        worker_policy = WorkerPolicy(max_tests=args.max_tests_per_worker,
+                                     max_rss_mb=args.max_worker_rss,
+                                     max_age=args.max_worker_age)
+        node_capacity = {key: value for key, value in (("cpu", args.node_cpu), ("memory", args.node_memory))
+                         if value is not None}
+        placement = None
+        if args.pin_cpus:
+            placement = PlacementPolicy(cores_per_worker=args.cores_per_worker,
+                                        benchmark_cores=args.benchmark_cores)
+        result = runner.run_distributed(nodes=args.nodes, executor=args.executor,
+                                        worker_policy=worker_policy, node_capacity=node_capacity or None,
+                                        transport=args.transport, autoscale=autoscale,
+                                        speculative=args.speculative, placement=placement,
+                                        speculate_after=args.speculate_after)
         
     # 设置退出码
     summary = result.get_summary()
     if summary["failed"] > 0:
         sys.exit(1)
+    elif args.fail_on_regression and result.metadata.get("performance_regressions"):
+        sys.exit(1)
     else:
         sys.exit(0)
 
@@ -1,5 +1,15 @@
 from .test_case import TestCase
 from .test_suite import TestSuite
 from .test_result import TestResult
+from .leak_detector import LeakDetector
+from .history_store import HistoryStore
+from .regression_detector import RegressionDetector
+from .benchmark import benchmark
+from .parametrize import parametrize
+from .fixtures import fixture, FixtureCache
+from .resources import requires
+from .marks import mark
+from .selection import Selection
+from .capture import CapturePolicy
 
-__all__ = ['TestCase', 'TestSuite', 'TestResult'] 
\ No newline at end of file
+__all__ = ['TestCase', 'TestSuite', 'TestResult', 'LeakDetector', 'HistoryStore', 'RegressionDetector', 'benchmark', 'parametrize', 'fixture', 'FixtureCache', 'requires', 'mark', 'Selection', 'CapturePolicy']
\ No newline at end of file
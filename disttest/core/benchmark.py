@@ -0,0 +1,119 @@
+"""
+基准测试支持
+提供 @benchmark 装饰器以及预热、自动校准迭代次数和重复计时的执行逻辑
+"""
+import gc
+import statistics
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Optional
+
+# 标记基准测试方法的属性名
+BENCHMARK_ATTR = "__disttest_benchmark__"
+
+
+@dataclass
+class BenchmarkOptions:
+    """基准测试参数"""
+    warmup: int = 1  # 预热轮数（每轮执行校准后的迭代次数）
+    rounds: int = 5  # 计时轮数
+    min_round_time: float = 0.05  # 每轮最短时间（秒），用于自动校准每轮迭代次数
+    max_iterations: int = 1000000  # 每轮最大迭代次数
+    disable_gc: bool = True  # 计时期间是否关闭垃圾回收
+
+
+def benchmark(func: Optional[Callable] = None, **options: Any) -> Callable:
+    """将测试方法标记为基准测试
+
+    bench_ 开头的方法会自动视为基准测试，使用默认参数；需要调整参数时使用装饰器:
+
+        @benchmark(rounds=10, min_round_time=0.1)
+        def bench_parse(self):
+            ...
+
+    Args:
+        func: 被装饰的方法（不带参数使用装饰器时）
+        **options: BenchmarkOptions 的字段
+    """
+    benchmark_options = BenchmarkOptions(**options)
+
+    def decorator(method: Callable) -> Callable:
+        setattr(method, BENCHMARK_ATTR, benchmark_options)
+        return method
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def is_benchmark(name: str, method: Callable) -> bool:
+    """判断方法是否为基准测试"""
+    return name.startswith("bench_") or hasattr(method, BENCHMARK_ATTR)
+
+
+def get_options(method: Callable) -> BenchmarkOptions:
+    """获取基准测试方法的参数"""
+    return getattr(method, BENCHMARK_ATTR, None) or BenchmarkOptions()
+
+
+def _time_round(func: Callable, iterations: int) -> float:
+    """执行一轮并返回耗时"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return time.perf_counter() - start
+
+
+def run_benchmark(func: Callable, options: BenchmarkOptions) -> Dict[str, Any]:
+    """执行基准测试
+
+    先逐步增加每轮迭代次数，直到一轮耗时达到 min_round_time（或达到迭代上限），
+    再预热 warmup 轮，最后计时 rounds 轮，统计每次迭代的平均耗时
+
+    Args:
+        func: 无参数的可调用对象
+        options: 基准测试参数
+
+    Returns:
+        统计结果字典，时间单位为秒
+    """
+    started = time.perf_counter()
+
+    # 校准每轮迭代次数
+    iterations = 1
+    while True:
+        elapsed = _time_round(func, iterations)
+        if elapsed >= options.min_round_time or iterations >= options.max_iterations:
+            break
+        if elapsed > 0:
+            estimate = int(iterations * options.min_round_time / elapsed * 1.2)
+            iterations = max(iterations * 2, estimate)
+        else:
+            iterations *= 10
+        iterations = min(iterations, options.max_iterations)
+
+    for _ in range(options.warmup):
+        _time_round(func, iterations)
+
+    gc_was_enabled = gc.isenabled()
+    if options.disable_gc:
+        gc.disable()
+    try:
+        samples = [_time_round(func, iterations) / iterations for _ in range(max(1, options.rounds))]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    median = statistics.median(samples)
+    return {
+        "rounds": len(samples),
+        "iterations": iterations,
+        "min": min(samples),
+        "max": max(samples),
+        "mean": statistics.mean(samples),
+        "median": median,
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "ops_per_sec": 1.0 / median if median > 0 else None,
+        "total_time": time.perf_counter() - started,
+        "options": asdict(options),
+    }
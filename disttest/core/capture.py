@@ -0,0 +1,225 @@
+"""
+OutputCapture类 - 测试输出捕获
+测试执行期间把 sys.stdout、sys.stderr 的写入和 logging 记录转到有界的环形缓冲区，
+只为失败的测试（或按策略为所有测试）把捕获的输出附加到测试结果上，
+通过的测试的输出直接丢弃，不产生终端I/O
+"""
+import logging
+import sys
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, ClassVar, Deque, Dict, Optional, Tuple
+
+DEFAULT_CAPTURE_LIMIT = 64 * 1024
+
+# 当前线程正在使用的捕获器，线程后端的工作者各自捕获自己线程的输出
+_local = threading.local()
+_install_lock = threading.Lock()
+
+
+@dataclass
+class CapturePolicy:
+    """输出捕获策略"""
+    MODES: ClassVar[Tuple[str, ...]] = ("failures", "all", "off")
+
+    mode: str = "failures"  # failures: 只保留失败测试的输出; all: 保留所有测试的输出; off: 不捕获
+    limit: int = DEFAULT_CAPTURE_LIMIT  # 每个测试每个输出流保留的最大字符数，超出时丢弃最早的输出
+
+    def __post_init__(self):
+        if self.mode not in self.MODES:
+            raise ValueError(f"不支持的捕获模式: {self.mode}，可选值: {', '.join(self.MODES)}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def keeps(self, success: bool) -> bool:
+        """测试结果是否保留捕获的输出"""
+        return self.mode == "all" or (self.mode == "failures" and not success)
+
+
+class RingBuffer:
+    """有界的文本环形缓冲区，超出上限时丢弃最早写入的内容，只保留末尾"""
+
+    __slots__ = ("limit", "size", "dropped", "_chunks")
+
+    def __init__(self, limit: int = DEFAULT_CAPTURE_LIMIT):
+        self.limit = limit
+        self.size = 0
+        self.dropped = 0  # 被丢弃的字符数
+        self._chunks: Deque[str] = deque()
+
+    def write(self, text: str) -> int:
+        if not text:
+            return 0
+        self._chunks.append(text)
+        self.size += len(text)
+        while self.size > self.limit:
+            excess = self.size - self.limit
+            head = self._chunks[0]
+            if len(head) <= excess:
+                self._chunks.popleft()
+                self.size -= len(head)
+                self.dropped += len(head)
+            else:
+                self._chunks[0] = head[excess:]
+                self.size -= excess
+                self.dropped += excess
+        return len(text)
+
+    def getvalue(self) -> str:
+        return "".join(self._chunks)
+
+    def clear(self) -> None:
+        self._chunks.clear()
+        self.size = 0
+        self.dropped = 0
+
+
+class _StreamRouter:
+    """sys.stdout / sys.stderr 的代理，当前线程正在捕获时写入其缓冲区，否则写入原来的流"""
+
+    def __init__(self, name: str, stream: Any):
+        self._name = name
+        self._stream = stream
+
+    def write(self, text: str) -> int:
+        capture = getattr(_local, "capture", None)
+        if capture is None:
+            return self._stream.write(text)
+        return capture.buffers[self._name].write(text)
+
+    def writelines(self, lines) -> None:
+        for line in lines:
+            self.write(line)
+
+    def flush(self) -> None:
+        if getattr(_local, "capture", None) is None:
+            self._stream.flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+
+class _LogRouter(logging.Handler):
+    """捕获期间挂在根日志记录器上的处理器，把当前线程正在捕获时产生的日志记录写入其缓冲区
+
+    其它线程的记录照常交给各记录器自己的处理器；除本处理器外没有任何处理器时，
+    与不挂本处理器时一样交给 logging.lastResort 输出
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+
+    def emit(self, record: logging.LogRecord) -> None:
+        capture = getattr(_local, "capture", None)
+        if capture is not None:
+            capture.buffers["log"].write(self.format(record) + "\n")
+        elif logging.lastResort is not None and record.levelno >= logging.lastResort.level \
+                and not self._has_other_handlers(record.name):
+            logging.lastResort.handle(record)
+
+    def _has_other_handlers(self, name: str) -> bool:
+        """记录沿记录器层级传播时是否还会到达其它处理器"""
+        logger: Optional[logging.Logger] = logging.getLogger(name)
+        while logger is not None:
+            if any(handler is not self for handler in logger.handlers):
+                return True
+            if not logger.propagate:
+                return False
+            logger = logger.parent
+        return False
+
+
+_log_router = _LogRouter()
+_active_captures = 0  # 进程内正在进行的捕获数，大于0时 _log_router 挂在根日志记录器上
+
+
+def _install() -> None:
+    """确保 sys.stdout、sys.stderr 经过路由，并在第一个捕获开始时挂上日志处理器
+
+    其它代码（例如控制台进度渲染器）可能替换 sys.stdout，每次开始捕获时检查并重新包装
+    """
+    global _active_captures
+    with _install_lock:
+        if not isinstance(sys.stdout, _StreamRouter):
+            sys.stdout = _StreamRouter("stdout", sys.stdout)
+        if not isinstance(sys.stderr, _StreamRouter):
+            sys.stderr = _StreamRouter("stderr", sys.stderr)
+        if _active_captures == 0:
+            logging.getLogger().addHandler(_log_router)
+        _active_captures += 1
+
+
+def _uninstall() -> None:
+    """最后一个捕获结束时从根日志记录器移除日志处理器"""
+    global _active_captures
+    with _install_lock:
+        _active_captures -= 1
+        if _active_captures == 0:
+            logging.getLogger().removeHandler(_log_router)
+
+
+class OutputCapture:
+    """捕获当前线程的标准输出、标准错误和日志记录
+
+    作为上下文管理器使用，可以多次进入，捕获的内容累积到缓冲区直到 clear。
+    异常穿过上下文时捕获的输出不会附加到任何结果上，退出时写回原来的流。
+    测试自己启动的线程的输出不会被捕获
+
+    日志记录在各记录器的级别过滤之后捕获，捕获不会修改日志级别：根日志记录器默认为
+    WARNING，需要捕获INFO/DEBUG记录时由测试代码或 logging.basicConfig 设置相应的级别
+    """
+
+    STREAMS = ("stdout", "stderr", "log")
+
+    def __init__(self, limit: int = DEFAULT_CAPTURE_LIMIT):
+        self.buffers: Dict[str, RingBuffer] = {name: RingBuffer(limit) for name in self.STREAMS}
+        self._previous: Optional["OutputCapture"] = None
+
+    def __enter__(self) -> "OutputCapture":
+        _install()
+        self._previous = getattr(_local, "capture", None)
+        _local.capture = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        _local.capture = self._previous
+        self._previous = None
+        _uninstall()
+        if exc_type is not None:
+            self.replay()
+
+    def getvalues(self) -> Dict[str, Any]:
+        """捕获的内容 {流名称: 文本}，只包含非空的流；有内容被丢弃时 truncated 记录各流丢弃的字符数"""
+        values: Dict[str, Any] = {name: buffer.getvalue() for name, buffer in self.buffers.items() if buffer.size}
+        dropped = {name: buffer.dropped for name, buffer in self.buffers.items() if buffer.dropped}
+        if dropped:
+            values["truncated"] = dropped
+        return values
+
+    def replay(self) -> None:
+        """把捕获的标准输出和标准错误写到当前的流"""
+        for name in ("stdout", "stderr"):
+            text = self.buffers[name].getvalue()
+            if text:
+                getattr(sys, name).write(text)
+
+    def clear(self) -> None:
+        for buffer in self.buffers.values():
+            buffer.clear()
+
+
+def format_captured(additional_data: Dict[str, Any]) -> str:
+    """把测试结果上捕获的输出格式化为分段的文本，没有捕获的输出时返回空字符串"""
+    sections = []
+    for key, title in (("class_output", "setup_class/teardown_class "), ("output", "")):
+        captured = additional_data.get(key) or {}
+        truncated = captured.get("truncated", {})
+        for name in OutputCapture.STREAMS:
+            if name in captured:
+                note = f" (已丢弃前 {truncated[name]} 个字符)" if name in truncated else ""
+                sections.append(f"----- 捕获的{title}{name}{note} -----\n{captured[name].rstrip()}")
+    return "\n".join(sections)
@@ -0,0 +1,454 @@
+"""
+测试发现索引
+不导入测试模块，直接解析源码中的 TestCase 子类、测试方法及其 @mark 标记建立索引。选择测试时
+先在索引上筛选，只导入包含被选中测试的模块
+
+测试可以从目录发现: 用 os.scandir 遍历目录，按文件名模式找到候选文件，解析语法树后只保留
+可能包含测试用例类的模块；无法静态确定的模块较多时先在多个子进程中并行导入
+
+静态解析只覆盖在模块顶层定义、基类为 TestCase 或本模块中测试用例类的类。源码中有无法
+确定的测试用例类（基类来自其它模块、从其它模块导入了名称、在函数中动态生成、标记名称
+不是字符串常量等）的模块标记为不精确，总是导入后再按实际的类筛选
+"""
+import ast
+import builtins
+import fnmatch
+import glob
+import importlib
+import importlib.util
+import math
+import multiprocessing
+import os
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .selection import Selection
+
+# 测试用例基类的名称
+TEST_CASE_BASE = "TestCase"
+# 遍历目录时匹配的测试文件名
+DEFAULT_PATTERNS = ("test_*.py", "*_test.py")
+# 遍历目录时跳过的目录（以 . 开头的目录也会跳过）
+SKIP_DIRS = frozenset({"__pycache__", "node_modules", "venv", "build", "dist"})
+# 源文件数达到该值时在多个子进程中并行解析
+PARALLEL_SCAN_THRESHOLD = 64
+# 需要导入的不精确模块数达到该值时先在子进程中并行导入
+PARALLEL_IMPORT_THRESHOLD = 8
+# 从这些包导入的名称不会是测试用例类
+_FRAMEWORK_PACKAGES = frozenset({__name__.split(".")[0]}) | frozenset(getattr(sys, "stdlib_module_names", ()))
+
+
+@dataclass
+class IndexedTest:
+    """索引中的一个测试方法"""
+    module: str
+    class_name: str
+    method_name: str
+    marks: FrozenSet[str] = frozenset()
+    benchmark: bool = False
+    test_id: str = field(init=False)
+    key: str = field(init=False, repr=False)  # 小写的测试ID，用于关键字匹配
+
+    def __post_init__(self):
+        self.test_id = f"{self.module}.{self.class_name}.{self.method_name}"
+        self.key = self.test_id.lower()
+
+
+@dataclass
+class IndexedModule:
+    """索引中的一个模块"""
+    name: str
+    path: Optional[str]
+    tests: List[IndexedTest] = field(default_factory=list)
+    exact: bool = True  # 为False时静态解析的结果不完整，需要导入模块后才能确定其中的测试
+    reason: Optional[str] = None  # 不精确的原因
+
+
+def _decorator_name(node: ast.expr) -> Optional[str]:
+    """装饰器的名称: @name、@module.name 或它们的调用形式"""
+    if isinstance(node, ast.Call):
+        node = node.func
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _base_name(node: ast.expr) -> Optional[str]:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _expr_text(node: ast.expr) -> str:
+    """表达式的简短文本，用于说明不精确的原因（ast.unparse 需要 Python 3.9）"""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return f"{_expr_text(node.value)}.{node.attr}"
+    if isinstance(node, ast.Call):
+        return f"{_expr_text(node.func)}(...)"
+    if isinstance(node, ast.Subscript):
+        return f"{_expr_text(node.value)}[...]"
+    return type(node).__name__
+
+
+def _string_value(node: ast.expr) -> Optional[str]:
+    """字符串常量的值，不是字符串常量时返回None（Python 3.7 的语法树中字符串常量为 ast.Str）"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if sys.version_info < (3, 8) and isinstance(node, ast.Str):
+        return node.s
+    return None
+
+
+def _module_level(statements: List[ast.stmt]) -> Iterator[ast.stmt]:
+    """模块顶层执行的语句，包括 if/try/with 语句块中的语句"""
+    for statement in statements:
+        yield statement
+        for field_name in ("body", "orelse", "finalbody"):
+            if isinstance(statement, (ast.If, ast.Try, ast.With)) and hasattr(statement, field_name):
+                yield from _module_level(getattr(statement, field_name))
+        if isinstance(statement, ast.Try):
+            for handler in statement.handlers:
+                yield from _module_level(handler.body)
+
+
+class _ModuleScanner:
+    """解析一个模块的语法树"""
+
+    def __init__(self, module: IndexedModule, tree: ast.Module):
+        self.module = module
+        self.tree = tree
+        # 本模块中的类: 类名 -> (是否为测试用例类, 类标记, 方法名 -> (方法标记, 是否为基准测试))
+        self.classes: Dict[str, Tuple[bool, FrozenSet[str], Dict[str, Tuple[FrozenSet[str], bool]]]] = {}
+
+    def _inexact(self, reason: str) -> None:
+        if self.module.exact:
+            self.module.exact = False
+            self.module.reason = reason
+
+    def _marks(self, decorators: List[ast.expr]) -> FrozenSet[str]:
+        marks: Set[str] = set()
+        for decorator in decorators:
+            if _decorator_name(decorator) != "mark":
+                continue
+            values = [_string_value(arg) for arg in decorator.args] if isinstance(decorator, ast.Call) else []
+            if not isinstance(decorator, ast.Call) or decorator.keywords or None in values:
+                self._inexact("标记名称不是字符串常量")
+                continue
+            marks.update(values)
+        return frozenset(marks)
+
+    def scan(self) -> None:
+        top_level = set()
+        for node in self.tree.body:
+            if isinstance(node, ast.ClassDef):
+                top_level.add(id(node))
+                self._scan_class(node)
+        # 模块顶层 from ... import 导入的类也会被发现，导入的名称可能是其它模块中的测试用例类
+        for node in _module_level(self.tree.body):
+            if isinstance(node, ast.ImportFrom) and (node.level or (node.module or "").split(".")[0]
+                                                     not in _FRAMEWORK_PACKAGES):
+                names = [alias.asname or alias.name for alias in node.names]
+                self._inexact(f"从模块 {'.' * node.level}{node.module or ''} 导入了 {', '.join(names)}")
+        # 在函数中定义类、type() 动态创建类、在类定义之外给类添加属性时无法静态确定
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.ClassDef) and id(node) not in top_level and any(
+                    not hasattr(builtins, _base_name(base) or "") for base in node.bases):
+                self._inexact(f"在函数或类中定义了类 {node.name}")
+            elif isinstance(node, ast.Call) and (_decorator_name(node) == "new_class"
+                                                 or _decorator_name(node) == "type" and len(node.args) == 3):
+                self._inexact("动态创建了类")
+            elif (isinstance(node, ast.Call) and _decorator_name(node) == "setattr" and node.args
+                  and isinstance(node.args[0], ast.Name) and node.args[0].id in self.classes):
+                self._inexact("动态添加了测试方法")
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                if any(isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name)
+                       and target.value.id in self.classes for target in targets):
+                    self._inexact("动态添加了测试方法")
+
+        for class_name, (is_test, class_marks, methods) in self.classes.items():
+            if not is_test:
+                continue
+            for method_name, (method_marks, benchmark) in methods.items():
+                self.module.tests.append(IndexedTest(self.module.name, class_name, method_name,
+                                                     class_marks | method_marks, benchmark))
+
+    def _scan_class(self, node: ast.ClassDef) -> None:
+        is_test = False
+        class_marks: FrozenSet[str] = frozenset()
+        methods: Dict[str, Tuple[FrozenSet[str], bool]] = {}
+        unknown_bases = []
+        for base in node.bases:
+            name = _base_name(base)
+            if name == TEST_CASE_BASE:
+                is_test = True
+            elif name in self.classes:
+                base_is_test, base_marks, base_methods = self.classes[name]
+                is_test = is_test or base_is_test
+                class_marks |= base_marks
+                methods.update(base_methods)
+            elif name is None or not hasattr(builtins, name):
+                unknown_bases.append(name or _expr_text(base))
+        if unknown_bases:
+            self._inexact(f"类 {node.name} 的基类 {', '.join(unknown_bases)} 来自其它模块")
+
+        class_marks |= self._marks(node.decorator_list)
+        for item in node.body:
+            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                decorators = [_decorator_name(decorator) for decorator in item.decorator_list]
+                benchmark = item.name.startswith("bench_") or "benchmark" in decorators
+                if item.name.startswith("test_") or benchmark:
+                    methods[item.name] = (self._marks(item.decorator_list), benchmark)
+            elif isinstance(item, (ast.Assign, ast.AnnAssign)):
+                targets = item.targets if isinstance(item, ast.Assign) else [item.target]
+                if any(isinstance(target, ast.Name) and target.id.startswith(("test_", "bench_"))
+                       for target in targets):
+                    self._inexact(f"类 {node.name} 中通过赋值定义了测试方法")
+        self.classes[node.name] = (is_test, class_marks, methods)
+
+
+def scan_source(module_name: str, source: str, path: Optional[str] = None) -> IndexedModule:
+    """解析模块源码
+
+    Args:
+        module_name: 模块名
+        source: 源码
+        path: 源文件路径
+
+    Returns:
+        模块的索引
+    """
+    module = IndexedModule(module_name, path)
+    try:
+        tree = ast.parse(source, filename=path or module_name)
+    except SyntaxError as e:
+        module.exact = False
+        module.reason = f"语法错误: {e}"
+        return module
+    _ModuleScanner(module, tree).scan()
+    return module
+
+
+def scan_file(module_name: str, path: str) -> IndexedModule:
+    """解析源文件，源码中没有类定义和 import 语句时不解析语法树"""
+    with open(path, "rb") as f:
+        source = f.read()
+    if b"class" not in source and b"import" not in source:
+        return IndexedModule(module_name, path)
+    return scan_source(module_name, source.decode("utf-8"), path)
+
+
+def _scan_files(items: List[Tuple[str, str]]) -> List[IndexedModule]:
+    return [scan_file(module_name, path) for module_name, path in items]
+
+
+def find_test_files(directory: str, patterns: Iterable[str] = DEFAULT_PATTERNS) -> List[str]:
+    """用 os.scandir 遍历目录，查找文件名匹配模式的测试源文件（跳过隐藏目录和 __pycache__ 等目录）
+
+    Args:
+        directory: 根目录
+        patterns: 文件名模式
+
+    Returns:
+        按路径排序的源文件列表
+    """
+    patterns = tuple(patterns)
+    files = []
+    pending = [directory]
+    while pending:
+        try:
+            entries = list(os.scandir(pending.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not entry.name.startswith(".") and entry.name not in SKIP_DIRS:
+                    pending.append(entry.path)
+            elif entry.name.endswith(".py") and any(fnmatch.fnmatchcase(entry.name, pattern)
+                                                    for pattern in patterns):
+                files.append(entry.path)
+    return sorted(files)
+
+
+def module_name_for(path: str) -> Tuple[str, str]:
+    """源文件对应的模块名，以及导入该模块需要加入 sys.path 的目录
+
+    从源文件所在目录向上查找含 __init__.py 的包目录，第一个不是包的目录作为根目录
+
+    Returns:
+        (模块名, 根目录)
+    """
+    directory, filename = os.path.split(os.path.abspath(path))
+    parts = [] if filename == "__init__.py" else [os.path.splitext(filename)[0]]
+    while os.path.isfile(os.path.join(directory, "__init__.py")):
+        directory, package = os.path.split(directory)
+        parts.insert(0, package)
+    return ".".join(parts), directory
+
+
+def _chunks(items: List, workers: int) -> List[List]:
+    size = max(1, math.ceil(len(items) / (workers * 4)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _import_modules(module_names: List[str]) -> List[Tuple[str, Optional[List[str]], Optional[str]]]:
+    """在子进程中导入模块
+
+    Returns:
+        [(模块名, 模块中的测试用例类名, 导入失败时的错误信息)]
+    """
+    # 延迟导入，避免 core 包初始化时的循环导入
+    from .test_case import TestCase
+    results = []
+    for module_name in module_names:
+        try:
+            module = importlib.import_module(module_name)
+        except (Exception, SystemExit) as e:
+            results.append((module_name, None, f"{type(e).__name__}: {e}"))
+            continue
+        class_names = [attr_name for attr_name in dir(module)
+                       if isinstance(getattr(module, attr_name), type)
+                       and issubclass(getattr(module, attr_name), TestCase)
+                       and getattr(module, attr_name) is not TestCase]
+        results.append((module_name, class_names, None))
+    return results
+
+
+def import_in_subprocesses(module_names: List[str],
+                           workers: Optional[int] = None) -> Dict[str, Tuple[Optional[List[str]], Optional[str]]]:
+    """在多个子进程中并行导入模块
+
+    类对象不能从子进程传回，主进程仍需导入用到的模块。子进程并行完成模块的编译（写入
+    __pycache__ 字节码缓存）并集中报告导入错误，主进程随后只导入确实包含测试用例类的模块，
+    导入时直接加载字节码。这些模块的模块级代码会在子进程和主进程中各执行一次，因此只应
+    传入无法静态确定测试的模块
+
+    Args:
+        module_names: 模块名
+        workers: 子进程数，默认为CPU核数
+
+    Returns:
+        模块名 -> (模块中的测试用例类名, 导入失败时的错误信息)
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(module_names)))
+    with multiprocessing.get_context().Pool(workers) as pool:
+        chunks = pool.map(_import_modules, _chunks(list(module_names), workers))
+    return {module_name: (class_names, error)
+            for chunk in chunks for module_name, class_names, error in chunk}
+
+
+class TestIndex:
+    """测试发现索引"""
+
+    def __init__(self):
+        self.modules: Dict[str, IndexedModule] = {}
+
+    @classmethod
+    def build(cls, module_names: Iterable[str]) -> "TestIndex":
+        """为一组模块建立索引（只导入它们所在的包，不导入模块本身）"""
+        index = cls()
+        for module_name in module_names:
+            index.add_module(module_name)
+        return index
+
+    @classmethod
+    def discover(cls, targets: Iterable[str], patterns: Iterable[str] = DEFAULT_PATTERNS,
+                 workers: Optional[int] = None) -> "TestIndex":
+        """从目录、源文件、通配符或模块名发现测试并建立索引
+
+        目录中匹配 patterns 的文件按所在的包确定模块名，包的根目录加入 sys.path；
+        源文件较多时在多个子进程中并行解析
+
+        Args:
+            targets: 目录、.py 文件、通配符 (例如 tests/**/test_*.py) 或模块名
+            patterns: 遍历目录时匹配的文件名模式
+            workers: 并行解析的子进程数，默认为CPU核数，为1时在当前进程中解析
+
+        Returns:
+            测试发现索引
+        """
+        index = cls()
+        files: List[str] = []
+        for target in targets:
+            if os.path.isdir(target):
+                files.extend(find_test_files(target, patterns))
+            elif glob.has_magic(target):
+                for path in sorted(glob.glob(target, recursive=True)):
+                    if os.path.isdir(path):
+                        files.extend(find_test_files(path, patterns))
+                    elif path.endswith(".py"):
+                        files.append(path)
+            elif target.endswith(".py"):
+                if not os.path.isfile(target):
+                    raise ImportError(f"找不到源文件: {target}")
+                files.append(target)
+            else:
+                index.add_module(target)
+
+        items: Dict[str, str] = {}
+        for path in files:
+            module_name, root = module_name_for(path)
+            if items.get(module_name, path) != path:
+                raise ImportError(f"模块名冲突: {items[module_name]} 与 {path} 都对应模块 {module_name}，"
+                                  f"请在目录中添加 __init__.py")
+            if module_name in index.modules:
+                continue
+            items[module_name] = path
+            if root not in sys.path:
+                sys.path.insert(0, root)
+
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(items) >= PARALLEL_SCAN_THRESHOLD:
+            with multiprocessing.get_context().Pool(workers) as pool:
+                chunks = pool.map(_scan_files, _chunks(list(items.items()), workers))
+            modules = [module for chunk in chunks for module in chunk]
+        else:
+            modules = _scan_files(list(items.items()))
+        for module in modules:
+            index.modules[module.name] = module
+        return index
+
+    def add_module(self, module_name: str) -> IndexedModule:
+        """解析模块并加入索引，找不到源码的模块标记为不精确"""
+        spec = importlib.util.find_spec(module_name)
+        if spec is None:
+            raise ImportError(f"找不到模块: {module_name}")
+        path = spec.origin
+        if path is None or not path.endswith(".py"):
+            module = IndexedModule(module_name, path, exact=False, reason="没有Python源码")
+        else:
+            module = scan_file(module_name, path)
+        self.modules[module_name] = module
+        return module
+
+    @property
+    def tests(self) -> Iterator[IndexedTest]:
+        """索引中的所有测试方法"""
+        for module in self.modules.values():
+            yield from module.tests
+
+    def select(self, selection: Selection) -> List[IndexedTest]:
+        """在索引上筛选测试方法（不包括不精确模块中无法静态确定的测试）"""
+        predicate = selection.predicate
+        return [test for test in self.tests if predicate(test.key, test.marks)]
+
+    def modules_to_import(self, selection: Optional[Selection] = None,
+                          explicit: Iterable[str] = ()) -> List[str]:
+        """需要导入的模块: 包含（被选中的）测试的模块、所有不精确的模块和 explicit 中的模块
+
+        Args:
+            selection: 测试选择条件
+            explicit: 用户按模块名指定的模块，总是导入
+        """
+        predicate = selection.predicate if selection else None
+        explicit = set(explicit)
+        return [name for name, module in self.modules.items()
+                if name in explicit or not module.exact
+                or any(predicate is None or predicate(test.key, test.marks) for test in module.tests)]
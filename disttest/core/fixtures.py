@@ -0,0 +1,253 @@
+"""
+作用域夹具
+声明一次、按工作者缓存的共享资源（数据库、模型、大型数据文件等），注入到声明使用它的测试用例类中
+"""
+import inspect
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+SCOPES = ("worker", "session")
+
+
+@dataclass
+class FixtureDef:
+    """夹具定义"""
+    name: str
+    func: Callable
+    scope: str = "worker"
+
+    @property
+    def dependencies(self) -> List[str]:
+        """夹具函数参数中声明的依赖夹具"""
+        return list(inspect.signature(self.func).parameters)
+
+
+# 已注册的夹具，按名称索引
+_REGISTRY: Dict[str, FixtureDef] = {}
+
+
+def fixture(func: Optional[Callable] = None, *, scope: str = "worker", name: Optional[str] = None) -> Callable:
+    """注册一个夹具
+
+    夹具函数返回资源；需要清理时写成生成器，yield 资源，yield 之后的代码在夹具
+    销毁时执行。夹具函数的参数名会被当作依赖的其它夹具注入:
+
+        @fixture(scope="session")
+        def schema():
+            db = create_schema()
+            yield db
+            db.drop()
+
+        class UserTest(TestCase):
+            fixtures = ["schema"]
+
+            def test_insert(self):
+                self.schema.insert(...)
+
+    Args:
+        func: 夹具函数（不带参数使用装饰器时）
+        scope: worker 每个工作者一份；session 同一进程内的所有工作者共享一份，只能依赖
+            session 作用域的夹具
+        name: 夹具名称，默认为函数名
+    """
+    if scope not in SCOPES:
+        raise ValueError(f"不支持的夹具作用域: {scope}，可选值: {', '.join(SCOPES)}")
+
+    def decorator(fixture_func: Callable) -> Callable:
+        fixture_name = name or fixture_func.__name__
+        _REGISTRY[fixture_name] = FixtureDef(fixture_name, fixture_func, scope)
+        return fixture_func
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_fixture(name: str) -> FixtureDef:
+    """获取夹具定义"""
+    if name not in _REGISTRY:
+        raise LookupError(f"未注册的夹具: {name}")
+    return _REGISTRY[name]
+
+
+def _create(definition: FixtureDef, arguments: Dict[str, Any]) -> Tuple[Any, Optional[Iterable]]:
+    """创建夹具实例，返回 (资源, 用于清理的生成器)"""
+    if inspect.isgeneratorfunction(definition.func):
+        generator = definition.func(**arguments)
+        return next(generator), generator
+    return definition.func(**arguments), None
+
+
+def _finalize(name: str, generator: Optional[Iterable]) -> None:
+    """执行夹具的清理代码"""
+    if generator is None:
+        return
+    try:
+        next(generator)
+    except StopIteration:
+        return
+    raise RuntimeError(f"夹具 {name} 只能 yield 一次")
+
+
+class _SessionStore:
+    """进程内 session 作用域夹具的共享存储，按持有者数量引用计数
+
+    持有者是使用它的工作者，以及依赖它的其它 session 夹具：夹具创建时依赖的 session 夹具
+    由该夹具持有，夹具销毁后才释放，因此依赖不会先于使用它的夹具销毁
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.entries: Dict[str, List[Any]] = {}  # 名称 -> [资源, 清理生成器, 引用计数, 持有的依赖]
+
+    def acquire(self, name: str, resolving: Tuple[str, ...] = (),
+                on_create: Optional[Callable[[], None]] = None) -> Any:
+        """获取夹具实例并增加引用计数，不存在时先获取其依赖再创建
+
+        Args:
+            name: 夹具名称
+            resolving: 正在解析的依赖链，用于检测循环依赖
+            on_create: 实际创建夹具时调用，用于统计创建次数
+        """
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None:
+                if name in resolving:
+                    raise RuntimeError(f"夹具存在循环依赖: {' -> '.join(resolving + (name,))}")
+                definition = get_fixture(name)
+                acquired: List[str] = []
+                try:
+                    arguments = {}
+                    for dependency in definition.dependencies:
+                        arguments[dependency] = self.acquire(dependency, resolving + (name,))
+                        acquired.append(dependency)
+                    if on_create is not None:
+                        on_create()
+                    value, generator = _create(definition, arguments)
+                except BaseException:
+                    for dependency in reversed(acquired):
+                        self.release(dependency)
+                    raise
+                entry = self.entries[name] = [value, generator, 0, acquired]
+            entry[2] += 1
+            return entry[0]
+
+    def release(self, name: str) -> None:
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None:
+                return
+            entry[2] -= 1
+            if entry[2] <= 0:
+                del self.entries[name]
+                try:
+                    _finalize(name, entry[1])
+                finally:
+                    for dependency in reversed(entry[3]):
+                        self.release(dependency)
+
+
+_SESSION = _SessionStore()
+
+
+class FixtureCache:
+    """工作者的夹具缓存
+
+    同一工作者执行的多个测试用例类共享夹具实例，每个夹具只创建一次。worker 作用域
+    的夹具在工作者结束（close）时按创建的逆序销毁；session 作用域的夹具在同一进程的
+    所有工作者之间共享，最后一个持有它的工作者结束时销毁。
+
+    夹具注入到每个工作者各自的测试用例类子类上，同一进程中并发执行同一个类的线程
+    工作者（参数化分片、推测执行的副本）互不覆盖，原来的类上不会留下夹具属性
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Any] = {}
+        self._bound: Dict[type, type] = {}  # 测试用例类 -> 注入了本工作者夹具的子类
+        self._worker_finalizers: List[Tuple[str, Optional[Iterable]]] = []
+        self._session_names: List[str] = []
+        self.setup_counts: Dict[str, int] = {}  # 本工作者实际创建各夹具的次数
+        self.use_counts: Dict[str, int] = {}  # 各夹具被测试用例类使用的次数
+
+    def get(self, name: str, _resolving: Tuple[str, ...] = ()) -> Any:
+        """获取夹具实例，首次使用时创建（包括其依赖的夹具）"""
+        if name in self._values:
+            return self._values[name]
+        if name in _resolving:
+            raise RuntimeError(f"夹具存在循环依赖: {' -> '.join(_resolving + (name,))}")
+
+        definition = get_fixture(name)
+
+        def count_setup() -> None:
+            self.setup_counts[name] = self.setup_counts.get(name, 0) + 1
+
+        if definition.scope == "session":
+            self._check_session_dependencies(definition)
+            value = _SESSION.acquire(name, _resolving, count_setup)
+            self._session_names.append(name)
+        else:
+            # 依赖在需要创建时才解析
+            arguments = {dependency: self.get(dependency, _resolving + (name,))
+                         for dependency in definition.dependencies}
+            count_setup()
+            value, generator = _create(definition, arguments)
+            self._worker_finalizers.append((name, generator))
+        self._values[name] = value
+        return value
+
+    @staticmethod
+    def _check_session_dependencies(definition: FixtureDef, resolving: Tuple[str, ...] = ()) -> None:
+        """session 夹具被所有工作者共享，不能依赖随某个工作者销毁的 worker 夹具"""
+        if definition.name in resolving:
+            raise RuntimeError(f"夹具存在循环依赖: {' -> '.join(resolving + (definition.name,))}")
+        for dependency in definition.dependencies:
+            dependency_definition = get_fixture(dependency)
+            if dependency_definition.scope != "session":
+                raise ValueError(f"session 作用域的夹具 {definition.name} 不能依赖 "
+                                 f"{dependency_definition.scope} 作用域的夹具 {dependency}")
+            FixtureCache._check_session_dependencies(dependency_definition, resolving + (definition.name,))
+
+    def inject(self, test_case_class: type) -> type:
+        """返回注入了测试用例类声明的夹具的类
+
+        没有声明夹具时返回原类；否则返回本工作者专用的子类（类名、模块与原类相同），
+        夹具设置为子类的类属性，setup_class 等类方法也能访问
+        """
+        names = test_case_class.get_fixture_names()
+        if not names:
+            return test_case_class
+        bound = self._bound.get(test_case_class)
+        if bound is None:
+            bound = type(test_case_class.__name__, (test_case_class,), {
+                "__module__": test_case_class.__module__,
+                "__qualname__": test_case_class.__qualname__,
+            })
+            self._bound[test_case_class] = bound
+        for name in names:
+            setattr(bound, name, self.get(name))
+            self.use_counts[name] = self.use_counts.get(name, 0) + 1
+        return bound
+
+    def close(self) -> List[str]:
+        """销毁 worker 作用域的夹具并释放 session 作用域的夹具
+
+        Returns:
+            清理过程中出现的错误信息
+        """
+        errors = []
+        for name, generator in reversed(self._worker_finalizers):
+            try:
+                _finalize(name, generator)
+            except Exception as e:
+                errors.append(f"夹具 {name} 清理失败: {type(e).__name__}: {str(e)}")
+        for name in reversed(self._session_names):
+            try:
+                _SESSION.release(name)
+            except Exception as e:
+                errors.append(f"夹具 {name} 清理失败: {type(e).__name__}: {str(e)}")
+        self._values.clear()
+        self._bound.clear()
+        self._worker_finalizers = []
+        self._session_names = []
+        return errors
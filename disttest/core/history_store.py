@@ -0,0 +1,363 @@
+"""
+HistoryStore类 - 执行历史数据库
+基于SQLite保存每次执行的测试结果，按测试、执行批次和节点建立索引，用于趋势查询
+"""
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class HistoryStore:
+    """执行历史数据库
+
+    表结构:
+        runs    - 每次执行一行（批次ID、开始/结束时间、汇总）
+        tests   - 测试名称字典表（模块.类名.方法名 -> 测试ID）
+        results - 每个测试方法一次执行的结果（批次ID、测试ID、节点、是否通过、耗时）
+        test_stats - 每个测试的全量累计统计（执行次数、失败次数、翻转次数等），写入时增量维护
+        baselines - 命名的性能基线（每个测试的耗时中位数与MAD）
+
+    results 表按 (test_id, run_id)、run_id 和 node_id 建立索引，单个测试的趋势查询
+    只需扫描该测试的索引范围，最近N次执行的统计只扫描对应批次范围；全部历史的
+    统计直接读取 test_stats，与历史执行次数无关
+    """
+
+    DEFAULT_PATH = os.path.join(".disttest", "history.db")
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS runs (
+        run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        mode TEXT,
+        started_at REAL NOT NULL,
+        ended_at REAL,
+        total INTEGER NOT NULL DEFAULT 0,
+        passed INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        duration REAL NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS tests (
+        test_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS results (
+        run_id INTEGER NOT NULL REFERENCES runs(run_id),
+        test_id INTEGER NOT NULL REFERENCES tests(test_id),
+        node_id TEXT,
+        success INTEGER NOT NULL,
+        duration REAL NOT NULL,
+        started_at REAL
+    );
+    CREATE TABLE IF NOT EXISTS test_stats (
+        test_id INTEGER PRIMARY KEY REFERENCES tests(test_id),
+        runs INTEGER NOT NULL,
+        failures INTEGER NOT NULL,
+        flips INTEGER NOT NULL,
+        duration_sum REAL NOT NULL,
+        last_success INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS baselines (
+        name TEXT NOT NULL,
+        test_id INTEGER NOT NULL REFERENCES tests(test_id),
+        median REAL NOT NULL,
+        mad REAL NOT NULL,
+        samples INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        PRIMARY KEY (name, test_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_results_test_run ON results(test_id, run_id);
+    CREATE INDEX IF NOT EXISTS idx_results_run ON results(run_id);
+    CREATE INDEX IF NOT EXISTS idx_results_node ON results(node_id, run_id);
+    """
+
+    def __init__(self, db_path: str = None):
+        """
+        Args:
+            db_path: 数据库文件路径，默认为当前目录下的 .disttest/history.db
+        """
+        self.db_path = db_path or self.DEFAULT_PATH
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def __enter__(self) -> 'HistoryStore':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def record_run(self, name: str, mode: str, started_at: float, ended_at: float,
+                   rows: Iterable[Tuple[str, Optional[str], bool, float, Optional[float]]]) -> int:
+        """在一个事务中写入一次执行的全部结果
+
+        Args:
+            name: 测试套件名称
+            mode: 运行模式
+            started_at: 开始时间（时间戳）
+            ended_at: 结束时间（时间戳）
+            rows: (测试名称, 节点ID, 是否通过, 耗时, 开始时间) 序列
+
+        Returns:
+            本次执行的批次ID
+        """
+        rows = list(rows)
+        passed = sum(1 for row in rows if row[2])
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (name, mode, started_at, ended_at, total, passed, failed, duration) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, mode, started_at, ended_at, len(rows), passed, len(rows) - passed, ended_at - started_at))
+            run_id = cursor.lastrowid
+
+            test_ids = self._get_test_ids({row[0] for row in rows})
+            self.conn.executemany(
+                "INSERT INTO results (run_id, test_id, node_id, success, duration, started_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, test_ids[test_name], node_id, int(success), duration, started)
+                 for test_name, node_id, success, duration, started in rows])
+            self._update_test_stats([(test_ids[row[0]], row[2], row[3]) for row in rows])
+        return run_id
+
+    def _update_test_stats(self, outcomes: List[Tuple[int, bool, float]]) -> None:
+        """增量更新测试的累计统计"""
+        stats: Dict[int, List] = {}
+        test_ids = list({test_id for test_id, _, _ in outcomes})
+        for offset in range(0, len(test_ids), 500):
+            batch = test_ids[offset:offset + 500]
+            placeholders = ",".join("?" * len(batch))
+            for row in self.conn.execute(
+                    "SELECT test_id, runs, failures, flips, duration_sum, last_success "
+                    f"FROM test_stats WHERE test_id IN ({placeholders})", batch):
+                stats[row[0]] = list(row[1:])
+
+        for test_id, success, duration in outcomes:
+            entry = stats.get(test_id)
+            if entry is None:
+                stats[test_id] = [1, int(not success), 0, duration, int(success)]
+                continue
+            entry[0] += 1
+            entry[1] += int(not success)
+            entry[2] += int(entry[4] != int(success))
+            entry[3] += duration
+            entry[4] = int(success)
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO test_stats (test_id, runs, failures, flips, duration_sum, last_success) "
+            "VALUES (?, ?, ?, ?, ?, ?)", [(test_id, *entry) for test_id, entry in stats.items()])
+
+    def _get_test_ids(self, names: Iterable[str]) -> Dict[str, int]:
+        """获取测试名称对应的ID，不存在时创建"""
+        names = list(names)
+        self.conn.executemany("INSERT OR IGNORE INTO tests (name) VALUES (?)", [(name,) for name in names])
+        test_ids = {}
+        # 分批查询，避免超过SQLite的参数数量限制
+        for offset in range(0, len(names), 500):
+            batch = names[offset:offset + 500]
+            placeholders = ",".join("?" * len(batch))
+            for test_id, name in self.conn.execute(
+                    f"SELECT test_id, name FROM tests WHERE name IN ({placeholders})", batch):
+                test_ids[name] = test_id
+        return test_ids
+
+    def _recent_runs_clause(self, last_runs: Optional[int]) -> Tuple[str, str, Tuple]:
+        """限制查询范围为最近N次执行
+
+        先查出起始批次ID再作为常量传入，并指定使用 run_id 索引，只扫描最近批次的结果
+
+        Returns:
+            (results表引用, 附加的WHERE条件, 参数)
+        """
+        if not last_runs:
+            return "results r", "", ()
+        first_run_id = self.conn.execute(
+            "SELECT run_id FROM runs ORDER BY run_id DESC LIMIT 1 OFFSET ?", (last_runs - 1,)).fetchone()
+        if first_run_id is None:
+            return "results r", "", ()
+        return "results r INDEXED BY idx_results_run", " AND r.run_id >= ?", (first_run_id[0],)
+
+    def list_runs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """最近的执行记录，按时间倒序"""
+        cursor = self.conn.execute(
+            "SELECT run_id, name, mode, started_at, total, passed, failed, duration "
+            "FROM runs ORDER BY run_id DESC LIMIT ?", (limit,))
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def duration_trend(self, test_name: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """单个测试最近若干次执行的耗时，按时间正序
+
+        Args:
+            test_name: 测试ID（模块.类名.方法名）
+            limit: 返回的最大记录数
+        """
+        cursor = self.conn.execute(
+            "SELECT * FROM ("
+            "  SELECT r.run_id, runs.started_at, r.node_id, r.success, r.duration "
+            "  FROM results r JOIN tests t ON t.test_id = r.test_id JOIN runs ON runs.run_id = r.run_id "
+            "  WHERE t.name = ? ORDER BY r.run_id DESC LIMIT ?"
+            ") ORDER BY run_id", (test_name, limit))
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def failure_rates(self, last_runs: Optional[int] = None, top: int = 20,
+                      min_runs: int = 1) -> List[Dict[str, Any]]:
+        """失败率最高的测试
+
+        Args:
+            last_runs: 只统计最近N次执行，None表示全部历史
+            top: 返回的最大条数
+            min_runs: 至少执行过该次数的测试才参与统计
+        """
+        if not last_runs:
+            cursor = self.conn.execute(
+                "SELECT t.name AS test_name, s.runs, s.failures, CAST(s.failures AS REAL) / s.runs AS failure_rate, "
+                "  s.duration_sum / s.runs AS avg_duration "
+                "FROM test_stats s JOIN tests t ON t.test_id = s.test_id "
+                "WHERE s.runs >= ? AND s.failures > 0 "
+                "ORDER BY failure_rate DESC, s.failures DESC LIMIT ?", (min_runs, top))
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor]
+
+        source, clause, params = self._recent_runs_clause(last_runs)
+        cursor = self.conn.execute(
+            "SELECT t.name AS test_name, COUNT(*) AS runs, SUM(1 - r.success) AS failures, "
+            "  AVG(1.0 - r.success) AS failure_rate, AVG(r.duration) AS avg_duration "
+            f"FROM {source} JOIN tests t ON t.test_id = r.test_id "
+            f"WHERE 1 = 1{clause} "
+            "GROUP BY r.test_id HAVING COUNT(*) >= ? AND SUM(1 - r.success) > 0 "
+            "ORDER BY failure_rate DESC, failures DESC LIMIT ?", params + (min_runs, top))
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def flaky_tests(self, last_runs: Optional[int] = 50, top: int = 20,
+                    min_runs: int = 2) -> List[Dict[str, Any]]:
+        """不稳定测试排行
+
+        不稳定度 = 相邻两次执行结果在通过/失败之间翻转的次数 / (执行次数 - 1)，
+        一直失败的测试不稳定度为0，交替通过失败的测试接近1
+
+        Args:
+            last_runs: 只统计最近N次执行，None表示全部历史
+            top: 返回的最大条数
+            min_runs: 至少执行过该次数的测试才参与统计
+        """
+        if not last_runs:
+            cursor = self.conn.execute(
+                "SELECT t.name AS test_name, s.runs, s.failures, s.flips, "
+                "  CAST(s.flips AS REAL) / (s.runs - 1) AS flakiness "
+                "FROM test_stats s JOIN tests t ON t.test_id = s.test_id "
+                "WHERE s.runs >= ? AND s.flips > 0 "
+                "ORDER BY flakiness DESC, s.flips DESC LIMIT ?", (max(2, min_runs), top))
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor]
+        if sqlite3.sqlite_version_info < (3, 25, 0):
+            return self._flaky_tests_fallback(last_runs, top, min_runs)
+
+        source, clause, params = self._recent_runs_clause(last_runs)
+        cursor = self.conn.execute(
+            "SELECT t.name AS test_name, COUNT(*) AS runs, SUM(1 - success) AS failures, "
+            "  SUM(flipped) AS flips, CAST(SUM(flipped) AS REAL) / (COUNT(*) - 1) AS flakiness "
+            "FROM ("
+            "  SELECT r.test_id, r.success, "
+            "    COALESCE(r.success != LAG(r.success) OVER (PARTITION BY r.test_id ORDER BY r.run_id), 0) "
+            "      AS flipped "
+            f"  FROM {source} WHERE 1 = 1{clause}"
+            ") s JOIN tests t ON t.test_id = s.test_id "
+            "GROUP BY s.test_id HAVING COUNT(*) >= ? AND SUM(flipped) > 0 "
+            "ORDER BY flakiness DESC, flips DESC LIMIT ?", params + (max(2, min_runs), top))
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def _flaky_tests_fallback(self, last_runs: Optional[int], top: int, min_runs: int) -> List[Dict[str, Any]]:
+        """SQLite版本不支持窗口函数时，在Python中计算不稳定度"""
+        source, clause, params = self._recent_runs_clause(last_runs)
+        history: Dict[str, List[int]] = {}
+        for name, success in self.conn.execute(
+                f"SELECT t.name, r.success FROM {source} JOIN tests t ON t.test_id = r.test_id "
+                f"WHERE 1 = 1{clause} ORDER BY r.test_id, r.run_id", params):
+            history.setdefault(name, []).append(success)
+
+        flaky = []
+        for name, outcomes in history.items():
+            flips = sum(1 for previous, current in zip(outcomes, outcomes[1:]) if previous != current)
+            if len(outcomes) >= max(2, min_runs) and flips:
+                flaky.append({"test_name": name, "runs": len(outcomes), "failures": outcomes.count(0),
+                              "flips": flips, "flakiness": flips / (len(outcomes) - 1)})
+        flaky.sort(key=lambda item: (item["flakiness"], item["flips"]), reverse=True)
+        return flaky[:top]
+
+    def recent_durations(self, last_runs: int = 10) -> Dict[str, List[float]]:
+        """最近N次执行中每个测试的耗时列表（只包含通过的执行）"""
+        source, clause, params = self._recent_runs_clause(last_runs)
+        durations: Dict[str, List[float]] = {}
+        for name, duration in self.conn.execute(
+                f"SELECT t.name, r.duration FROM {source} JOIN tests t ON t.test_id = r.test_id "
+                f"WHERE r.success = 1{clause} ORDER BY r.run_id", params):
+            durations.setdefault(name, []).append(duration)
+        return durations
+
+    def average_durations(self, keys: Iterable[str]) -> Dict[str, float]:
+        """全部历史中每个测试单个用例的平均耗时，参数化方法的各参数组合并计入该方法
+
+        直接读取 test_stats 的累计统计，与历史执行次数无关
+
+        Args:
+            keys: 测试ID（模块.类名.方法名），参数化方法不带参数标识
+
+        Returns:
+            测试ID -> 平均耗时（秒），只包含有执行记录的测试
+        """
+        keys = set(keys)
+        totals: Dict[str, List[float]] = {}
+        for name, duration_sum, runs in self.conn.execute(
+                "SELECT t.name, s.duration_sum, s.runs FROM test_stats s JOIN tests t ON t.test_id = s.test_id"):
+            key = name.split("[", 1)[0]
+            if key in keys:
+                total = totals.setdefault(key, [0.0, 0])
+                total[0] += duration_sum
+                total[1] += runs
+        return {key: duration_sum / runs for key, (duration_sum, runs) in totals.items() if runs}
+
+    def save_baseline(self, name: str, baseline: Dict[str, Tuple[float, float, int]]) -> None:
+        """保存命名基线，同名基线会被覆盖
+
+        Args:
+            name: 基线名称
+            baseline: 测试名称 -> (耗时中位数, MAD, 样本数)
+        """
+        created_at = time.time()
+        with self.conn:
+            self.conn.execute("DELETE FROM baselines WHERE name = ?", (name,))
+            test_ids = self._get_test_ids(baseline.keys())
+            self.conn.executemany(
+                "INSERT INTO baselines (name, test_id, median, mad, samples, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(name, test_ids[test_name], median, mad, samples, created_at)
+                 for test_name, (median, mad, samples) in baseline.items()])
+
+    def get_baseline(self, name: str) -> Dict[str, Tuple[float, float, int]]:
+        """读取命名基线"""
+        return {test_name: (median, mad, samples) for test_name, median, mad, samples in self.conn.execute(
+            "SELECT t.name, b.median, b.mad, b.samples FROM baselines b JOIN tests t ON t.test_id = b.test_id "
+            "WHERE b.name = ?", (name,))}
+
+    def list_baselines(self) -> List[Dict[str, Any]]:
+        """所有命名基线"""
+        cursor = self.conn.execute(
+            "SELECT name, COUNT(*) AS tests, MAX(created_at) AS created_at FROM baselines GROUP BY name ORDER BY name")
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    @staticmethod
+    def format_time(timestamp: float) -> str:
+        """格式化时间戳"""
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
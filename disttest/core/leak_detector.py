@@ -0,0 +1,183 @@
+"""
+LeakDetector类 - 内存泄漏检测
+基于tracemalloc快照，统计每个测试方法（或测试类）执行后残留的内存增长
+"""
+import gc
+import os
+import threading
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+
+class LeakDetector:
+    """内存泄漏检测器
+
+    在测试方法或测试类执行前后各拍摄一次tracemalloc快照，两次快照之差即为
+    该测试残留下来的内存（例如写入模块全局变量的数据）。残留量超过阈值的
+    测试会被标记为疑似泄漏。
+
+    注意: tracemalloc统计的是整个进程的内存分配，线程后端的工作者并发执行时
+    测试之间会互相干扰，因此分布式执行只支持process后端（WorkerPool 拒绝线程后端），
+    每个工作进程各自跟踪、各自累计残留内存。
+    """
+
+    SCOPES = ("method", "class")
+
+    def __init__(self, threshold_kb: float = 100.0, scope: str = "method",
+                 memory_budget_mb: Optional[float] = None, frames: int = 1, top: int = 5):
+        """
+        Args:
+            threshold_kb: 残留内存超过该值（KB）时标记为疑似泄漏
+            scope: 快照粒度，method（每个测试方法）或 class（每个测试类）
+            memory_budget_mb: 单个工作者累计残留内存上限（MB），超过后回收该工作者
+            frames: tracemalloc记录的调用栈深度
+            top: 每个测试记录的最大分配来源条数
+        """
+        if scope not in self.SCOPES:
+            raise ValueError(f"不支持的快照粒度: {scope}，可选值: {', '.join(self.SCOPES)}")
+
+        self.threshold_bytes = int(threshold_kb * 1024)
+        self.scope = scope
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024) if memory_budget_mb else None
+        self.frames = frames
+        self.top = top
+        self._retained: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._started_tracing = False
+        self._filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # 传递到工作进程时不携带锁和父进程的统计数据
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_retained"] = {}
+        state["_started_tracing"] = False
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """开始跟踪内存分配"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        """停止跟踪内存分配（仅停止由本检测器开启的跟踪）"""
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_tracing = False
+
+    def take_snapshot(self) -> tracemalloc.Snapshot:
+        """回收垃圾后拍摄快照，只保留真正残留的内存"""
+        gc.collect()
+        return tracemalloc.take_snapshot().filter_traces(self._filters)
+
+    def measure(self, before: tracemalloc.Snapshot) -> Dict[str, Any]:
+        """与之前的快照比较，返回残留内存信息
+
+        Args:
+            before: 测试执行前拍摄的快照
+
+        Returns:
+            残留内存信息字典
+        """
+        after = self.take_snapshot()
+        stats = after.compare_to(before, "lineno")
+        retained = sum(stat.size_diff for stat in stats)
+        growth = [stat for stat in stats if stat.size_diff > 0]
+
+        return {
+            "scope": self.scope,
+            "retained_bytes": retained,
+            "leak": retained > self.threshold_bytes,
+            "top_allocations": [
+                {
+                    "location": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                    "size_diff": stat.size_diff,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in growth[:self.top]
+            ],
+        }
+
+    def record(self, worker_id: str, results: List[Any]) -> None:
+        """把一个工作单元的测试结果中的残留内存累计到执行它的工作者
+
+        类级别的检测结果附加在该类的每个测试方法上，只累计一次
+
+        Args:
+            worker_id: 执行测试的工作者ID
+            results: TestMethodResult列表
+        """
+        retained = 0
+        seen_classes = set()
+        for method_result in results:
+            memory = method_result.additional_data.get("memory")
+            if not memory:
+                continue
+            if memory["scope"] == "class":
+                class_id = method_result.test_id.rsplit(".", 1)[0]
+                if class_id in seen_classes:
+                    continue
+                seen_classes.add(class_id)
+            retained += max(0, memory["retained_bytes"])
+        with self._lock:
+            self._retained[worker_id] = self._retained.get(worker_id, 0) + retained
+
+    def get_retained(self, worker_id: str) -> int:
+        """获取工作者累计的残留内存（字节）"""
+        with self._lock:
+            return self._retained.get(worker_id, 0)
+
+    def is_over_budget(self, worker_id: str) -> bool:
+        """检查工作者的累计残留内存是否超过预算"""
+        if self.memory_budget_bytes is None:
+            return False
+        return self.get_retained(worker_id) > self.memory_budget_bytes
+
+    def reset_worker(self, worker_id: str) -> None:
+        """工作者被回收后清零其累计残留内存"""
+        with self._lock:
+            self._retained.pop(worker_id, None)
+
+    @staticmethod
+    def collect_leaks(results: List[Any]) -> List[Dict[str, Any]]:
+        """从测试方法结果中汇总疑似泄漏的测试
+
+        类级别的检测结果会附加到该类的每个测试方法上，这里按类去重
+
+        Args:
+            results: TestMethodResult列表
+
+        Returns:
+            按残留内存从大到小排序的疑似泄漏列表
+        """
+        leaks = []
+        seen_classes = set()
+        for method_result in results:
+            memory = method_result.additional_data.get("memory")
+            if not memory or not memory.get("leak"):
+                continue
+            if memory["scope"] == "class":
+                test_name = method_result.test_id.rsplit(".", 1)[0]
+                if test_name in seen_classes:
+                    continue
+                seen_classes.add(test_name)
+            else:
+                test_name = method_result.test_id
+            leaks.append({
+                "test_name": test_name,
+                "scope": memory["scope"],
+                "retained_bytes": memory["retained_bytes"],
+                "top_allocations": memory["top_allocations"],
+            })
+        leaks.sort(key=lambda leak: leak["retained_bytes"], reverse=True)
+        return leaks
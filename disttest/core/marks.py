@@ -0,0 +1,43 @@
+"""
+测试标记
+提供 @mark 装饰器，为测试用例类或测试方法打上标签，用于 -m 表达式选择测试
+"""
+from typing import Any, Callable, FrozenSet
+
+# 记录标记的属性名
+MARKS_ATTR = "__disttest_marks__"
+# 可以重复执行的测试，调度器可以在执行尾部为其启动推测执行的副本
+IDEMPOTENT = "idempotent"
+
+
+def mark(*names: str) -> Callable:
+    """为测试用例类或测试方法添加标记
+
+    类上的标记作用于所有方法（子类继承父类的标记），方法上的标记与类上的标记合并:
+
+        @mark("db")
+        class UserTest(TestCase):
+            @mark("slow")
+            def test_migration(self):
+                ...
+
+    标记名称必须是字符串常量，测试发现时不导入模块即可从源码中读取
+
+    Args:
+        names: 标记名称
+    """
+    for name in names:
+        if not isinstance(name, str) or not name.isidentifier():
+            raise ValueError(f"标记名称必须是合法的标识符: {name!r}")
+
+    def decorator(target: Any) -> Any:
+        setattr(target, MARKS_ATTR, frozenset(getattr(target, MARKS_ATTR, frozenset())) | frozenset(names))
+        return target
+
+    return decorator
+
+
+def get_marks(test_case: type, method_name: str) -> FrozenSet[str]:
+    """获取测试方法的全部标记（类标记与方法标记的并集）"""
+    return (frozenset(getattr(test_case, MARKS_ATTR, frozenset()))
+            | frozenset(getattr(getattr(test_case, method_name, None), MARKS_ATTR, frozenset())))
@@ -0,0 +1,152 @@
+"""
+参数化测试支持
+提供 @parametrize 装饰器，将一个测试方法按参数表展开为多个可单独调度的测试用例
+"""
+import inspect
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+# 记录参数表的属性名
+PARAMETRIZE_ATTR = "__disttest_parametrize__"
+
+
+@dataclass
+class ParameterSet:
+    """一个 @parametrize 装饰器声明的参数表"""
+    argnames: List[str]
+    source: Union[Sequence[Any], Callable[[], Iterable[Any]]]
+    ids: Optional[Union[Sequence[str], Callable[[Any], str]]] = None
+
+    def rows(self) -> Iterable[Any]:
+        """按需生成参数行，参数表为函数时每次调用得到新的生成器"""
+        return self.source() if callable(self.source) else self.source
+
+    def count(self) -> Optional[int]:
+        """参数行数，由生成器函数提供的参数表返回None"""
+        if callable(self.source):
+            return None
+        return len(self.source)
+
+    def bind(self, row: Any) -> Dict[str, Any]:
+        """将一行参数绑定到参数名"""
+        if isinstance(row, dict):
+            return row
+        if len(self.argnames) == 1:
+            return {self.argnames[0]: row}
+        if len(row) != len(self.argnames):
+            raise ValueError(f"参数个数不匹配: 需要 {len(self.argnames)} 个 ({', '.join(self.argnames)})，实际为 {row!r}")
+        return dict(zip(self.argnames, row))
+
+    def case_id(self, index: int, row: Any) -> str:
+        """参数行的标识"""
+        if self.ids is None:
+            return str(index)
+        if callable(self.ids):
+            return str(self.ids(row))
+        return str(self.ids[index])
+
+
+def parametrize(argnames: Union[str, Sequence[str]],
+                argvalues: Union[Sequence[Any], Callable[[], Iterable[Any]]],
+                ids: Optional[Union[Sequence[str], Callable[[Any], str]]] = None) -> Callable:
+    """将测试方法按参数表展开为多个测试用例
+
+    每组参数是一个单独的测试用例，标识为 方法名[参数标识]。参数表很大时可以传入
+    返回生成器的函数，参数只在执行时逐行生成，主控节点不会一次性展开整张表:
+
+        @parametrize("a, b, expected", [(1, 2, 3), (2, 3, 5)])
+        def test_add(self, a, b, expected):
+            ...
+
+        @parametrize("row", lambda: read_rows("cases.csv"), ids=lambda row: row["name"])
+        def test_case_file(self, row):
+            ...
+
+    叠加多个装饰器时按各参数表的笛卡尔积展开
+
+    Args:
+        argnames: 参数名，逗号分隔的字符串或字符串列表
+        argvalues: 参数行序列，或返回可迭代参数行的函数
+        ids: 参数标识列表，或根据参数行生成标识的函数，默认使用序号。标识重复时第二次及以后
+            出现的用例依次加上 -1、-2 ... 后缀，保证每个用例的测试ID唯一
+    """
+    if isinstance(argnames, str):
+        argnames = [name.strip() for name in argnames.split(",") if name.strip()]
+    if inspect.isgenerator(argvalues) or (not callable(argvalues) and not hasattr(argvalues, "__len__")):
+        raise TypeError("argvalues 必须是序列或返回可迭代对象的函数，生成器对象只能遍历一次，请传入生成器函数")
+
+    parameter_set = ParameterSet(list(argnames), argvalues, ids)
+
+    def decorator(method: Callable) -> Callable:
+        parameter_sets = getattr(method, PARAMETRIZE_ATTR, [])
+        setattr(method, PARAMETRIZE_ATTR, [parameter_set] + parameter_sets)
+        return method
+
+    return decorator
+
+
+def is_parametrized(method: Callable) -> bool:
+    """判断方法是否为参数化测试"""
+    return bool(getattr(method, PARAMETRIZE_ATTR, None))
+
+
+def count_cases(method: Callable) -> Optional[int]:
+    """参数化方法展开后的测试用例数，任一参数表数量未知时返回None"""
+    total = 1
+    for parameter_set in getattr(method, PARAMETRIZE_ATTR, []):
+        count = parameter_set.count()
+        if count is None:
+            return None
+        total *= count
+    return total
+
+
+def _product(parameter_sets: List[ParameterSet]) -> Iterator[Tuple[List[str], Dict[str, Any]]]:
+    """逐个生成参数表的笛卡尔积，内层参数表在每次外层迭代时重新生成"""
+    if not parameter_sets:
+        yield [], {}
+        return
+    first, rest = parameter_sets[0], parameter_sets[1:]
+    for index, row in enumerate(first.rows()):
+        case_id, params = first.case_id(index, row), first.bind(row)
+        for rest_ids, rest_params in _product(rest):
+            yield [case_id] + rest_ids, dict(params, **rest_params)
+
+
+def iterate_cases(method: Callable, shard: Optional[Tuple[int, int]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """按需生成参数化方法的测试用例
+
+    Args:
+        method: 参数化测试方法
+        shard: (分片序号, 分片总数)，指定时只生成序号对分片总数取模等于分片序号的用例
+
+    Yields:
+        (用例标识, 参数字典)
+    """
+    parameter_sets = getattr(method, PARAMETRIZE_ATTR, [])
+    # 默认的序号标识不会重复，只有指定了 ids 时才需要记录已出现的标识。所有分片都遍历完整的
+    # 参数表，重复标识的后缀在各分片中一致
+    seen: Optional[Dict[str, int]] = None
+    if any(parameter_set.ids is not None for parameter_set in parameter_sets):
+        seen = {}
+    for index, (case_ids, params) in enumerate(_product(parameter_sets)):
+        case_id = "-".join(case_ids)
+        if seen is not None:
+            case_id = _unique_id(case_id, seen)
+        if shard is not None and index % shard[1] != shard[0]:
+            continue
+        yield case_id, params
+
+
+def _unique_id(case_id: str, seen: Dict[str, int]) -> str:
+    """标识已出现过时加上序号后缀，seen 记录各标识下一个可用的后缀"""
+    if case_id not in seen:
+        seen[case_id] = 1
+        return case_id
+    suffix = seen[case_id]
+    while f"{case_id}-{suffix}" in seen:
+        suffix += 1
+    seen[case_id] = suffix + 1
+    unique = f"{case_id}-{suffix}"
+    seen[unique] = 1
+    return unique
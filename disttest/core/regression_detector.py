@@ -0,0 +1,116 @@
+"""
+RegressionDetector类 - 性能回归检测
+将本次执行的测试耗时与历史基线（最近N次执行或命名基线）比较，标记明显变慢的测试
+"""
+import statistics
+from typing import Any, Dict, List, Optional, Tuple
+
+from .history_store import HistoryStore
+
+# 正态分布下MAD与标准差的换算系数
+MAD_SCALE = 1.4826
+
+
+class RegressionDetector:
+    """性能回归检测器
+
+    对每个测试计算基线耗时的中位数与MAD（中位数绝对偏差），本次耗时同时满足以下
+    条件时判定为回归:
+        耗时 > 中位数 + threshold * 1.4826 * MAD
+        耗时 > 中位数 * (1 + min_ratio)
+        耗时 - 中位数 > min_delta
+    后两个条件用于过滤基线几乎没有波动、或耗时极短的测试产生的误报
+    """
+
+    def __init__(self, db_path: str = None, baseline_runs: int = 10, baseline_name: Optional[str] = None,
+                 threshold: float = 3.0, min_ratio: float = 0.2, min_delta: float = 0.005,
+                 min_samples: int = 3):
+        """
+        Args:
+            db_path: 历史数据库路径
+            baseline_runs: 未指定命名基线时，使用最近N次执行作为基线
+            baseline_name: 命名基线（由 disttest history baseline 保存）
+            threshold: 超出中位数的MAD倍数
+            min_ratio: 相对中位数的最小变慢比例
+            min_delta: 最小变慢时间（秒）
+            min_samples: 基线中至少包含的样本数，样本不足的测试不参与检测
+        """
+        self.db_path = db_path or HistoryStore.DEFAULT_PATH
+        self.baseline_runs = baseline_runs
+        self.baseline_name = baseline_name
+        self.threshold = threshold
+        self.min_ratio = min_ratio
+        self.min_delta = min_delta
+        self.min_samples = min_samples
+
+    @staticmethod
+    def summarize(durations: List[float]) -> Tuple[float, float]:
+        """计算耗时的中位数与MAD
+
+        Returns:
+            (中位数, MAD)
+        """
+        median = statistics.median(durations)
+        mad = statistics.median(abs(duration - median) for duration in durations)
+        return median, mad
+
+    def load_baseline(self) -> Dict[str, Tuple[float, float, int]]:
+        """读取基线
+
+        Returns:
+            测试名称 -> (中位数, MAD, 样本数)
+        """
+        with HistoryStore(self.db_path) as store:
+            if self.baseline_name:
+                baseline = store.get_baseline(self.baseline_name)
+                if not baseline:
+                    raise ValueError(f"基线不存在: {self.baseline_name}")
+                return baseline
+            durations = store.recent_durations(self.baseline_runs)
+
+        baseline = {}
+        for test_name, samples in durations.items():
+            median, mad = self.summarize(samples)
+            baseline[test_name] = (median, mad, len(samples))
+        return baseline
+
+    def is_regression(self, duration: float, median: float, mad: float) -> bool:
+        """判断耗时相对基线是否回归"""
+        return (duration > median + self.threshold * MAD_SCALE * mad
+                and duration > median * (1 + self.min_ratio)
+                and duration - median > self.min_delta)
+
+    def detect(self, results: List[Any]) -> List[Dict[str, Any]]:
+        """检测本次执行中的性能回归
+
+        只检测通过的测试，失败测试的耗时没有可比性
+
+        Args:
+            results: TestMethodResult列表
+
+        Returns:
+            按变慢比例从大到小排序的回归列表
+        """
+        baseline = self.load_baseline()
+        regressions = []
+        for method_result in results:
+            if not method_result.success:
+                continue
+            test_name = method_result.test_id
+            if test_name not in baseline:
+                continue
+            median, mad, samples = baseline[test_name]
+            if samples < self.min_samples:
+                continue
+            duration = method_result.execution_time
+            if self.is_regression(duration, median, mad):
+                regressions.append({
+                    "test_name": test_name,
+                    "duration": duration,
+                    "baseline_median": median,
+                    "baseline_mad": mad,
+                    "samples": samples,
+                    "slowdown": duration / median if median > 0 else None,
+                })
+        regressions.sort(key=lambda regression: regression["slowdown"] or float("inf"), reverse=True)
+        return regressions
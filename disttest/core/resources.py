@@ -0,0 +1,99 @@
+"""
+测试资源需求
+测试用例类和测试方法通过 @requires 声明执行时占用的资源（CPU、内存、独占锁），
+调度器据此在节点容量范围内安排并发执行的工作单元
+"""
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# 记录资源需求的属性名
+RESOURCES_ATTR = "__disttest_resources__"
+
+# 节点未声明容量时的默认值：同一时间只执行一个默认需求的工作单元
+DEFAULT_CAPACITY = {"cpu": 1.0, "memory": None}
+
+
+@dataclass(frozen=True)
+class Resources:
+    """资源需求"""
+    cpu: float = 1.0  # 占用的CPU份额
+    memory: float = 0.0  # 占用的内存（MB）
+    locks: Tuple[str, ...] = ()  # 需要独占的锁名称，持有同名锁的工作单元不会同时执行
+
+    def combine(self, other: "Resources") -> "Resources":
+        """合并两组需求：工作单元中的方法依次执行，取各项的最大值与锁的并集"""
+        return Resources(
+            cpu=max(self.cpu, other.cpu),
+            memory=max(self.memory, other.memory),
+            locks=tuple(sorted(set(self.locks) | set(other.locks))),
+        )
+
+    def fits(self, capacity: Dict[str, Optional[float]]) -> bool:
+        """需求是否在给定容量之内，容量项为None表示不限制"""
+        if capacity.get("cpu") is not None and self.cpu > capacity["cpu"]:
+            return False
+        if capacity.get("memory") is not None and self.memory > capacity["memory"]:
+            return False
+        return True
+
+    @property
+    def weight(self) -> Tuple[float, float, int]:
+        """排序用的权重，重的工作单元优先派发"""
+        return self.cpu, self.memory, len(self.locks)
+
+
+def requires(cpu: Optional[float] = None, memory: Optional[float] = None,
+             locks: Iterable[str] = ()) -> Callable:
+    """声明测试用例类或测试方法的资源需求
+
+    类上的声明作用于所有方法，方法上的声明覆盖类上对应的项:
+
+        @requires(memory=2048)
+        class ModelTest(TestCase):
+            @requires(cpu=4, locks=["ports-8000"])
+            def test_serving(self):
+                ...
+
+    Args:
+        cpu: 占用的CPU份额，默认为1
+        memory: 占用的内存（MB），默认为0
+        locks: 需要独占的锁名称，例如端口段或外部服务
+    """
+    if isinstance(locks, str):
+        locks = [locks]
+    overrides: Dict[str, Any] = {}
+    if cpu is not None:
+        if cpu < 0:
+            raise ValueError(f"cpu 不能为负数: {cpu}")
+        overrides["cpu"] = float(cpu)
+    if memory is not None:
+        if memory < 0:
+            raise ValueError(f"memory 不能为负数: {memory}")
+        overrides["memory"] = float(memory)
+    if locks:
+        overrides["locks"] = tuple(sorted(set(locks)))
+
+    def decorator(target: Any) -> Any:
+        setattr(target, RESOURCES_ATTR, overrides)
+        return target
+
+    return decorator
+
+
+def get_requirements(test_case: type, methods: Optional[Iterable[str]] = None) -> Resources:
+    """计算测试用例类（或其中部分方法）的资源需求
+
+    Args:
+        test_case: 测试用例类
+        methods: 需要执行的方法名，None表示全部测试方法
+
+    Returns:
+        各方法需求合并后的结果
+    """
+    class_resources = replace(Resources(), **getattr(test_case, RESOURCES_ATTR, {}))
+    result = class_resources
+    for method_name in methods if methods is not None else test_case.get_test_methods():
+        overrides = getattr(getattr(test_case, method_name, None), RESOURCES_ATTR, None)
+        if overrides:
+            result = result.combine(replace(class_resources, **overrides))
+    return result
@@ -0,0 +1,146 @@
+"""
+测试选择
+将 -k 关键字表达式和 -m 标记表达式编译为判断函数，用于在测试发现索引或已导入的测试用例类上
+筛选测试方法
+
+表达式由 and、or、not、括号和单词组成:
+    -k "login and not slow_api"   单词为测试ID (模块.类名.方法名) 中的子串，不区分大小写
+    -m "db and not slow"          单词为标记名称
+"""
+import re
+from typing import Callable, FrozenSet, Iterable, List, Optional
+
+from .marks import get_marks
+
+_TOKEN = re.compile(r"\s*(\(|\)|[^\s()]+)")
+_OPERATORS = ("and", "or", "not")
+
+
+class _Parser:
+    """递归下降解析表达式，生成等价的Python表达式源码
+
+    expr := term ("or" term)*
+    term := factor ("and" factor)*
+    factor := "not" factor | "(" expr ")" | 单词
+    """
+
+    def __init__(self, expression: str, operand: Callable[[str], str]):
+        self.expression = expression
+        self.operand = operand
+        self.tokens = _TOKEN.findall(expression)
+        self.position = 0
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _take(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise ValueError(f"选择表达式不完整: {self.expression!r}")
+        self.position += 1
+        return token
+
+    def parse(self) -> str:
+        if not self.tokens:
+            raise ValueError("选择表达式为空")
+        source = self._expr()
+        if self._peek() is not None:
+            raise ValueError(f"选择表达式在 {self._peek()!r} 处有多余内容: {self.expression!r}")
+        return source
+
+    def _expr(self) -> str:
+        parts = [self._term()]
+        while self._peek() == "or":
+            self._take()
+            parts.append(self._term())
+        return parts[0] if len(parts) == 1 else "(" + " or ".join(parts) + ")"
+
+    def _term(self) -> str:
+        parts = [self._factor()]
+        while self._peek() == "and":
+            self._take()
+            parts.append(self._factor())
+        return parts[0] if len(parts) == 1 else "(" + " and ".join(parts) + ")"
+
+    def _factor(self) -> str:
+        token = self._take()
+        if token == "not":
+            return f"(not {self._factor()})"
+        if token == "(":
+            source = self._expr()
+            if self._take() != ")":
+                raise ValueError(f"选择表达式缺少右括号: {self.expression!r}")
+            return source
+        if token == ")" or token in _OPERATORS:
+            raise ValueError(f"选择表达式在 {token!r} 处语法错误: {self.expression!r}")
+        return self.operand(token)
+
+
+def _expression_source(expression: str, kind: str) -> str:
+    if kind not in ("keyword", "mark"):
+        raise ValueError(f"不支持的表达式类型: {kind}，可选值: keyword, mark")
+
+    def operand(word: str) -> str:
+        if kind == "keyword":
+            return f"({word.lower()!r} in text)"
+        return f"({word!r} in marks)"
+
+    return _Parser(expression, operand).parse()
+
+
+def _compile(source: str) -> Callable[[str, FrozenSet[str]], bool]:
+    # 源码只由运算符、括号和经过 repr 的字符串常量组成
+    return eval(f"lambda text, marks: {source}", {"__builtins__": {}})
+
+
+def compile_expression(expression: str, kind: str = "keyword") -> Callable[[str, FrozenSet[str]], bool]:
+    """将选择表达式编译为判断函数
+
+    表达式只解析一次，生成的函数只包含字符串常量的成员判断，对每个测试的判断开销与
+    手写的 Python 表达式相同
+
+    Args:
+        expression: 选择表达式
+        kind: keyword 匹配测试ID中的子串，mark 匹配标记名称
+
+    Returns:
+        判断函数 (小写的测试ID, 标记集合) -> 是否选中
+    """
+    return _compile(_expression_source(expression, kind))
+
+
+class Selection:
+    """-k 与 -m 表达式组合成的测试选择条件，两者都指定时需要同时满足"""
+
+    def __init__(self, keyword: Optional[str] = None, marks: Optional[str] = None):
+        """
+        Args:
+            keyword: 关键字表达式
+            marks: 标记表达式
+        """
+        self.keyword = keyword
+        self.marks = marks
+        sources = [_expression_source(expression, kind)
+                   for expression, kind in ((keyword, "keyword"), (marks, "mark")) if expression]
+        # 两个表达式编译为同一个判断函数，每个测试只调用一次
+        self.predicate: Callable[[str, FrozenSet[str]], bool] = _compile(" and ".join(sources) or "True")
+        self._enabled = bool(sources)
+
+    def __bool__(self) -> bool:
+        return self._enabled
+
+    def matches(self, test_id: str, marks: Iterable[str] = frozenset()) -> bool:
+        """判断测试是否被选中
+
+        Args:
+            test_id: 测试ID，模块.类名.方法名
+            marks: 测试的标记
+        """
+        return self.predicate(test_id.lower(), marks)
+
+    def select_methods(self, test_case: type) -> List[str]:
+        """已导入的测试用例类中被选中的测试方法和基准测试方法"""
+        prefix = f"{test_case.__module__}.{test_case.__name__}.".lower()
+        methods = test_case.get_test_methods() + test_case.get_benchmark_methods()
+        return [method_name for method_name in methods
+                if self.predicate(prefix + method_name.lower(), get_marks(test_case, method_name))]
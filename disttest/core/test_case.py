@@ -8,12 +8,17 @@ import traceback
 from typing import Any, Callable, Dict, List, Optional, Tuple, Type
 from datetime import datetime
 
+from .benchmark import is_benchmark, get_options, run_benchmark
+from .parametrize import count_cases, is_parametrized
 from .test_result import TestResult, TestMethodResult
 
 
 class TestCase:
     """测试用例基类，所有测试用例都应继承此类"""
     
+    # 使用的作用域夹具名称，执行前以同名类属性注入
+    fixtures: List[str] = []
+    
     def __init__(self):
         self.results = TestResult()
         self._setup_called = False
@@ -68,31 +73,67 @@ class TestCase:
     
     @classmethod
     def get_test_methods(cls) -> List[str]:
-        """获取类中所有的测试方法"""
+        """获取类中所有的测试方法（不包括基准测试）"""
+        return [
+            name for name, method in inspect.getmembers(cls, predicate=inspect.isfunction)
+            if name.startswith("test_") and not is_benchmark(name, method)
+        ]
+    
+    @classmethod
+    def get_fixture_names(cls) -> List[str]:
+        """获取类使用的作用域夹具名称"""
+        return list(cls.fixtures)
+    
+    @classmethod
+    def get_parametrized_methods(cls) -> List[str]:
+        """获取类中所有的参数化测试方法"""
+        return [method_name for method_name in cls.get_test_methods() if is_parametrized(getattr(cls, method_name))]
+    
+    @classmethod
+    def get_test_case_count(cls) -> int:
+        """获取测试用例数，参数化方法按参数组数计算（参数表为生成器函数时按1计算）"""
+        return sum(count_cases(getattr(cls, method_name)) or 1 for method_name in cls.get_test_methods())
+    
+    @classmethod
+    def get_benchmark_methods(cls) -> List[str]:
+        """获取类中所有的基准测试方法（bench_ 开头或使用 @benchmark 装饰的方法）"""
         return [
             name for name, method in inspect.getmembers(cls, predicate=inspect.isfunction)
-            if name.startswith("test_")
+            if is_benchmark(name, method)
         ]
     
-    def run_test_method(self, method_name: str) -> Tuple[bool, Optional[str], float]:
-        """运行单个测试方法"""
+    def run_test_method(self, method_name: str, params: Optional[Dict[str, Any]] = None,
+                        test_id: Optional[str] = None) -> Tuple[bool, Optional[str], float]:
+        """运行单个测试方法
+        
+        Args:
+            method_name: 测试方法名
+            params: 参数化测试的一组参数，以关键字参数传入测试方法
+            test_id: 结果中记录的测试名称，默认为方法名
+        """
         method = getattr(self, method_name)
+        result_name = test_id or method_name
         start_time = time.time()
         method_start_time = datetime.now()
+        call_start = None
         
         try:
             self.setup()
-            method()
+            call_start = time.time()
+            method(**(params or {}))
             end_time = time.time()
             execution_time = end_time - start_time
             self.teardown()
             
             # 添加成功的测试结果
             result = TestMethodResult(
-                method_name=method_name,
+                method_name=result_name,
                 success=True,
                 execution_time=execution_time,
-                start_time=method_start_time
+                start_time=method_start_time,
+                class_name=type(self).__name__,
+                module=type(self).__module__,
+                timings=self._phase_timings(start_time, call_start, end_time)
             )
             self.results.add_result(result)
             
@@ -105,12 +146,76 @@ class TestCase:
             
             # 添加失败的测试结果
             result = TestMethodResult(
-                method_name=method_name,
+                method_name=result_name,
                 success=False,
                 error_message=f"{type(e).__name__}: {str(e)}\n{error_traceback}",
                 execution_time=execution_time,
-                start_time=method_start_time
+                start_time=method_start_time,
+                class_name=type(self).__name__,
+                module=type(self).__module__,
+                timings=self._phase_timings(start_time, call_start, end_time)
             )
             self.results.add_result(result)
             
-            return False, f"{type(e).__name__}: {str(e)}\n{error_traceback}", execution_time 
\ No newline at end of file
+            return False, f"{type(e).__name__}: {str(e)}\n{error_traceback}", execution_time
+    
+    def run_benchmark_method(self, method_name: str) -> Tuple[bool, Optional[str], float]:
+        """运行单个基准测试方法
+        
+        setup和teardown在整个基准测试前后各执行一次，不计入统计。结果的
+        execution_time 为单次迭代耗时的中位数，完整统计保存在 additional_data["benchmark"] 中
+        """
+        method = getattr(self, method_name)
+        start_time = time.time()
+        method_start_time = datetime.now()
+        call_start = None
+        
+        try:
+            self.setup()
+            call_start = time.time()
+            stats = run_benchmark(method, get_options(method))
+            end_time = time.time()
+            self.teardown()
+            
+            result = TestMethodResult(
+                method_name=method_name,
+                success=True,
+                execution_time=stats["median"],
+                start_time=method_start_time,
+                additional_data={"benchmark": stats},
+                class_name=type(self).__name__,
+                module=type(self).__module__,
+                timings=self._phase_timings(start_time, call_start, end_time)
+            )
+            self.results.add_result(result)
+            
+            return True, None, stats["median"]
+        except Exception as e:
+            end_time = time.time()
+            execution_time = end_time - start_time
+            error_message = f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
+            self.teardown()
+            
+            result = TestMethodResult(
+                method_name=method_name,
+                success=False,
+                error_message=error_message,
+                execution_time=execution_time,
+                start_time=method_start_time,
+                class_name=type(self).__name__,
+                module=type(self).__module__,
+                timings=self._phase_timings(start_time, call_start, end_time)
+            )
+            self.results.add_result(result)
+            
+            return False, error_message, execution_time
+    
+    @staticmethod
+    def _phase_timings(setup_start: float, call_start: Optional[float], teardown_start: float) -> Dict[str, Optional[float]]:
+        """记录setup、测试方法调用和teardown各阶段的开始时间（teardown刚结束时调用）"""
+        return {
+            "setup": setup_start,
+            "call": call_start,
+            "teardown": teardown_start,
+            "end": time.time(),
+        }
\ No newline at end of file
@@ -3,7 +3,10 @@ TestResult类 - 测试结果管理
 """
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Set
+from typing import Dict, List, Optional, Any
+
+# 测试结果状态
+STATUSES = ("passed", "failed")
 
 
 @dataclass
@@ -15,35 +18,134 @@ class TestMethodResult:
     execution_time: float = 0.0
     start_time: datetime = field(default_factory=datetime.now)
     additional_data: Dict[str, Any] = field(default_factory=dict)
+    class_name: str = ""
+    timings: Dict[str, Optional[float]] = field(default_factory=dict)
+    module: str = ""  # 测试用例类所在的模块
+    
+    @property
+    def test_id(self) -> str:
+        """完整的测试ID: 模块.类名.方法名[参数标识]，模块或类名为空时省略"""
+        if self.module and self.class_name:
+            return f"{self.module}.{self.class_name}.{self.method_name}"
+        if self.class_name:
+            return f"{self.class_name}.{self.method_name}"
+        return self.method_name
+    
+    @property
+    def class_id(self) -> str:
+        """带模块前缀的类标识: 模块.类名，模块为空时只有类名"""
+        if self.module and self.class_name:
+            return f"{self.module}.{self.class_name}"
+        return self.class_name
+    
+    @property
+    def status(self) -> str:
+        """结果状态: passed 或 failed"""
+        return "passed" if self.success else "failed"
     
     def __hash__(self):
         # 用于去重的哈希方法
-        return hash((self.method_name, self.start_time))
+        return hash((self.test_id, self.start_time))
 
 
 class TestResult:
-    """测试结果集合，包含多个测试方法的结果"""
+    """测试结果集合，包含多个测试方法的结果
+    
+    结果按测试ID去重，并维护测试ID、类名、节点和状态的索引，按这些条件查询结果时
+    不需要遍历全部结果。results 被直接修改后需要调用 reindex 重建索引
+    """
     
     def __init__(self):
         self.test_case_name: str = ""
         self.node_id: str = ""
+        self.worker_id: Optional[str] = None  # 执行该工作单元的工作者，由主控节点在收到结果时设置
         self.start_time: datetime = datetime.now()
         self.end_time: Optional[datetime] = None
         self.results: List[TestMethodResult] = []
         self.metadata: Dict[str, Any] = {}
-        self._method_names: Set[str] = set()  # 用于跟踪已添加的方法名称
+        self.class_timings: Dict[str, Dict[str, float]] = {}  # 测试类（模块.类名）夹具各阶段的开始时间
+        self._result_nodes: List[str] = []  # 与 results 一一对应的执行节点
+        self._init_index()
+    
+    def _init_index(self) -> None:
+        self._index: Dict[str, int] = {}  # 测试ID -> 在 results 中的位置
+        self._by_class: Dict[str, List[int]] = {}
+        self._by_node: Dict[str, List[int]] = {}
+        self._by_status: Dict[str, List[int]] = {status: [] for status in STATUSES}
+    
+    def add_result(self, method_result: TestMethodResult, node_id: Optional[str] = None) -> bool:
+        """添加单个方法的测试结果，已有相同测试ID的结果时忽略
+        
+        Args:
+            method_result: 测试方法结果
+            node_id: 执行该测试的节点，默认为本结果集合的节点
+            
+        Returns:
+            是否添加
+        """
+        test_id = method_result.test_id
+        if test_id in self._index:
+            return False
+        node_id = node_id or self.node_id
+        position = len(self.results)
+        self.results.append(method_result)
+        self._result_nodes.append(node_id)
+        self._index[test_id] = position
+        self._by_class.setdefault(method_result.class_id, []).append(position)
+        self._by_node.setdefault(node_id, []).append(position)
+        self._by_status[method_result.status].append(position)
+        return True
+    
+    def reindex(self) -> None:
+        """直接修改 results 后重建索引，重复的测试ID只保留第一个，执行节点记为本结果集合的节点"""
+        results = self.results
+        self.results = []
+        self._result_nodes = []
+        self._init_index()
+        for method_result in results:
+            self.add_result(method_result)
     
-    def add_result(self, method_result: TestMethodResult) -> None:
-        """添加单个方法的测试结果"""
-        # 避免重复添加相同的测试方法结果
-        if method_result.method_name not in self._method_names:
-            self.results.append(method_result)
-            self._method_names.add(method_result.method_name)
+    def get_result(self, test_id: str) -> Optional[TestMethodResult]:
+        """按测试ID查找结果"""
+        position = self._index.get(test_id)
+        return self.results[position] if position is not None else None
+    
+    def __contains__(self, test_id: str) -> bool:
+        return test_id in self._index
+    
+    def get_results_by_class(self, class_id: str) -> List[TestMethodResult]:
+        """获取测试用例类（模块.类名，见 TestMethodResult.class_id）的所有结果"""
+        return [self.results[position] for position in self._by_class.get(class_id, ())]
+    
+    def get_results_by_node(self, node_id: str) -> List[TestMethodResult]:
+        """获取在指定节点上执行的所有结果"""
+        return [self.results[position] for position in self._by_node.get(node_id, ())]
+    
+    def get_results_by_status(self, status: str) -> List[TestMethodResult]:
+        """获取指定状态 (passed 或 failed) 的所有结果"""
+        if status not in self._by_status:
+            raise ValueError(f"不支持的结果状态: {status}，可选值: {', '.join(STATUSES)}")
+        return [self.results[position] for position in self._by_status[status]]
+    
+    def get_node_of(self, test_id: str) -> Optional[str]:
+        """获取执行该测试的节点"""
+        position = self._index.get(test_id)
+        return self._result_nodes[position] if position is not None else None
+    
+    @property
+    def class_names(self) -> List[str]:
+        """结果中出现的测试用例类（模块.类名）"""
+        return list(self._by_class)
+    
+    @property
+    def node_ids(self) -> List[str]:
+        """结果中出现的执行节点"""
+        return list(self._by_node)
     
     def get_summary(self) -> Dict[str, Any]:
         """获取测试结果汇总信息"""
         total = len(self.results)
-        passed = sum(1 for result in self.results if result.success)
+        passed = len(self._by_status["passed"])
         failed = total - passed
         
         total_time = sum(result.execution_time for result in self.results)
@@ -65,9 +167,11 @@ class TestResult:
         if not other_result.results:
             return
             
-        # 避免重复添加相同的测试方法结果
-        for result in other_result.results:
-            self.add_result(result)
+        # 避免重复添加相同的测试方法结果，保留各结果的执行节点
+        nodes = other_result._result_nodes
+        for position, result in enumerate(other_result.results):
+            self.add_result(result, nodes[position] if position < len(nodes) else other_result.node_id)
+        self.class_timings.update(other_result.class_timings)
         
         # 更新结束时间为最晚的结束时间
         if other_result.end_time:
@@ -81,4 +185,20 @@ class TestResult:
     
     def set_complete(self) -> None:
         """标记测试结果完成"""
-        self.end_time = datetime.now() 
\ No newline at end of file
+        self.end_time = datetime.now() 
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # 索引可以由结果重建，序列化时不发送
+        state = self.__dict__.copy()
+        for key in ("_index", "_by_class", "_by_node", "_by_status"):
+            del state[key]
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        results, nodes = state["results"], state["_result_nodes"]
+        self.__dict__.update(state)
+        self.results = []
+        self._result_nodes = []
+        self._init_index()
+        for position, method_result in enumerate(results):
+            self.add_result(method_result, nodes[position] if position < len(nodes) else None)
@@ -3,8 +3,15 @@ TestSuite类 - 测试套件管理
 用于管理多个测试用例的集合
 """
 import inspect
-from typing import Dict, List, Type, Optional, Any
+import time
+import traceback
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterator, List, Type, Optional, Any, Tuple
 
+from .capture import CapturePolicy, OutputCapture
+from .fixtures import FixtureCache
+from .leak_detector import LeakDetector
+from .parametrize import count_cases, is_parametrized, iterate_cases
 from .test_case import TestCase
 from .test_result import TestResult, TestMethodResult
 
@@ -12,10 +19,18 @@ from .test_result import TestResult, TestMethodResult
 class TestSuite:
     """测试套件，用于组织和管理多个测试用例"""
     
-    def __init__(self, name: str = "默认测试套件"):
+    def __init__(self, name: str = "默认测试套件", benchmark: bool = False):
+        """
+        Args:
+            name: 测试套件名称
+            benchmark: 为True时执行测试用例类中的基准测试方法，而不是普通测试方法
+        """
         self.name = name
+        self.benchmark = benchmark
         self.test_cases: List[Type[TestCase]] = []
         self.metadata: Dict[str, Any] = {}
+        # 测试用例类到需要执行的方法的映射，未出现的类执行全部方法（按 -k/-m 选择测试、断点续跑时跳过已完成的测试）
+        self.method_filter: Dict[Type[TestCase], List[str]] = {}
     
     def add_test_case(self, test_case_class: Type[TestCase]) -> None:
         """添加测试用例类到套件中"""
@@ -29,49 +44,209 @@ class TestSuite:
         for test_case_class in test_case_classes:
             self.add_test_case(test_case_class)
     
-    def run(self, node_id: str = "local") -> TestResult:
-        """执行测试套件中的所有测试用例"""
+    def run(self, node_id: str = "local", leak_detector: Optional[LeakDetector] = None,
+            methods: Optional[List[str]] = None, shard: Optional[Tuple[int, int]] = None,
+            fixture_cache: Optional[FixtureCache] = None,
+            on_class_complete: Optional[Callable[[TestResult], None]] = None,
+            capture: Optional[CapturePolicy] = None) -> TestResult:
+        """执行测试套件中的所有测试用例
+        
+        Args:
+            node_id: 执行测试的节点ID
+            leak_detector: 内存泄漏检测器，为None时不做检测（基准测试套件总是不做检测）
+            methods: 只执行这些测试方法，None表示全部
+            shard: (分片序号, 分片总数)，参数化方法只执行属于该分片的参数组
+            fixture_cache: 工作者的夹具缓存，为None时在本次执行结束后销毁创建的夹具
+            on_class_complete: 每个测试用例类执行完成后以该类的结果调用
+            capture: 输出捕获策略，为None时测试的输出直接写到标准输出
+            
+        Returns:
+            合并后的测试结果
+        """
         merged_result = TestResult()
         merged_result.test_case_name = self.name
         merged_result.node_id = node_id
+        if self.benchmark:
+            leak_detector = None
+        owns_fixture_cache = fixture_cache is None
+        if owns_fixture_cache:
+            fixture_cache = FixtureCache()
+        
+        try:
+            self._run_classes(node_id, leak_detector, methods, shard, fixture_cache, merged_result,
+                              on_class_complete, capture)
+        finally:
+            if owns_fixture_cache:
+                for error in fixture_cache.close():
+                    print(error)
+        
+        merged_result.set_complete()
+        return merged_result
+    
+    def _run_classes(self, node_id: str, leak_detector: Optional[LeakDetector], methods: Optional[List[str]],
+                     shard: Optional[Tuple[int, int]], fixture_cache: FixtureCache,
+                     merged_result: TestResult,
+                     on_class_complete: Optional[Callable[[TestResult], None]] = None,
+                     capture: Optional[CapturePolicy] = None) -> None:
+        """依次执行各个测试用例类，结果合并到 merged_result
         
+        开启输出捕获时每个测试方法（含setup/teardown）的输出捕获到 additional_data["output"]，
+        setup_class/teardown_class 的输出捕获到该类各结果的 additional_data["class_output"]，
+        按捕获策略只保留在失败（或所有）的结果上
+        """
+        if capture is not None and not capture.enabled:
+            capture = None
+        method_capture = OutputCapture(capture.limit) if capture else None
         for test_case_class in self.test_cases:
+            test_methods = self.get_methods(test_case_class)
+            if methods is not None:
+                test_methods = [method_name for method_name in test_methods if method_name in methods]
+            # 只包含另一类方法或方法都已被过滤的测试用例类不执行类级别的setup/teardown
+            if not test_methods and (self.benchmark or test_case_class.get_benchmark_methods()
+                                     or test_case_class in self.method_filter):
+                continue
+            
+            # 在类级别快照之前注入夹具，共享夹具不计入该类的残留内存；声明了夹具的类在
+            # 本工作者专用的子类上执行
+            bound_class = fixture_cache.inject(test_case_class)
+            
+            class_snapshot = None
+            if leak_detector and leak_detector.scope == "class":
+                class_snapshot = leak_detector.take_snapshot()
+            
             # 调用类级别的setup
-            if hasattr(test_case_class, 'setup_class'):
-                test_case_class.setup_class()
+            class_capture = OutputCapture(capture.limit) if capture else None
+            setup_class_start = time.time()
+            if hasattr(bound_class, 'setup_class'):
+                with class_capture or nullcontext():
+                    bound_class.setup_class()
+            tests_start = time.time()
             
-            test_instance = test_case_class()
-            test_methods = test_case_class.get_test_methods()
+            test_instance = bound_class()
+            run_method = test_instance.run_benchmark_method if self.benchmark else test_instance.run_test_method
             
             # 创建这个测试用例的结果
             test_case_result = TestResult()
             test_case_result.test_case_name = test_case_class.__name__
             test_case_result.node_id = node_id
             
-            for method_name in test_methods:
-                success, error, execution_time = test_instance.run_test_method(method_name)
+            for method_name, params, test_id, expand_error in self._expand(test_case_class, test_methods, shard):
+                if expand_error is not None:
+                    test_case_result.add_result(TestMethodResult(
+                        method_name=method_name,
+                        success=False,
+                        error_message=expand_error,
+                        class_name=test_case_class.__name__,
+                        module=test_case_class.__module__
+                    ))
+                    continue
+                
+                method_snapshot = None
+                if leak_detector and leak_detector.scope == "method":
+                    method_snapshot = leak_detector.take_snapshot()
+                result_count = len(test_instance.results.results)
+                
+                with method_capture or nullcontext():
+                    if params is None:
+                        success, error, execution_time = run_method(method_name)
+                    else:
+                        success, error, execution_time = run_method(method_name, params, test_id)
+                if method_capture is not None:
+                    output = method_capture.getvalues()
+                    if output:
+                        for method_result in test_instance.results.results[result_count:]:
+                            if capture.keeps(method_result.success):
+                                method_result.additional_data["output"] = output
+                    method_capture.clear()
+                
+                # 将残留内存信息附加到刚产生的测试结果上
+                if method_snapshot is not None and len(test_instance.results.results) > result_count:
+                    memory = leak_detector.measure(method_snapshot)
+                    test_instance.results.results[-1].additional_data["memory"] = memory
                 
                 # 收集测试用例的结果
-                for method_result in test_instance.results.results:
+                for method_result in test_instance.results.results[result_count:]:
                     test_case_result.add_result(method_result)
             
+            # 调用类级别的teardown
+            teardown_class_start = time.time()
+            if hasattr(bound_class, 'teardown_class'):
+                with class_capture or nullcontext():
+                    bound_class.teardown_class()
+            test_case_result.class_timings[f"{test_case_class.__module__}.{test_case_class.__name__}"] = {
+                "setup_class": setup_class_start,
+                "tests": tests_start,
+                "teardown_class": teardown_class_start,
+                "end": time.time(),
+            }
+            
+            if class_capture is not None:
+                class_output = class_capture.getvalues()
+                if class_output:
+                    for method_result in test_case_result.results:
+                        if capture.keeps(method_result.success):
+                            method_result.additional_data["class_output"] = class_output
+            
+            # 类级别检测在teardown_class之后进行，结果附加到该类的每个测试方法上
+            if class_snapshot is not None:
+                del test_instance
+                memory = leak_detector.measure(class_snapshot)
+                for method_result in test_case_result.results:
+                    method_result.additional_data["memory"] = memory
+            
             # 合并这个测试用例的结果到总结果中
             merged_result.merge(test_case_result)
-            
-            # 调用类级别的teardown
-            if hasattr(test_case_class, 'teardown_class'):
-                test_case_class.teardown_class()
-        
-        merged_result.set_complete()
-        return merged_result
+            if on_class_complete is not None:
+                on_class_complete(test_case_result)
     
     def get_total_test_count(self) -> int:
         """获取测试套件中测试方法的总数"""
         return len(self.test_cases)
     
+    def _expand(self, test_case_class: Type[TestCase], method_names: List[str],
+                shard: Optional[Tuple[int, int]]) -> Iterator[Tuple[str, Optional[Dict[str, Any]], Optional[str], Optional[str]]]:
+        """按需展开参数化方法
+        
+        Yields:
+            (方法名, 参数, 测试名称, 展开错误)，普通方法的参数和测试名称为None；
+            生成参数出错时只产生一条带错误信息的记录
+        """
+        for method_name in method_names:
+            method = getattr(test_case_class, method_name)
+            if self.benchmark or not is_parametrized(method):
+                yield method_name, None, None, None
+                continue
+            try:
+                for case_id, params in iterate_cases(method, shard):
+                    yield method_name, params, f"{method_name}[{case_id}]", None
+            except Exception as e:
+                yield method_name, None, None, f"参数生成失败: {type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
+    
+    def get_methods(self, test_case_class: Type[TestCase]) -> List[str]:
+        """获取测试用例类中由本套件执行的方法（普通测试方法或基准测试方法）"""
+        methods = test_case_class.get_benchmark_methods() if self.benchmark else test_case_class.get_test_methods()
+        if test_case_class in self.method_filter:
+            allowed = self.method_filter[test_case_class]
+            methods = [method_name for method_name in methods if method_name in allowed]
+        return methods
+    
     def get_total_method_count(self) -> int:
         """获取测试套件中所有测试方法的总数"""
         total = 0
         for test_case_class in self.test_cases:
-            total += len(test_case_class.get_test_methods())
-        return total 
\ No newline at end of file
+            methods = self.get_methods(test_case_class)
+            if self.benchmark:
+                total += len(methods)
+            elif test_case_class in self.method_filter:
+                total += sum(count_cases(getattr(test_case_class, method_name)) or 1 for method_name in methods)
+            else:
+                total += test_case_class.get_test_case_count()
+        return total
+    
+    def get_benchmark_suite(self) -> Optional['TestSuite']:
+        """获取只包含基准测试的套件，没有基准测试时返回None"""
+        benchmark_suite = TestSuite(f"{self.name}-benchmark", benchmark=True)
+        benchmark_suite.test_cases = [test_case_class for test_case_class in self.test_cases
+                                      if test_case_class.get_benchmark_methods()]
+        benchmark_suite.method_filter = dict(self.method_filter)
+        return benchmark_suite if benchmark_suite.test_cases else None 
\ No newline at end of file
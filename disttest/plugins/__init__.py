@@ -2,5 +2,9 @@ from .base import PluginBase
 from .html_report import HTMLReportPlugin
 from .console_reporter import ConsoleReporterPlugin
 from .json_logger import JSONLoggerPlugin
+from .metrics_exporter import MetricsExporterPlugin
+from .trace_exporter import TraceExportPlugin
+from .history_recorder import HistoryRecorderPlugin
 
-__all__ = ['PluginBase', 'HTMLReportPlugin', 'ConsoleReporterPlugin', 'JSONLoggerPlugin'] 
\ No newline at end of file
+__all__ = ['PluginBase', 'HTMLReportPlugin', 'ConsoleReporterPlugin', 'JSONLoggerPlugin',
+           'MetricsExporterPlugin', 'TraceExportPlugin', 'HistoryRecorderPlugin']
\ No newline at end of file
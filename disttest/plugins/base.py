@@ -7,6 +7,7 @@ from typing import TYPE_CHECKING, Dict, Any
 
 if TYPE_CHECKING:
     from ..core import TestSuite, TestResult
+    from ..core.test_result import TestMethodResult
     from ..runner import TestRunner
 
 
@@ -56,6 +57,24 @@ class PluginBase(ABC):
         """
         pass
     
+    def on_test_method_complete(self, node_id: str, method_result: 'TestMethodResult') -> None:
+        """单个测试方法的结果到达主控节点时的处理
+        
+        Args:
+            node_id: 执行该测试方法的节点ID
+            method_result: 测试方法结果，timings 中包含各阶段的开始时间
+        """
+        pass
+    
+    def on_unit_complete(self, node_id: str, result: 'TestResult') -> None:
+        """工作单元完成且其结果已合并到总结果时的处理
+        
+        Args:
+            node_id: 执行该工作单元的节点ID
+            result: 该工作单元的测试结果（增量部分）
+        """
+        pass
+    
     def on_node_start(self, node_id: str, node_suite: 'TestSuite') -> None:
         """节点开始执行测试时的处理
         
@@ -2,15 +2,21 @@
 ConsoleReporterPlugin - 控制台测试报告插件
 用于在控制台实时显示测试进度和结果
 """
-import sys
+import os
 import time
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 from colorama import Fore, Style, init
 
 from .base import PluginBase
+from .progress_renderer import DurationEstimator, ProgressRenderer
 from ..core import TestSuite, TestResult
+from ..core.capture import format_captured
+from ..core.history_store import HistoryStore
+from ..core.parametrize import count_cases
+from ..core.test_result import TestMethodResult
+from ..runner.placement import describe_placement
 
 # 初始化colorama
 init()
@@ -19,10 +25,24 @@ init()
 class ConsoleReporterPlugin(PluginBase):
     """控制台测试报告插件，在控制台实时显示测试进度和结果"""
     
-    def __init__(self, show_progress: bool = True, verbose: bool = False):
+    def __init__(self, show_progress: bool = True, verbose: bool = False,
+                 refresh_rate: float = 10.0, plain_interval: float = 5.0,
+                 history_db: Optional[str] = None):
+        """
+        Args:
+            show_progress: 是否显示执行进度
+            verbose: 是否显示详细输出
+            refresh_rate: 终端中进度的刷新频率（次/秒）
+            plain_interval: 输出不是终端时，输出进度行的间隔（秒）
+            history_db: 执行历史数据库路径，数据库存在时按各测试的历史平均耗时估计剩余时间
+        """
         super().__init__()
         self.show_progress = show_progress
         self.verbose = verbose
+        self.refresh_rate = refresh_rate
+        self.plain_interval = plain_interval
+        self.history_db = history_db
+        self.renderer: Optional[ProgressRenderer] = None
         self.start_time = None
         self.active_nodes: Dict[str, Dict[str, Any]] = {}
         self.total_tests = 0
@@ -37,6 +57,10 @@ class ConsoleReporterPlugin(PluginBase):
         self.start_time = time.time()
         self.total_tests = len(test_suite.test_cases)
         self.total_methods = test_suite.get_total_method_count()
+        benchmark_suite = test_suite.get_benchmark_suite()
+        if benchmark_suite:
+            self.total_methods += benchmark_suite.get_total_method_count()
+        self.completed_tests = 0
         
         print(f"\n{Fore.CYAN}==========================================")
         print(f"    开始执行测试: {test_suite.name}")
@@ -44,40 +68,51 @@ class ConsoleReporterPlugin(PluginBase):
         print(f"    测试用例数量: {self.total_methods}")
         print(f"    开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"=========================================={Style.RESET_ALL}\n")
-    
-    def on_test_progress_update(self, current_result: TestResult) -> None:
-        """测试进度更新时的处理"""
-        if not self.show_progress:
-            return
-            
-        summary = current_result.get_summary()
-        self.completed_tests = summary["total"]
         
-        # 计算进度百分比
-        if self.total_methods > 0:
-            progress = min(100, int((self.completed_tests / self.total_methods) * 100))
-        else:
-            progress = 0
-            
-        # 创建进度条
-        bar_width = 50
-        filled_width = int(bar_width * progress / 100)
-        bar = '█' * filled_width + '░' * (bar_width - filled_width)
-        
-        # 清除当前行并显示进度
-        sys.stdout.write('\r')
-        sys.stdout.write(
-            f"{Fore.GREEN}执行进度: [{bar}] {progress}% "
-            f"({self.completed_tests}/{self.total_methods}) "
-            f"通过: {summary['passed']} 失败: {summary['failed']}{Style.RESET_ALL}"
-        )
-        sys.stdout.flush()
+        # 进度由渲染线程按固定频率绘制，事件处理只更新计数器
+        if self.show_progress:
+            self.renderer = ProgressRenderer(refresh_rate=self.refresh_rate, plain_interval=self.plain_interval)
+            self.renderer.start(self.total_methods, self._load_estimator(test_suite, benchmark_suite),
+                                self._busy_workers)
+    
+    def _busy_workers(self) -> int:
+        """正在执行工作单元的工作者数，由渲染线程调用"""
+        scheduler = self.runner.scheduler if self.runner else None
+        return scheduler.running_count() if scheduler is not None else 1
+    
+    def _load_estimator(self, test_suite: TestSuite,
+                        benchmark_suite: Optional[TestSuite]) -> Optional[DurationEstimator]:
+        """从执行历史数据库读取本次执行的测试的平均耗时，数据库不存在或没有相关记录时返回None"""
+        if not self.history_db or not os.path.exists(self.history_db):
+            return None
+        planned: Dict[str, int] = {}
+        for suite in filter(None, (test_suite, benchmark_suite)):
+            for test_case_class in suite.test_cases:
+                for method_name in suite.get_methods(test_case_class):
+                    key = f"{test_case_class.__module__}.{test_case_class.__name__}.{method_name}"
+                    count = 1 if suite.benchmark else count_cases(getattr(test_case_class, method_name))
+                    planned[key] = planned.get(key, 0) + (count or 1)
+        try:
+            with HistoryStore(self.history_db) as store:
+                averages = store.average_durations(planned)
+        except Exception as e:
+            print(f"读取执行历史失败，按吞吐量估计剩余时间: {str(e)}")
+            return None
+        return DurationEstimator(averages, planned) if averages else None
+    
+    def on_test_method_complete(self, node_id: str, method_result: TestMethodResult) -> None:
+        """测试方法完成时更新缓存的计数器"""
+        self.completed_tests += 1
+        if self.renderer:
+            self.renderer.record(node_id, method_result.success, method_result.test_id)
     
     def on_test_run_complete(self, result: TestResult) -> None:
         """测试完成时的处理"""
-        # 如果显示了进度条，先换行
-        if self.show_progress:
-            print("\n")
+        # 停止进度渲染并输出最终状态
+        if self.renderer:
+            self.renderer.stop()
+            self.renderer = None
+            print()
             
         # 计算总执行时间
         end_time = time.time()
@@ -95,33 +130,63 @@ class ConsoleReporterPlugin(PluginBase):
         print(f"    通过率: {Fore.YELLOW}{summary['pass_rate'] * 100:.2f}%{Fore.CYAN}")
         print(f"=========================================={Style.RESET_ALL}\n")
         
+        # 显示基准测试统计
+        benchmarks = [method_result for method_result in result.results
+                      if "benchmark" in method_result.additional_data]
+        if benchmarks:
+            print(f"{Fore.CYAN}基准测试结果 (单次迭代耗时):{Style.RESET_ALL}")
+            for method_result in benchmarks:
+                stats = method_result.additional_data["benchmark"]
+                ops = f"{stats['ops_per_sec']:.1f}" if stats["ops_per_sec"] else "-"
+                print(f"  {method_result.class_name}.{method_result.method_name}: "
+                      f"最小 {stats['min'] * 1e6:.2f} μs, 中位数 {stats['median'] * 1e6:.2f} μs, "
+                      f"标准差 {stats['stddev'] * 1e6:.2f} μs, {ops} 次/秒 "
+                      f"({stats['rounds']} 轮 x {stats['iterations']} 次)")
+            print()
+        
+        # 显示性能回归的测试
+        regressions = result.metadata.get("performance_regressions")
+        if regressions:
+            print(f"{Fore.YELLOW}性能回归的测试 ({len(regressions)} 个):{Style.RESET_ALL}")
+            for regression in regressions:
+                slowdown = f"{regression['slowdown']:.2f}x" if regression["slowdown"] else "-"
+                print(f"{Fore.YELLOW}  {regression['test_name']}: {regression['duration']:.4f} 秒 "
+                      f"(基线中位数 {regression['baseline_median']:.4f} 秒, {slowdown}){Style.RESET_ALL}")
+            print()
+        
         # 如果有失败的测试用例且处于详细模式，显示失败详情
         if summary['failed'] > 0 and self.verbose:
             print(f"{Fore.RED}失败的测试用例:{Style.RESET_ALL}")
             
-            for method_result in result.results:
-                if not method_result.success:
-                    print(f"\n{Fore.RED}测试: {method_result.method_name}")
-                    print(f"执行时间: {method_result.execution_time:.3f} 秒")
-                    print(f"错误信息: \n{method_result.error_message}{Style.RESET_ALL}")
-                    print("-" * 80)
+            for method_result in result.get_results_by_status("failed"):
+                print(f"\n{Fore.RED}测试: {method_result.test_id}")
+                print(f"执行时间: {method_result.execution_time:.3f} 秒")
+                print(f"错误信息: \n{method_result.error_message}{Style.RESET_ALL}")
+                captured = format_captured(method_result.additional_data)
+                if captured:
+                    print(captured)
+                print("-" * 80)
     
     def on_node_start(self, node_id: str, node_suite: TestSuite) -> None:
         """节点开始执行时的处理"""
         test_count = len(node_suite.test_cases)
-        method_count = node_suite.get_total_method_count()
+        method_count = node_suite.metadata.get("method_count", node_suite.get_total_method_count())
         
         self.active_nodes[node_id] = {
             "start_time": time.time(),
             "test_count": test_count,
             "method_count": method_count
         }
+        if self.renderer:
+            self.renderer.add_node(node_id, method_count)
         
         if self.verbose:
             print(f"{Fore.CYAN}节点 {node_id} 开始执行 {test_count} 个测试用例类 ({method_count} 个测试用例)...{Style.RESET_ALL}")
     
     def on_node_complete(self, node_id: str, result: TestResult) -> None:
         """节点完成测试时的处理"""
+        if self.renderer:
+            self.renderer.complete_node(node_id)
         if node_id in self.active_nodes:
             start_time = self.active_nodes[node_id]["start_time"]
             end_time = time.time()
@@ -135,7 +200,13 @@ class ConsoleReporterPlugin(PluginBase):
                 print(f"  测试用例数: {summary['total']}")
                 print(f"  通过: {Fore.GREEN}{summary['passed']}{Fore.CYAN}")
                 print(f"  失败: {Fore.RED}{summary['failed']}{Fore.CYAN}")
-                print(f"  通过率: {Fore.YELLOW}{summary['pass_rate'] * 100:.2f}%{Fore.CYAN}{Style.RESET_ALL}")
+                print(f"  通过率: {Fore.YELLOW}{summary['pass_rate'] * 100:.2f}%{Fore.CYAN}")
+                node = self.runner.node_manager.get_node(node_id) if self.runner else None
+                if node and node.metadata.get("restarts"):
+                    print(f"  工作者重启次数: {node.metadata['restarts']} {node.metadata['recycle_reasons']}")
+                if node and node.metadata.get("placement"):
+                    print(f"  CPU绑定: {describe_placement(node.metadata['placement'])}")
+                print(Style.RESET_ALL, end="")
                 
             # 从活动节点列表中移除
             del self.active_nodes[node_id] 
\ No newline at end of file
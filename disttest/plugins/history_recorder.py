@@ -0,0 +1,57 @@
+"""
+HistoryRecorderPlugin - 执行历史记录插件
+将每次执行的测试结果写入本地SQLite历史数据库，供 disttest history 命令查询趋势
+"""
+import time
+from typing import List, Optional, Tuple
+
+from .base import PluginBase
+from ..core import TestSuite, TestResult, HistoryStore
+from ..core.test_result import TestMethodResult
+
+
+class HistoryRecorderPlugin(PluginBase):
+    """执行历史记录插件
+
+    运行过程中只在内存中收集 (测试名称, 节点, 结果, 耗时) 行，测试完成后
+    在一个事务中批量写入数据库
+    """
+
+    def __init__(self, db_path: str = None):
+        """
+        Args:
+            db_path: 历史数据库路径，默认为 .disttest/history.db
+        """
+        super().__init__()
+        self.db_path = db_path or HistoryStore.DEFAULT_PATH
+        self.run_id: Optional[int] = None
+        self._rows: List[Tuple[str, Optional[str], bool, float, Optional[float]]] = []
+        self._suite_name = ""
+        self._started_at = time.time()
+
+    def on_test_run_start(self, test_suite: TestSuite) -> None:
+        """测试开始时清空已收集的结果"""
+        self._rows = []
+        self._suite_name = test_suite.name
+        self._started_at = time.time()
+
+    def on_test_method_complete(self, node_id: str, method_result: TestMethodResult) -> None:
+        """收集测试方法结果"""
+        self._rows.append((
+            method_result.test_id,
+            node_id,
+            method_result.success,
+            method_result.execution_time,
+            method_result.start_time.timestamp(),
+        ))
+
+    def on_test_run_complete(self, result: TestResult) -> None:
+        """测试完成时写入历史数据库"""
+        mode = self.runner.mode if self.runner else "local"
+        try:
+            with HistoryStore(self.db_path) as store:
+                self.run_id = store.record_run(self._suite_name, mode, self._started_at, time.time(), self._rows)
+        except Exception as e:
+            print(f"写入执行历史失败: {str(e)}")
+            return
+        print(f"执行历史已记录: 批次 #{self.run_id} ({len(self._rows)} 条结果)")
@@ -1,27 +1,97 @@
 """
 HTMLReportPlugin - HTML测试报告生成插件
 """
+import base64
+import gzip
+import hashlib
+import json
 import os
 import time
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 
 import jinja2
+from markupsafe import Markup
 
 from .base import PluginBase
-from ..core import TestResult
+from ..core import TestResult, LeakDetector
+from ..core.capture import format_captured
+from ..runner.placement import describe_placement
+
+# 按模板目录缓存的jinja2环境，多次生成报告时复用已编译的模板
+_ENVIRONMENTS: Dict[Tuple[str, Optional[str]], jinja2.Environment] = {}
+
+
+def get_template_environment(template_dir: str, cache_dir: Optional[str] = None) -> jinja2.Environment:
+    """获取（或创建）模板目录对应的jinja2环境
+    
+    编译后的模板字节码缓存在 cache_dir 中，新进程中首次渲染时也不必重新编译模板；
+    同一进程内环境本身被复用，模板文件未修改时不会重新加载
+    
+    Args:
+        template_dir: 模板目录
+        cache_dir: 字节码缓存目录，必须只有当前用户可写；默认使用jinja2的每用户缓存目录
+            (会检查目录的所有者和权限)
+    """
+    key = (os.path.abspath(template_dir), os.path.abspath(cache_dir) if cache_dir else None)
+    environment = _ENVIRONMENTS.get(key)
+    if environment is None:
+        if cache_dir:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        environment = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(searchpath=template_dir),
+            bytecode_cache=jinja2.FileSystemBytecodeCache(cache_dir),
+            auto_reload=True,
+        )
+        _ENVIRONMENTS[key] = environment
+    return environment
 
 
 class HTMLReportPlugin(PluginBase):
-    """HTML测试报告生成插件"""
+    """HTML测试报告生成插件
+    
+    默认生成包含所有失败详情的单页报告。paged 模式下只生成一个很小的报告页面，
+    所有测试结果（包括通过的测试）按页写入独立的压缩数据文件，由浏览器按需加载，
+    并在客户端完成分页、搜索、按耗时排序和按测试类分组
+    """
+    
+    # 报告中每个区块 (templates/sections/<区块>.html) 依赖的数据，数据未变化的区块
+    # 在重新生成报告时直接复用上次的渲染结果
+    SECTIONS = {
+        "header": ("title", "timestamp", "duration"),
+        "summary": ("summary",),
+        "nodes": ("nodes",),
+        "memory_leaks": ("memory_leaks",),
+        "performance_regressions": ("performance_regressions",),
+        "failed_tests": ("failed_tests",),
+    }
     
-    def __init__(self, output_dir: str = "reports", report_name: str = None):
+    def __init__(self, output_dir: str = "reports", report_name: str = None,
+                 paged: bool = False, page_size: int = 500, compress: bool = True,
+                 template_cache_dir: str = None):
+        """
+        Args:
+            output_dir: 报告输出目录
+            report_name: 报告文件名
+            paged: 是否生成分页加载的报告
+            page_size: paged 模式下每个数据文件包含的测试结果数
+            compress: paged 模式下是否使用gzip压缩数据文件
+            template_cache_dir: 模板字节码缓存目录（必须只有当前用户可写），默认使用jinja2的每用户缓存目录
+        """
         super().__init__()
         self.output_dir = output_dir
         self.report_name = report_name or f"test_report_{int(time.time())}.html"
         self.template_dir = os.path.join(os.path.dirname(__file__), "templates")
         self.template_name = "report_template.html"
+        self.paged_template_name = "paged_report_template.html"
+        self.paged = paged
+        self.page_size = page_size
+        self.compress = compress
+        self.template_cache_dir = template_cache_dir
         self.results: List[Dict[str, Any]] = []
+        self._fallback_template: Optional[jinja2.Template] = None
+        # 区块名 -> (区块模板, 数据摘要, 渲染结果)
+        self._section_cache: Dict[str, Tuple[jinja2.Template, str, Markup]] = {}
         
     def on_setup(self) -> None:
         """插件初始化设置"""
@@ -36,8 +106,11 @@ class HTMLReportPlugin(PluginBase):
     
     def on_test_run_complete(self, result: TestResult) -> None:
         """测试运行完成时生成HTML报告"""
-        report_data = self._prepare_report_data(result)
-        self._generate_report(report_data)
+        if self.paged:
+            self._generate_paged_report(result)
+        else:
+            report_data = self._prepare_report_data(result)
+            self._generate_report(report_data)
         
         report_path = os.path.join(self.output_dir, self.report_name)
         print(f"HTML测试报告已生成: {os.path.abspath(report_path)}")
@@ -46,21 +119,24 @@ class HTMLReportPlugin(PluginBase):
         """节点完成测试时记录结果"""
         summary = result.get_summary()
         summary["node_id"] = node_id
+        node = self.runner.node_manager.get_node(node_id) if self.runner else None
+        summary["restarts"] = node.metadata.get("restarts", 0) if node else 0
+        summary["placement"] = describe_placement(node.metadata.get("placement") or {}) if node else ""
         self.results.append(summary)
     
-    def _prepare_report_data(self, result: TestResult) -> Dict[str, Any]:
+    def _prepare_report_data(self, result: TestResult, include_failed_tests: bool = True) -> Dict[str, Any]:
         """准备报告数据"""
         summary = result.get_summary()
         
         # 收集失败的测试用例详情
         failed_tests = []
-        for method_result in result.results:
-            if not method_result.success:
-                failed_tests.append({
-                    "test_name": method_result.method_name,
-                    "error_message": method_result.error_message,
-                    "execution_time": method_result.execution_time
-                })
+        for method_result in result.get_results_by_status("failed") if include_failed_tests else ():
+            failed_tests.append({
+                "test_name": method_result.test_id,
+                "error_message": method_result.error_message,
+                "output": format_captured(method_result.additional_data),
+                "execution_time": method_result.execution_time
+            })
         
         # 计算节点统计信息
         nodes_summary = {}
@@ -70,7 +146,9 @@ class HTMLReportPlugin(PluginBase):
                 "total": node_result["total"],
                 "passed": node_result["passed"],
                 "failed": node_result["failed"],
-                "pass_rate": node_result["pass_rate"] * 100
+                "pass_rate": node_result["pass_rate"] * 100,
+                "restarts": node_result["restarts"],
+                "placement": node_result.get("placement", "")
             }
         
         return {
@@ -84,7 +162,9 @@ class HTMLReportPlugin(PluginBase):
                 "pass_rate": summary["pass_rate"] * 100
             },
             "nodes": nodes_summary,
-            "failed_tests": failed_tests
+            "failed_tests": failed_tests,
+            "memory_leaks": LeakDetector.collect_leaks(result.results),
+            "performance_regressions": result.metadata.get("performance_regressions", [])
         }
     
     def _generate_report(self, report_data: Dict[str, Any]) -> None:
@@ -95,23 +175,119 @@ class HTMLReportPlugin(PluginBase):
         if not os.path.exists(template_path):
             self._create_default_template()
             
+        template_env = get_template_environment(self.template_dir, self.template_cache_dir)
         try:
             # 尝试使用jinja2的文件加载器
-            template_loader = jinja2.FileSystemLoader(searchpath=self.template_dir)
-            template_env = jinja2.Environment(loader=template_loader)
             template = template_env.get_template(self.template_name)
-            
-            output = template.render(**report_data)
+            # 只重新渲染数据发生变化的区块
+            sections = self._render_sections(template_env, report_data)
+        except Exception as e:
+            # 如果加载模板失败，使用不依赖区块模板的字符串模板（只编译一次）
+            if self._fallback_template is None:
+                print(f"警告: 加载模板失败: {str(e)}，使用内置模板")
+                self._fallback_template = template_env.from_string(self._get_default_template_content())
+            template, sections = self._fallback_template, {}
+        
+        # 流式写入磁盘，不在内存中拼接整个页面
+        report_path = os.path.join(self.output_dir, self.report_name)
+        template.stream(sections=sections, **report_data).dump(report_path, encoding="utf-8")
+    
+    def _render_sections(self, template_env: jinja2.Environment, report_data: Dict[str, Any]) -> Dict[str, Markup]:
+        """渲染报告的各个区块，区块模板和数据都未变化时复用上次的渲染结果
+        
+        模板文件修改后环境会重新加载出新的模板对象，缓存随之失效
+        """
+        sections = {}
+        for section, keys in self.SECTIONS.items():
+            section_template = template_env.get_template(f"sections/{section}.html")
+            section_data = {key: report_data.get(key) for key in keys}
+            payload = json.dumps(section_data, sort_keys=True, default=str, ensure_ascii=False)
+            digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+            cached = self._section_cache.get(section)
+            if cached is None or cached[0] is not section_template or cached[1] != digest:
+                cached = (section_template, digest, Markup(section_template.render(section_data)))
+                self._section_cache[section] = cached
+            sections[section] = cached[2]
+        return sections
+    
+    def _generate_paged_report(self, result: TestResult) -> None:
+        """生成分页加载的HTML报告：一个报告页面加若干数据文件"""
+        try:
+            template_env = get_template_environment(self.template_dir, self.template_cache_dir)
+            template = template_env.get_template(self.paged_template_name)
         except Exception as e:
-            # 如果加载模板失败，使用字符串模板
-            print(f"警告: 加载模板失败: {str(e)}，使用内置模板")
-            template_content = self._get_default_template_content()
-            template = jinja2.Template(template_content)
-            output = template.render(**report_data)
+            print(f"警告: 加载分页报告模板失败: {str(e)}，生成单页报告")
+            self._generate_report(self._prepare_report_data(result))
+            return
+        
+        data_dir_name = f"{os.path.splitext(self.report_name)[0]}_data"
+        data_dir = os.path.join(self.output_dir, data_dir_name)
+        os.makedirs(data_dir, exist_ok=True)
+        
+        page_count, classes = self._write_data_pages(result, data_dir)
+        
+        report_data = self._prepare_report_data(result, include_failed_tests=False)
+        report_data["manifest"] = {
+            "data_dir": data_dir_name,
+            "page_count": page_count,
+            "page_size": self.page_size,
+            "total": len(result.results),
+            "compressed": self.compress,
+        }
+        report_data["classes"] = classes
         
         report_path = os.path.join(self.output_dir, self.report_name)
-        with open(report_path, "w", encoding="utf-8") as f:
-            f.write(output)
+        template.stream(**report_data).dump(report_path, encoding="utf-8")
+    
+    def _write_data_pages(self, result: TestResult, data_dir: str) -> Tuple[int, List[Dict[str, Any]]]:
+        """逐页写出测试结果数据文件
+        
+        每页包含两个文件: rows_N.js 为列表所需的精简字段，details_N.js 为完整的
+        错误信息，只在展开某条结果时加载
+        
+        Returns:
+            页数和按测试类汇总的统计信息
+        """
+        classes: Dict[str, Dict[str, Any]] = {}
+        rows: List[List[Any]] = []
+        details: List[Any] = []
+        page_count = 0
+        
+        for method_result in result.results:
+            error_summary = ""
+            if method_result.error_message:
+                error_summary = method_result.error_message.split("\n", 1)[0][:200]
+            rows.append([method_result.class_id, method_result.method_name, int(method_result.success),
+                         round(method_result.execution_time, 6), error_summary])
+            captured = format_captured(method_result.additional_data)
+            details.append("\n".join(filter(None, (method_result.error_message, captured))) or None)
+            
+            class_stats = classes.setdefault(method_result.class_id, {
+                "name": method_result.class_id, "total": 0, "failed": 0, "time": 0.0})
+            class_stats["total"] += 1
+            class_stats["failed"] += 0 if method_result.success else 1
+            class_stats["time"] += method_result.execution_time
+            
+            if len(rows) >= self.page_size:
+                self._write_data_page(data_dir, page_count, rows, details)
+                page_count += 1
+                rows, details = [], []
+        
+        if rows:
+            self._write_data_page(data_dir, page_count, rows, details)
+            page_count += 1
+        
+        return page_count, sorted(classes.values(), key=lambda stats: stats["name"])
+    
+    def _write_data_page(self, data_dir: str, page: int, rows: List[List[Any]], details: List[Any]) -> None:
+        """写出一页数据，以JSONP脚本的形式保存，使报告在file://下也能加载"""
+        for kind, payload in (("rows", rows), ("details", details)):
+            data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+            if self.compress:
+                data = json.dumps(base64.b64encode(gzip.compress(data.encode("utf-8"))).decode("ascii"))
+            path = os.path.join(data_dir, f"{kind}_{page:05d}.js")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"DistTestReport.load({json.dumps(kind)},{page},{data});\n")
     
     def _create_default_template(self) -> None:
         """创建默认的HTML报告模板"""
@@ -124,7 +300,7 @@ class HTMLReportPlugin(PluginBase):
             f.write(self._get_default_template_content())
     
     def _get_default_template_content(self) -> str:
-        """获取默认模板内容"""
+        """获取默认模板内容（各区块直接写在页面中的完整模板）"""
         return """<!DOCTYPE html>
 <html>
 <head>
@@ -199,15 +375,24 @@ class HTMLReportPlugin(PluginBase):
             font-family: monospace;
             white-space: pre-wrap;
         }
+        .memory-leaks {
+            margin-bottom: 30px;
+        }
+        .performance-regressions {
+            margin-bottom: 30px;
+        }
     </style>
 </head>
 <body>
+    {% block header %}
     <div class="header">
         <h1>{{ title }}</h1>
         <p>生成时间: {{ timestamp }}</p>
         <p>总执行时间: {{ "%.2f"|format(duration) }} 秒</p>
     </div>
+    {% endblock %}
     
+    {% block summary %}
     <div class="summary">
         <div class="summary-box total">
             <h2>总计</h2>
@@ -226,7 +411,9 @@ class HTMLReportPlugin(PluginBase):
             <h3>{{ "%.2f"|format(summary.pass_rate) }}%</h3>
         </div>
     </div>
+    {% endblock %}
     
+    {% block nodes %}
     <div class="node-results">
         <h2>节点执行情况</h2>
         <table>
@@ -236,6 +423,8 @@ class HTMLReportPlugin(PluginBase):
                 <th>通过</th>
                 <th>失败</th>
                 <th>通过率</th>
+                <th>工作者重启次数</th>
+                <th>CPU绑定</th>
             </tr>
             {% for node_id, node_data in nodes.items() %}
             <tr>
@@ -244,11 +433,68 @@ class HTMLReportPlugin(PluginBase):
                 <td>{{ node_data.passed }}</td>
                 <td>{{ node_data.failed }}</td>
                 <td>{{ "%.2f"|format(node_data.pass_rate) }}%</td>
+                <td>{{ node_data.restarts }}</td>
+                <td>{{ node_data.placement or "-" }}</td>
+            </tr>
+            {% endfor %}
+        </table>
+    </div>
+    {% endblock %}
+    
+    {% block memory_leaks %}
+    {% if memory_leaks %}
+    <div class="memory-leaks">
+        <h2>疑似内存泄漏的测试</h2>
+        <table>
+            <tr>
+                <th>测试名称</th>
+                <th>检测粒度</th>
+                <th>残留内存 (KB)</th>
+                <th>主要分配位置</th>
+            </tr>
+            {% for leak in memory_leaks %}
+            <tr>
+                <td>{{ leak.test_name }}</td>
+                <td>{{ leak.scope }}</td>
+                <td>{{ "%.1f"|format(leak.retained_bytes / 1024) }}</td>
+                <td><div class="error-message">{% for alloc in leak.top_allocations %}{{ alloc.location }} (+{{ "%.1f"|format(alloc.size_diff / 1024) }} KB, {{ alloc.count_diff }} 个对象)
+{% endfor %}</div></td>
+            </tr>
+            {% endfor %}
+        </table>
+    </div>
+    {% endif %}
+    {% endblock %}
+    
+    {% block performance_regressions %}
+    {% if performance_regressions %}
+    <div class="performance-regressions">
+        <h2>性能回归的测试</h2>
+        <table>
+            <tr>
+                <th>测试名称</th>
+                <th>本次耗时 (秒)</th>
+                <th>基线中位数 (秒)</th>
+                <th>基线MAD (秒)</th>
+                <th>基线样本数</th>
+                <th>变慢倍数</th>
+            </tr>
+            {% for regression in performance_regressions %}
+            <tr>
+                <td>{{ regression.test_name }}</td>
+                <td>{{ "%.4f"|format(regression.duration) }}</td>
+                <td>{{ "%.4f"|format(regression.baseline_median) }}</td>
+                <td>{{ "%.4f"|format(regression.baseline_mad) }}</td>
+                <td>{{ regression.samples }}</td>
+                <td class="fail">{% if regression.slowdown %}{{ "%.2f"|format(regression.slowdown) }}x{% else %}-{% endif %}</td>
             </tr>
             {% endfor %}
         </table>
     </div>
+    {% endif %}
+    {% endblock %}
     
+    {% block failed_tests %}
     {% if failed_tests %}
     <div class="failed-tests">
         <h2>失败的测试用例</h2>
@@ -262,7 +508,8 @@ class HTMLReportPlugin(PluginBase):
             <tr>
                 <td>{{ test.test_name }}</td>
                 <td>{{ "%.3f"|format(test.execution_time) }}</td>
-                <td><div class="error-message">{{ test.error_message }}</div></td>
+                <td><div class="error-message">{{ test.error_message }}{% if test.output %}
+{{ test.output }}{% endif %}</div></td>
             </tr>
             {% endfor %}
         </table>
@@ -272,5 +519,6 @@ class HTMLReportPlugin(PluginBase):
         <h2>恭喜！所有测试用例均通过。</h2>
     </div>
     {% endif %}
+    {% endblock %}
 </body>
 </html>""" 
\ No newline at end of file
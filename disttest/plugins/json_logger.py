@@ -9,7 +9,7 @@ from datetime import datetime
 from typing import Dict, Any, List
 
 from .base import PluginBase
-from ..core import TestSuite, TestResult
+from ..core import TestSuite, TestResult, LeakDetector
 
 
 class JSONLoggerPlugin(PluginBase):
@@ -54,6 +54,7 @@ class JSONLoggerPlugin(PluginBase):
         # 记录所有测试结果
         for test_result in result.results:
             self.log_data["test_results"].append({
+                "test_id": test_result.test_id,
                 "method_name": test_result.method_name,
                 "success": test_result.success,
                 "error_message": test_result.error_message,
@@ -62,6 +63,15 @@ class JSONLoggerPlugin(PluginBase):
                 "additional_data": test_result.additional_data
             })
         
+        # 记录疑似内存泄漏的测试
+        memory_leaks = LeakDetector.collect_leaks(result.results)
+        if memory_leaks:
+            self.log_data["memory_leaks"] = memory_leaks
+        
+        # 记录性能回归的测试
+        if "performance_regressions" in result.metadata:
+            self.log_data["performance_regressions"] = result.metadata["performance_regressions"]
+        
         # 写入最终日志
         self._write_log()
         
@@ -96,6 +106,11 @@ class JSONLoggerPlugin(PluginBase):
             self.log_data["nodes"][node_id]["status"] = "已完成"
             self.log_data["nodes"][node_id]["summary"] = result.get_summary()
             
+            # 记录工作者重启次数等节点统计信息
+            node = self.runner.node_manager.get_node(node_id) if self.runner else None
+            if node:
+                self.log_data["nodes"][node_id]["worker_stats"] = dict(node.metadata)
+            
             # 写入日志
             self._write_log()
     
@@ -0,0 +1,167 @@
+"""
+MetricsExporterPlugin - 实时指标导出插件
+在主控节点上提供Prometheus文本格式的 /metrics 接口
+"""
+import bisect
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+from .base import PluginBase
+from ..core import TestSuite, TestResult
+
+
+class MetricsExporterPlugin(PluginBase):
+    """实时指标导出插件
+
+    指标在主控节点合并每个工作单元结果时增量更新，HTTP服务运行在独立的
+    后台线程中，抓取请求只读取加锁保护的指标快照，不会阻塞调度循环。
+    测试耗时以固定分桶的直方图导出，内存占用与测试数量无关，分位数由
+    Prometheus 的 histogram_quantile 计算
+    """
+
+    # 测试耗时直方图的分桶上界（秒）
+    DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+    def __init__(self, port: int = 9100, host: str = "127.0.0.1"):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        """重置指标"""
+        with self._lock:
+            self.run_start_time = time.time()
+            self.tests_completed = 0
+            self.tests_passed = 0
+            self.tests_failed = 0
+            self.queue_depth = 0
+            self.inflight_units = 0
+            # 各分桶（不累计）的测试数，最后一个为超出所有上界的 +Inf 分桶
+            self.duration_buckets: List[int] = [0] * (len(self.DURATION_BUCKETS) + 1)
+            self.duration_sum = 0.0
+            self.node_stats: Dict[str, Dict[str, Any]] = {}
+
+    def on_setup(self) -> None:
+        """启动HTTP服务"""
+        plugin = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = plugin.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 不在控制台输出访问日志
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="metrics-exporter", daemon=True).start()
+        print(f"指标接口已启动: http://{self.host}:{self.port}/metrics")
+
+    def on_test_run_start(self, test_suite: TestSuite) -> None:
+        """测试开始时重置指标"""
+        self._reset()
+
+    def on_node_start(self, node_id: str, node_suite: TestSuite) -> None:
+        """节点开始执行时记录开始时间"""
+        with self._lock:
+            self.node_stats[node_id] = {"start_time": time.time(), "tests": 0, "rss": None, "restarts": 0}
+
+    def on_unit_complete(self, node_id: str, result: TestResult) -> None:
+        """工作单元结果合并后增量更新指标"""
+        passed = len(result.get_results_by_status("passed"))
+        scheduler = self.runner.scheduler if self.runner else None
+        pool = self.runner.worker_pool if self.runner else None
+        node = self.runner.node_manager.get_node(node_id) if self.runner else None
+
+        with self._lock:
+            self.tests_completed += len(result.results)
+            self.tests_passed += passed
+            self.tests_failed += len(result.results) - passed
+            for method_result in result.results:
+                self.duration_buckets[bisect.bisect_left(self.DURATION_BUCKETS, method_result.execution_time)] += 1
+                self.duration_sum += method_result.execution_time
+
+            stats = self.node_stats.setdefault(
+                node_id, {"start_time": self.run_start_time, "tests": 0, "rss": None, "restarts": 0})
+            stats["tests"] += len(result.results)
+            if node:
+                stats["rss"] = node.metadata.get("rss")
+                stats["restarts"] = node.metadata.get("restarts", 0)
+
+            self.queue_depth = scheduler.pending_count() if scheduler else 0
+            self.inflight_units = pool.inflight_count() if pool else 0
+
+    def on_test_run_complete(self, result: TestResult) -> None:
+        """测试完成时清零队列指标"""
+        with self._lock:
+            self.queue_depth = 0
+            self.inflight_units = 0
+
+    def render(self) -> str:
+        """生成Prometheus文本格式的指标"""
+        with self._lock:
+            now = time.time()
+            lines = []
+
+            def metric(name: str, metric_type: str, help_text: str, samples: List[tuple]) -> None:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                    lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+            metric("disttest_tests_completed_total", "counter", "Completed test methods",
+                   [({}, self.tests_completed)])
+            metric("disttest_tests_passed_total", "counter", "Passed test methods",
+                   [({}, self.tests_passed)])
+            metric("disttest_tests_failed_total", "counter", "Failed test methods",
+                   [({}, self.tests_failed)])
+            metric("disttest_queue_depth", "gauge", "Work units waiting to be dispatched",
+                   [({}, self.queue_depth)])
+            metric("disttest_inflight_units", "gauge", "Work units currently executing",
+                   [({}, self.inflight_units)])
+
+            metric("disttest_node_tests_total", "counter", "Completed test methods per node",
+                   [({"node": node_id}, stats["tests"]) for node_id, stats in self.node_stats.items()])
+            metric("disttest_node_throughput_tests_per_second", "gauge", "Test methods per second per node",
+                   [({"node": node_id}, f"{stats['tests'] / max(now - stats['start_time'], 1e-9):.6f}")
+                    for node_id, stats in self.node_stats.items()])
+            metric("disttest_worker_rss_bytes", "gauge", "Resident memory of the node's current worker process",
+                   [({"node": node_id}, stats["rss"]) for node_id, stats in self.node_stats.items()
+                    if stats["rss"] is not None])
+            metric("disttest_worker_restarts_total", "counter", "Worker restarts per node",
+                   [({"node": node_id}, stats["restarts"]) for node_id, stats in self.node_stats.items()])
+
+            metric("disttest_test_duration_seconds", "histogram", "Test method execution time", [])
+            count = 0
+            for bound, bucket_count in zip(self.DURATION_BUCKETS + (math.inf,), self.duration_buckets):
+                count += bucket_count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f'disttest_test_duration_seconds_bucket{{le="{le}"}} {count}')
+            lines.append(f"disttest_test_duration_seconds_sum {self.duration_sum:.6f}")
+            lines.append(f"disttest_test_duration_seconds_count {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def cleanup(self) -> None:
+        """关闭HTTP服务"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
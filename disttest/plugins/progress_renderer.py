@@ -0,0 +1,262 @@
+"""
+ProgressRenderer - 控制台进度渲染器
+以固定频率根据缓存的计数器重绘进度，终端中只重写发生变化的行。
+有执行历史时按各测试的历史平均耗时估计剩余时间，否则按吞吐量估计
+"""
+import sys
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, TextIO
+
+from colorama import Fore, Style
+
+
+class _LiveStdout:
+    """标准输出代理
+
+    其它代码在进度区域显示期间输出内容时，先擦除进度区域再写入，
+    进度区域会在下一次刷新时重新绘制，避免输出与进度条交错
+    """
+
+    def __init__(self, renderer: 'ProgressRenderer', stream: TextIO):
+        self._renderer = renderer
+        self._stream = stream
+
+    def write(self, text: str) -> int:
+        with self._renderer.lock:
+            self._renderer.erase()
+            self._stream.write(text)
+            if text:
+                self._renderer.at_line_start = text.endswith("\n")
+        return len(text)
+
+    def flush(self) -> None:
+        self._stream.flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+
+class DurationEstimator:
+    """根据执行历史中各测试的平均耗时估计剩余时间
+
+    剩余时间 = 剩余测试的历史耗时之和 / 并发执行的节点数，再减去最近一个测试完成后
+    已经过去的时间（正在执行的测试在此期间也在推进），两次完成之间估计值持续减少。
+    没有历史记录的测试按有记录测试的平均耗时计
+    """
+
+    def __init__(self, averages: Dict[str, float], planned: Dict[str, int]):
+        """
+        Args:
+            averages: 测试ID（模块.类名.方法名，参数化方法不带参数标识）-> 单个用例的历史平均耗时
+            planned: 本次执行的测试ID -> 用例数
+        """
+        self.averages = averages
+        self.default = sum(averages.values()) / len(averages) if averages else 0.0
+        self.total = sum(count * averages.get(key, self.default) for key, count in planned.items())
+        self.done = 0.0
+        self.last_completed = time.time()
+
+    def record(self, test_id: str) -> None:
+        """累计一个已完成测试的历史耗时"""
+        self.done += self.averages.get(test_id.split("[", 1)[0], self.default)
+        self.last_completed = time.time()
+
+    def eta(self, concurrency: int) -> float:
+        """预计剩余时间（秒）
+
+        Args:
+            concurrency: 正在并发执行测试的工作者数
+        """
+        remaining = max(0.0, self.total - self.done) / max(1, concurrency)
+        return max(0.0, remaining - (time.time() - self.last_completed))
+
+
+class ProgressRenderer:
+    """控制台进度渲染器
+
+    计数器由主控线程在测试方法完成时增量更新，渲染线程按固定频率读取计数器并
+    重绘。标准输出是终端时显示总进度和每个节点一行的进度；否则按固定间隔
+    输出一行纯文本进度
+    """
+
+    BAR_WIDTH = 50
+    NODE_BAR_WIDTH = 20
+
+    def __init__(self, refresh_rate: float = 10.0, plain_interval: float = 5.0,
+                 stream: Optional[TextIO] = None):
+        self.stream = stream or sys.stdout
+        self.is_tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self.interval = 1.0 / refresh_rate if self.is_tty else plain_interval
+        self.lock = threading.RLock()
+        self.at_line_start = True
+        self.total = 0
+        self.completed = 0
+        self.passed = 0
+        self.failed = 0
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.estimator: Optional[DurationEstimator] = None
+        self.concurrency: Optional[Callable[[], int]] = None
+        self._start_time = time.time()
+        self._drawn_lines: List[str] = []
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._original_stdout: Optional[TextIO] = None
+
+    def start(self, total: int, estimator: Optional[DurationEstimator] = None,
+              concurrency: Optional[Callable[[], int]] = None) -> None:
+        """开始渲染
+
+        Args:
+            total: 预计的测试用例总数
+            estimator: 根据执行历史估计剩余时间，为None时按吞吐量估计
+            concurrency: 返回当前正在执行测试的工作者数，为None时按一个并发计
+        """
+        self.total = total
+        self.estimator = estimator
+        self.concurrency = concurrency
+        if estimator is not None:
+            estimator.last_completed = time.time()
+        self.completed = self.passed = self.failed = 0
+        self.nodes = {}
+        self._start_time = time.time()
+        self._drawn_lines = []
+        self._stop_event.clear()
+        if self.is_tty and sys.stdout is self.stream:
+            self._original_stdout = sys.stdout
+            sys.stdout = _LiveStdout(self, self.stream)
+        self._thread = threading.Thread(target=self._loop, name="progress-renderer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止渲染并输出最终状态"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        with self.lock:
+            self.render()
+            if self._original_stdout is not None:
+                sys.stdout = self._original_stdout
+                self._original_stdout = None
+            self._drawn_lines = []
+
+    def add_node(self, node_id: str, method_count: int) -> None:
+        """登记节点"""
+        with self.lock:
+            self.nodes[node_id] = {"total": method_count, "completed": 0, "failed": 0, "done": False}
+
+    def complete_node(self, node_id: str) -> None:
+        """标记节点完成"""
+        with self.lock:
+            if node_id in self.nodes:
+                self.nodes[node_id]["done"] = True
+
+    def record(self, node_id: str, success: bool, test_id: Optional[str] = None) -> None:
+        """记录一个测试方法的结果"""
+        with self.lock:
+            self.completed += 1
+            if self.estimator is not None and test_id is not None:
+                self.estimator.record(test_id)
+            if success:
+                self.passed += 1
+            else:
+                self.failed += 1
+            node = self.nodes.get(node_id)
+            if node is not None:
+                node["completed"] += 1
+                if not success:
+                    node["failed"] += 1
+
+    def _loop(self) -> None:
+        """渲染线程主循环"""
+        while not self._stop_event.wait(self.interval):
+            with self.lock:
+                self.render()
+
+    def render(self) -> None:
+        """根据当前计数器绘制一帧（调用方持有锁）"""
+        if not self.is_tty:
+            self.stream.write(self._plain_line() + "\n")
+            self.stream.flush()
+            return
+        if not self.at_line_start:
+            return
+
+        lines = self._tty_lines()
+        previous = self._drawn_lines
+        out = []
+        if previous:
+            out.append(f"\x1b[{len(previous)}F")
+        for index, line in enumerate(lines):
+            if index < len(previous) and previous[index] == line:
+                out.append("\x1b[1E")
+            else:
+                out.append(f"\x1b[2K{line}\n")
+        if len(previous) > len(lines):
+            out.append("\x1b[J")
+        self.stream.write("".join(out))
+        self.stream.flush()
+        self._drawn_lines = lines
+
+    def erase(self) -> None:
+        """擦除已绘制的进度区域（调用方持有锁）"""
+        if self._drawn_lines:
+            self.stream.write(f"\x1b[{len(self._drawn_lines)}F\x1b[J")
+            self._drawn_lines = []
+
+    def _total(self) -> int:
+        """总数（参数表为生成器函数时事先无法得知用例数，已完成数可能超过预计总数）"""
+        return max(self.total, self.completed)
+
+    def _rates(self) -> tuple:
+        """计算吞吐量与预计剩余时间"""
+        elapsed = max(time.time() - self._start_time, 1e-9)
+        throughput = self.completed / elapsed
+        if self.estimator is not None:
+            # 按忙碌的工作者而不是未完成的节点计算并发：自动伸缩和远程执行时一个节点有多个工作者
+            return throughput, self.estimator.eta(self.concurrency() if self.concurrency else 1)
+        remaining = max(0, self._total() - self.completed)
+        eta = remaining / throughput if throughput > 0 else None
+        return throughput, eta
+
+    @staticmethod
+    def _format_eta(eta: Optional[float]) -> str:
+        if eta is None:
+            return "--:--"
+        minutes, seconds = divmod(int(eta), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+    def _tty_lines(self) -> List[str]:
+        """终端模式下的进度区域各行"""
+        total = self._total()
+        progress = int(self.completed * 100 / total) if total else 0
+        filled = int(self.BAR_WIDTH * progress / 100)
+        bar = '█' * filled + '░' * (self.BAR_WIDTH - filled)
+        throughput, eta = self._rates()
+        lines = [
+            f"{Fore.GREEN}执行进度: [{bar}] {progress}% ({self.completed}/{total}) "
+            f"通过: {self.passed} 失败: {self.failed} | {throughput:.1f} 个/秒 | "
+            f"预计剩余: {self._format_eta(eta)}{Style.RESET_ALL}"
+        ]
+        for node_id, node in self.nodes.items():
+            ratio = min(1.0, node["completed"] / node["total"]) if node["total"] else 1.0
+            node_filled = int(self.NODE_BAR_WIDTH * ratio)
+            node_bar = '█' * node_filled + '░' * (self.NODE_BAR_WIDTH - node_filled)
+            status = "已完成" if node["done"] else "运行中"
+            color = Fore.RED if node["failed"] else Fore.CYAN
+            lines.append(f"{color}  {node_id} [{node_bar}] {node['completed']}/{max(node['total'], node['completed'])} "
+                         f"失败: {node['failed']} {status}{Style.RESET_ALL}")
+        return lines
+
+    def _plain_line(self) -> str:
+        """非终端模式下的单行进度"""
+        throughput, eta = self._rates()
+        total = self._total()
+        progress = self.completed * 100 / total if total else 0
+        running = sum(1 for node in self.nodes.values() if not node["done"])
+        return (f"执行进度: {self.completed}/{total} ({progress:.1f}%) "
+                f"通过: {self.passed} 失败: {self.failed} 运行中节点: {running} "
+                f"吞吐: {throughput:.1f} 个/秒 预计剩余: {self._format_eta(eta)}")
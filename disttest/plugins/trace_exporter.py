@@ -0,0 +1,183 @@
+"""
+TraceExportPlugin - 执行时间线导出插件
+将节点、测试类夹具以及每个测试方法的setup/调用/teardown记录为带时间的span，
+导出为Chrome trace_event JSON（可用Perfetto查看）或OTLP风格的JSON
+"""
+import json
+import os
+import time
+import uuid
+from typing import Dict, Any, List, Optional, Tuple
+
+from .base import PluginBase
+from ..core import TestSuite, TestResult
+from ..core.test_result import TestMethodResult
+
+
+class TraceExportPlugin(PluginBase):
+    """执行时间线导出插件
+
+    运行过程中只把span以元组形式追加到列表中，序列化工作全部留到测试完成后，
+    以尽量降低对测试执行的影响。Chrome trace中每个节点是一个进程泳道，节点内
+    每个工作者是一个线程泳道，同一节点上并发执行的工作单元不会叠在一起
+    """
+
+    FORMATS = ("chrome", "otlp")
+    METHOD_PHASES = (("setup", "call"), ("call", "teardown"), ("teardown", "end"))
+
+    def __init__(self, output_dir: str = "traces", trace_name: str = None, trace_format: str = "chrome"):
+        super().__init__()
+        if trace_format not in self.FORMATS:
+            raise ValueError(f"不支持的trace格式: {trace_format}，可选值: {', '.join(self.FORMATS)}")
+        self.output_dir = output_dir
+        self.trace_format = trace_format
+        self.trace_name = trace_name or f"trace_{int(time.time())}.json"
+        # span: (节点ID, 工作者ID, 名称, 类别, 开始时间, 结束时间, 父span序号, 属性)
+        self.spans: List[Tuple[str, Optional[str], str, str, float, float, Optional[int], Dict[str, Any]]] = []
+        self._node_starts: Dict[str, float] = {}
+        self._run_start = time.time()
+
+    def on_setup(self) -> None:
+        """插件初始化设置"""
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+
+    def on_test_run_start(self, test_suite: TestSuite) -> None:
+        """测试开始时清空已记录的span"""
+        self.spans = []
+        self._node_starts = {}
+        self._run_start = time.time()
+
+    def on_node_start(self, node_id: str, node_suite: TestSuite) -> None:
+        """记录节点开始时间"""
+        self._node_starts[node_id] = time.time()
+
+    def on_unit_complete(self, node_id: str, result: TestResult) -> None:
+        """记录测试类夹具阶段，以及每个测试方法及其setup、调用、teardown阶段"""
+        spans = self.spans
+        worker_id = result.worker_id
+        for class_id, timings in result.class_timings.items():
+            spans.append((node_id, worker_id, class_id, "class", timings["setup_class"], timings["end"], None, {}))
+            spans.append((node_id, worker_id, "setup_class", "fixture", timings["setup_class"], timings["tests"],
+                          None, {}))
+            spans.append((node_id, worker_id, "teardown_class", "fixture", timings["teardown_class"], timings["end"],
+                          None, {}))
+        for method_result in result.results:
+            self._add_method_spans(node_id, worker_id, method_result)
+
+    def _add_method_spans(self, node_id: str, worker_id: Optional[str], method_result: TestMethodResult) -> None:
+        timings = method_result.timings
+        if not timings:
+            return
+        spans = self.spans
+        parent = len(spans)
+        spans.append((node_id, worker_id, f"{method_result.class_name}.{method_result.method_name}", "test",
+                      timings["setup"], timings["end"], None, {"success": method_result.success}))
+        for phase, next_phase in self.METHOD_PHASES:
+            start = timings[phase]
+            if start is None:
+                continue
+            end = timings[next_phase] if timings[next_phase] is not None else timings["teardown"]
+            spans.append((node_id, worker_id, phase, "phase", start, end, parent, {}))
+
+    def on_node_complete(self, node_id: str, result: TestResult) -> None:
+        """记录节点span"""
+        start = self._node_starts.pop(node_id, self._run_start)
+        summary = result.get_summary()
+        self.spans.append((node_id, None, node_id, "node", start, time.time(), None,
+                           {"total": summary["total"], "failed": summary["failed"]}))
+
+    def on_test_run_complete(self, result: TestResult) -> None:
+        """测试完成时写出trace文件"""
+        if self.trace_format == "otlp":
+            trace = self._build_otlp_trace()
+        else:
+            trace = self._build_chrome_trace()
+
+        trace_path = os.path.join(self.output_dir, self.trace_name)
+        with open(trace_path, "w", encoding="utf-8") as f:
+            json.dump(trace, f, ensure_ascii=False)
+        print(f"执行时间线已生成: {os.path.abspath(trace_path)}")
+
+    def _build_chrome_trace(self) -> Dict[str, Any]:
+        """生成Chrome trace_event格式，每个节点对应一个进程泳道，节点内每个工作者对应一个线程泳道
+
+        节点span和没有工作者的span（本地执行）在线程0上，工作者按首次出现的顺序编号
+        """
+        pids: Dict[str, int] = {}
+        tids: Dict[Tuple[str, str], int] = {}
+        events = []
+        for node_id, worker_id, name, category, start, end, _, args in self.spans:
+            if node_id not in pids:
+                pids[node_id] = len(pids) + 1
+                events.append({"name": "process_name", "ph": "M", "pid": pids[node_id], "tid": 0,
+                               "args": {"name": node_id}})
+            tid = 0
+            if worker_id is not None:
+                key = (node_id, worker_id)
+                if key not in tids:
+                    tids[key] = sum(1 for tid_node, _ in tids if tid_node == node_id) + 1
+                    events.append({"name": "thread_name", "ph": "M", "pid": pids[node_id], "tid": tids[key],
+                                   "args": {"name": worker_id}})
+                tid = tids[key]
+            events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self._run_start) * 1e6,
+                "dur": max(0.0, end - start) * 1e6,
+                "pid": pids[node_id],
+                "tid": tid,
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def _build_otlp_trace(self) -> Dict[str, Any]:
+        """生成OTLP/JSON风格的trace，节点span作为同节点上其它span的父span"""
+        trace_id = uuid.uuid4().hex
+        span_ids = [uuid.uuid4().hex[:16] for _ in self.spans]
+        node_span_ids = {node_id: span_ids[index] for index, (node_id, _, _, category, *_rest)
+                         in enumerate(self.spans) if category == "node"}
+
+        otlp_spans = []
+        for index, (node_id, worker_id, name, category, start, end, parent, args) in enumerate(self.spans):
+            if parent is not None:
+                parent_span_id = span_ids[parent]
+            elif category != "node":
+                parent_span_id = node_span_ids.get(node_id, "")
+            else:
+                parent_span_id = ""
+            attributes = [{"key": "disttest.node_id", "value": {"stringValue": node_id}},
+                          {"key": "disttest.category", "value": {"stringValue": category}}]
+            if worker_id is not None:
+                attributes.append({"key": "disttest.worker_id", "value": {"stringValue": worker_id}})
+            for key, value in args.items():
+                attributes.append({"key": f"disttest.{key}", "value": self._otlp_value(value)})
+            otlp_spans.append({
+                "traceId": trace_id,
+                "spanId": span_ids[index],
+                "parentSpanId": parent_span_id,
+                "name": name,
+                "kind": 1,
+                "startTimeUnixNano": str(int(start * 1e9)),
+                "endTimeUnixNano": str(int(end * 1e9)),
+                "attributes": attributes,
+            })
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "disttest"}}]},
+                "scopeSpans": [{"scope": {"name": "disttest"}, "spans": otlp_spans}],
+            }]
+        }
+
+    @staticmethod
+    def _otlp_value(value: Any) -> Dict[str, Any]:
+        """转换为OTLP属性值"""
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
@@ -1,4 +1,9 @@
 from .test_runner import TestRunner
 from .node_manager import NodeManager
+from .worker import WorkerPolicy
+from .coordinator import RemoteWorker
+from .checkpoint import RunJournal
+from .autoscaler import AutoscalePolicy
+from .placement import PlacementPolicy
 
-__all__ = ['TestRunner', 'NodeManager'] 
\ No newline at end of file
+__all__ = ['TestRunner', 'NodeManager', 'WorkerPolicy', 'RemoteWorker', 'RunJournal', 'AutoscalePolicy', 'PlacementPolicy']
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+Autoscaler类 - 工作者数量自动伸缩
+根据待执行队列深度和主机负载调整并发的工作者数量：队列较深且CPU空闲时增加工作者，
+主机被其它进程占用或执行进入尾部、工作者空闲时减少工作者
+"""
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+
+@dataclass
+class AutoscalePolicy:
+    """自动伸缩策略"""
+    min_workers: int = 1
+    max_workers: Optional[int] = None  # 默认为CPU核数
+    interval: float = 1.0  # 两次调整之间的最短间隔（秒）
+    target_load: float = 1.0  # 每个CPU核的目标负载，主机负载超过该值时不再增加工作者
+    idle_timeout: float = 2.0  # 队列为空后工作者连续空闲超过该时间（秒）即退出
+
+
+def _load_average() -> float:
+    """主机最近1分钟的平均负载（不支持 os.getloadavg 的平台由 psutil 模拟）"""
+    getloadavg = getattr(os, "getloadavg", psutil.getloadavg)
+    return getloadavg()[0]
+
+
+class Autoscaler:
+    """根据队列深度和主机负载计算目标工作者数量
+
+    主机负载中除本次执行的工作者之外的部分视为其它进程的负载，目标工作者数不超过
+    CPU核数 * target_load 减去其它进程的负载，避免在共享的CI主机上过度占用CPU。
+    有待执行的工作单元时目标数每次最多翻倍，队列为空时降到正在执行的工作者数
+    """
+
+    def __init__(self, policy: AutoscalePolicy, cpu_count: Optional[int] = None):
+        """
+        Args:
+            policy: 自动伸缩策略
+            cpu_count: 主机CPU核数，默认为 os.cpu_count()
+        """
+        self.policy = policy
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self.max_workers = max(1, policy.max_workers or self.cpu_count)
+        self.min_workers = max(1, min(policy.min_workers, self.max_workers))
+        self.target = self.min_workers
+        self.peak = self.target
+        self.adjustments = 0
+        self.started_at = time.time()
+        self._last_update = 0.0
+        # 每次调整的记录: 距开始的秒数、目标工作者数、主机负载、执行中和待执行的工作单元数、工作者利用率
+        self.history: List[Dict[str, Any]] = []
+
+    def due(self) -> bool:
+        """距上次调整是否已超过调整间隔"""
+        return time.time() - self._last_update >= self.policy.interval
+
+    def update(self, pending: int, busy: int, utilization: Optional[float] = None) -> int:
+        """根据当前状态更新目标工作者数
+
+        Args:
+            pending: 待执行的工作单元数
+            busy: 正在执行工作单元的工作者数
+            utilization: 工作者的平均利用率（执行工作单元的时间占比），只用于记录
+
+        Returns:
+            目标工作者数
+        """
+        self._last_update = time.time()
+        load = _load_average()
+        other_load = max(0.0, load - busy)
+        allowed = max(self.min_workers, int(self.cpu_count * self.policy.target_load - other_load))
+        if pending:
+            target = min(self.max_workers, allowed, busy + pending, self.target * 2)
+        else:
+            target = busy
+        target = max(self.min_workers, target)
+
+        if target != self.target:
+            self.adjustments += 1
+            self.target = target
+            self.peak = max(self.peak, target)
+        self.history.append({
+            "time": round(self._last_update - self.started_at, 3),
+            "target": target,
+            "load": round(load, 2),
+            "busy": busy,
+            "pending": pending,
+            "utilization": None if utilization is None else round(utilization, 3),
+        })
+        return target
+
+    def summary(self) -> Dict[str, Any]:
+        """伸缩过程的摘要，记录在节点元数据中"""
+        utilizations = [entry["utilization"] for entry in self.history if entry["utilization"] is not None]
+        return {
+            "min_workers": self.min_workers,
+            "max_workers": self.max_workers,
+            "target": self.target,
+            "peak": self.peak,
+            "adjustments": self.adjustments,
+            "mean_utilization": sum(utilizations) / len(utilizations) if utilizations else None,
+            "history": self.history,
+        }
@@ -0,0 +1,194 @@
+"""
+RunJournal类 - 断点续跑日志
+主控节点在执行过程中把每个工作单元的结果追加写入本地日志，执行意外中断后可以从日志
+恢复已完成的结果，只调度剩余的测试
+
+日志为 JSON Lines 格式，第一行是执行信息，之后每行是一个工作单元的结果:
+    {"type": "run", "run_id": ..., "started_at": ..., "mode": ..., ...}
+    {"type": "unit", "node_id": ..., "results": [...]}
+    {"type": "complete", "finished_at": ...}
+进程在写入过程中退出时最后一行可能不完整，读取时忽略
+"""
+import json
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from ..core import TestCase, TestResult
+from ..core.parametrize import count_cases, is_parametrized
+from ..core.test_result import TestMethodResult
+
+
+def _method_result_to_dict(method_result: TestMethodResult) -> Dict[str, Any]:
+    return {
+        "method_name": method_result.method_name,
+        "class_name": method_result.class_name,
+        "module": method_result.module,
+        "success": method_result.success,
+        "error_message": method_result.error_message,
+        "execution_time": method_result.execution_time,
+        "start_time": method_result.start_time.isoformat(),
+        "additional_data": method_result.additional_data,
+        "timings": method_result.timings,
+    }
+
+
+def _method_result_from_dict(data: Dict[str, Any]) -> TestMethodResult:
+    data = dict(data)
+    data["start_time"] = datetime.fromisoformat(data["start_time"])
+    return TestMethodResult(**data)
+
+
+class RunJournal:
+    """断点续跑日志，每次执行一个文件: <directory>/<run_id>.jsonl"""
+
+    DEFAULT_DIR = os.path.join(".disttest", "runs")
+
+    def __init__(self, path: str, run_id: str, fsync: bool = False):
+        """
+        Args:
+            path: 日志文件路径
+            run_id: 执行ID
+            fsync: 每条记录写入后是否调用fsync，为False时只保证进程退出后记录不丢失
+        """
+        self.path = path
+        self.run_id = run_id
+        self.fsync = fsync
+        self.header: Dict[str, Any] = {}
+        self._file = open(path, "a", encoding="utf-8")
+
+    @classmethod
+    def path_for(cls, run_id: str, directory: Optional[str] = None) -> str:
+        """执行ID对应的日志文件路径"""
+        return os.path.join(directory or cls.DEFAULT_DIR, f"{run_id}.jsonl")
+
+    @classmethod
+    def create(cls, directory: Optional[str] = None, run_id: Optional[str] = None,
+               fsync: bool = False, **info: Any) -> "RunJournal":
+        """创建新的日志
+
+        Args:
+            directory: 日志目录
+            run_id: 执行ID，默认由当前时间和随机串生成
+            fsync: 每条记录写入后是否调用fsync
+            info: 写入执行信息的其它字段（运行模式、测试用例类等）
+        """
+        run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        path = cls.path_for(run_id, directory)
+        if os.path.exists(path):
+            raise FileExistsError(f"执行日志已存在: {path}")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        journal = cls(path, run_id, fsync)
+        journal.header = {"type": "run", "run_id": run_id, "started_at": time.time(), **info}
+        journal._append(journal.header)
+        return journal
+
+    @classmethod
+    def resume(cls, run_id: str, directory: Optional[str] = None,
+               fsync: bool = False) -> Tuple["RunJournal", TestResult]:
+        """打开已有的日志继续追加，并恢复其中已完成的结果
+
+        Returns:
+            (日志, 恢复的测试结果)
+        """
+        path = cls.path_for(run_id, directory)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"执行日志不存在: {path}")
+        header, result, valid_size = cls.load(path)
+        # 截掉不完整的最后一行，之后的记录从完整的行末尾开始追加
+        with open(path, "r+b") as f:
+            f.truncate(valid_size)
+        journal = cls(path, run_id, fsync)
+        journal.header = header
+        journal._append({"type": "resume", "resumed_at": time.time(), "completed": len(result.results)})
+        return journal, result
+
+    @staticmethod
+    def load(path: str) -> Tuple[Dict[str, Any], TestResult, int]:
+        """读取日志
+
+        Returns:
+            (执行信息, 已完成的测试结果, 完整记录的字节数)
+        """
+        header: Dict[str, Any] = {}
+        result = TestResult()
+        valid_size = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                valid_size += len(line)
+                kind = record.get("type")
+                if kind == "run":
+                    header = record
+                    result.node_id = record.get("master_node_id", "")
+                elif kind == "unit":
+                    for item in record["results"]:
+                        result.add_result(_method_result_from_dict(item), record["node_id"])
+                elif kind == "complete":
+                    header["finished_at"] = record["finished_at"]
+        return header, result, valid_size
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def record(self, result: TestResult) -> None:
+        """记录一个工作单元的结果"""
+        if result.results:
+            self._append({"type": "unit", "node_id": result.node_id,
+                          "results": [_method_result_to_dict(method_result) for method_result in result.results]})
+
+    def complete(self) -> None:
+        """记录执行正常结束"""
+        self._append({"type": "complete", "finished_at": time.time()})
+
+    def close(self) -> None:
+        """关闭日志文件"""
+        if not self._file.closed:
+            self._file.close()
+
+
+def remaining_methods(test_cases: List[Type[TestCase]], completed: TestResult) -> Dict[Type[TestCase], List[str]]:
+    """计算断点续跑时各测试用例类还需要执行的方法（包括基准测试方法）
+
+    普通方法的结果已在日志中时视为完成；参数化方法的所有参数组都已完成时才视为完成
+    （参数表为生成器函数时无法确定参数组数量，总是重新执行，已完成的参数组结果以日志为准）
+
+    Args:
+        test_cases: 测试用例类
+        completed: 从日志恢复的测试结果
+
+    Returns:
+        测试用例类到剩余方法的映射，只包含有方法已完成的类，未出现的类全部执行
+    """
+    # 参数化方法按 "模块.类名.方法名" 统计已完成的参数组数
+    case_counts = Counter(method_result.test_id.split("[", 1)[0] for method_result in completed.results
+                          if "[" in method_result.method_name)
+    remaining: Dict[Type[TestCase], List[str]] = {}
+    for test_case in test_cases:
+        test_methods = test_case.get_test_methods()
+        methods = test_methods + test_case.get_benchmark_methods()
+        prefix = f"{test_case.__module__}.{test_case.__name__}."
+        left = []
+        for method_name in methods:
+            test_id = prefix + method_name
+            method = getattr(test_case, method_name)
+            if method_name in test_methods and is_parametrized(method):
+                count = count_cases(method)
+                if count is None or case_counts[test_id] < count:
+                    left.append(method_name)
+            elif test_id not in completed:
+                left.append(method_name)
+        if len(left) < len(methods):
+            remaining[test_case] = left
+    return remaining
@@ -0,0 +1,444 @@
+"""
+Coordinator类 - 远程工作者协调器
+主控节点在一个asyncio事件循环中接受远程工作者的TCP连接，处理注册、心跳、工作单元派发
+和结果汇总；RemoteWorker 是运行在工作者主机上的同步客户端
+
+连接上的消息使用 wire 模块的二进制格式，每帧前加4字节长度。消息为元组:
+    工作者 -> 主控: ("register", worker_id, info)  ("heartbeat",)  ("result", unit_id, result, error, stats)
+    主控 -> 工作者: ("welcome", heartbeat_interval)  ("unit", work_unit)  ("stop",)
+
+每个连接的缓冲都有上限：超过 max_frame_bytes 的帧视为协议错误并断开连接，
+待发送消息队列最多 outbox_size 条，写缓冲超过上限时等待对端读取
+"""
+import asyncio
+import os
+import socket
+import struct
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..core import LeakDetector
+from ..core.capture import CapturePolicy
+from ..core.fixtures import FixtureCache
+from .node_manager import NodeManager
+from .scheduler import Scheduler, WorkUnit
+from .wire import WireDecoder, WireEncoder
+from .worker import run_unit
+
+FRAME_LENGTH = struct.Struct(">I")
+DEFAULT_MAX_FRAME_BYTES = 16 * 1024 * 1024
+
+
+class _Connection:
+    """一个远程工作者的连接状态"""
+
+    def __init__(self, worker_id: str, host: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 decoder: WireDecoder, outbox_size: int):
+        self.worker_id = worker_id
+        self.host = host
+        self.reader = reader
+        self.writer = writer
+        self.encoder = WireEncoder()
+        self.decoder = decoder
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=outbox_size)
+        self.inflight: Optional[WorkUnit] = None
+        self.last_seen = time.monotonic()
+        self.units_done = 0
+
+    def send(self, message: Tuple) -> None:
+        """放入待发送队列，队列已满时抛出 asyncio.QueueFull"""
+        self.outbox.put_nowait(message)
+
+
+async def _read_frame(reader: asyncio.StreamReader, decoder: WireDecoder, max_frame_bytes: int) -> Any:
+    """读取一帧并解码出其中的一条消息"""
+    (length,) = FRAME_LENGTH.unpack(await reader.readexactly(FRAME_LENGTH.size))
+    if length > max_frame_bytes:
+        raise ValueError(f"消息帧过大: {length} 字节，上限 {max_frame_bytes} 字节")
+    return decoder.decode_frame(await reader.readexactly(length))[0]
+
+
+def _pack_frame(encoder: WireEncoder, message: Tuple) -> bytes:
+    frame = encoder.encode_frame([message])
+    return FRAME_LENGTH.pack(len(frame)) + frame
+
+
+class Coordinator:
+    """远程工作者协调器
+
+    所有工作单元来自同一个调度器节点，空闲的工作者逐个领取工作单元；工作者断开连接或
+    心跳超时时，其正在执行的工作单元重新排队（连续两次失败后记录为错误）
+    """
+
+    def __init__(self, scheduler: Scheduler, node_id: str, host: str = "127.0.0.1", port: int = 0,
+                 node_manager: Optional[NodeManager] = None, heartbeat_interval: float = 5.0,
+                 heartbeat_timeout: float = 15.0, max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES,
+                 outbox_size: int = 8,
+                 on_result: Optional[Callable[[str, WorkUnit, Any, Optional[str], Dict[str, Any]], None]] = None,
+                 on_error: Optional[Callable[[WorkUnit, str], None]] = None):
+        """
+        Args:
+            scheduler: 调度器，工作单元从其中 node_id 对应的队列领取
+            node_id: 调度器中的节点ID
+            host: 监听地址
+            port: 监听端口，0表示随机端口
+            node_manager: 节点管理器，工作者注册后记录为节点并更新心跳
+            heartbeat_interval: 工作者发送心跳的间隔（秒）
+            heartbeat_timeout: 超过该时间没有收到消息的工作者视为失联
+            max_frame_bytes: 单帧大小上限（字节）
+            outbox_size: 每个连接的待发送消息数上限
+            on_result: 收到工作单元结果时的回调 (worker_id, unit, result, error, stats)
+            on_error: 工作单元多次因工作者失联而失败时的回调 (unit, error)
+        """
+        self.scheduler = scheduler
+        self.node_id = node_id
+        self.host = host
+        self.port = port
+        self.node_manager = node_manager
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_frame_bytes = max_frame_bytes
+        self.outbox_size = outbox_size
+        self.on_result = on_result
+        self.on_error = on_error
+
+        self.address: Optional[Tuple[str, int]] = None
+        self.connections: Dict[str, _Connection] = {}
+        self.stats = {"registered": 0, "disconnected": 0, "units": 0, "results": 0, "requeued": 0}
+        self._dispatching = False
+        self._stopping = False
+        self._handlers: set = set()
+        self._done: Optional[asyncio.Event] = None
+        self._workers_changed: Optional[asyncio.Condition] = None
+
+    async def serve(self, min_workers: int = 1, timeout: float = 600,
+                    ready: Optional[Callable[[Tuple[str, int]], Any]] = None) -> bool:
+        """启动服务，注册的工作者达到 min_workers 后开始派发，直到所有工作单元完成或超时
+
+        Args:
+            min_workers: 开始派发前需要注册的工作者数量
+            timeout: 超时时间（秒）
+            ready: 开始监听后以监听地址调用的回调，返回协程时会被调度执行
+
+        Returns:
+            是否在超时前完成了所有工作单元
+        """
+        self._done = asyncio.Event()
+        self._workers_changed = asyncio.Condition()
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                            limit=64 * 1024, backlog=4096)
+        self.address = server.sockets[0].getsockname()[:2]
+        monitor = asyncio.create_task(self._monitor())
+        background = []
+        if ready is not None:
+            callback_result = ready(self.address)
+            if asyncio.iscoroutine(callback_result):
+                background.append(asyncio.create_task(callback_result))
+
+        deadline = time.monotonic() + timeout
+        completed = False
+        try:
+            if await self.wait_for_workers(min_workers, timeout):
+                self._dispatching = True
+                self._dispatch()
+                self._check_done()
+                try:
+                    await asyncio.wait_for(self._done.wait(), max(0.0, deadline - time.monotonic()))
+                    completed = True
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._stopping = True
+            monitor.cancel()
+            server.close()
+            for connection in list(self.connections.values()):
+                if self.node_manager is not None:
+                    self.node_manager.update_node_status(connection.worker_id, "已完成")
+                try:
+                    connection.send(("stop",))
+                except asyncio.QueueFull:
+                    connection.writer.close()
+            # 等待停止消息发出后再关闭连接
+            for connection in list(self.connections.values()):
+                try:
+                    await asyncio.wait_for(connection.outbox.join(), 5.0)
+                except asyncio.TimeoutError:
+                    pass
+                connection.writer.close()
+            # 连接关闭后各连接的处理协程随即结束
+            if self._handlers:
+                await asyncio.wait(self._handlers, timeout=5.0)
+            await server.wait_closed()
+            for task in background:
+                try:
+                    await asyncio.wait_for(task, 5.0)
+                except (asyncio.TimeoutError, Exception):
+                    task.cancel()
+        return completed
+
+    async def wait_for_workers(self, count: int, timeout: float) -> bool:
+        """等待注册的工作者达到指定数量，工作者注册时立即唤醒"""
+        async with self._workers_changed:
+            try:
+                await asyncio.wait_for(
+                    self._workers_changed.wait_for(lambda: len(self.connections) >= count), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """处理一个工作者连接，记录处理协程以便停止时等待其结束"""
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        try:
+            await self._serve_connection(reader, writer)
+        finally:
+            self._handlers.discard(handler)
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """一个工作者连接的生命周期：注册、收发消息、断开后清理"""
+        writer.transport.set_write_buffer_limits(high=self.max_frame_bytes)
+        peer = writer.get_extra_info("peername")
+        decoder = WireDecoder()
+        try:
+            message = await asyncio.wait_for(_read_frame(reader, decoder, self.max_frame_bytes),
+                                             self.heartbeat_timeout)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            writer.close()
+            return
+        if not (isinstance(message, tuple) and len(message) == 3 and message[0] == "register"):
+            writer.close()
+            return
+
+        _, worker_id, info = message
+        if worker_id in self.connections:
+            worker_id = f"{worker_id}-{uuid.uuid4().hex[:4]}"
+        host = (info or {}).get("host") or (peer[0] if peer else "unknown")
+        connection = _Connection(worker_id, host, reader, writer, decoder, self.outbox_size)
+        self.connections[worker_id] = connection
+        self.stats["registered"] += 1
+        if self.node_manager is not None:
+            self.node_manager.register_node(host=host, node_id=worker_id)
+            self.node_manager.get_node(worker_id).metadata.update({"pid": (info or {}).get("pid"), "units": 0})
+            self.node_manager.update_node_status(worker_id, "运行中")
+        connection.send(("welcome", self.heartbeat_interval))
+        writer_task = asyncio.create_task(self._write_loop(connection))
+        async with self._workers_changed:
+            self._workers_changed.notify_all()
+        if self._dispatching:
+            self._dispatch()
+
+        try:
+            while True:
+                message = await _read_frame(reader, decoder, self.max_frame_bytes)
+                connection.last_seen = time.monotonic()
+                self._handle_message(connection, message)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, asyncio.QueueFull):
+            pass
+        finally:
+            writer_task.cancel()
+            self._drop(connection)
+
+    async def _write_loop(self, connection: _Connection) -> None:
+        """按顺序发送连接的待发送消息，写缓冲超过上限时等待"""
+        try:
+            while True:
+                message = await connection.outbox.get()
+                try:
+                    connection.writer.write(_pack_frame(connection.encoder, message))
+                    await connection.writer.drain()
+                finally:
+                    connection.outbox.task_done()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    def _handle_message(self, connection: _Connection, message: Tuple) -> None:
+        """处理工作者发来的消息"""
+        kind = message[0]
+        if self.node_manager is not None:
+            node = self.node_manager.get_node(connection.worker_id)
+            if node is not None:
+                node.update_heartbeat()
+        if kind == "heartbeat":
+            return
+        if kind != "result":
+            raise ValueError(f"未知的消息类型: {kind}")
+
+        _, unit_id, result, error, stats = message
+        unit = connection.inflight
+        if unit is None or unit.unit_id != unit_id:
+            raise ValueError(f"工作者 {connection.worker_id} 返回了未派发的工作单元: {unit_id}")
+        connection.inflight = None
+        connection.units_done += 1
+        self.scheduler.release(self.node_id, unit)
+        self.stats["results"] += len(result.results) if result is not None else 0
+        if self.node_manager is not None:
+            node = self.node_manager.get_node(connection.worker_id)
+            if node is not None:
+                node.metadata["units"] = connection.units_done
+        if self.on_result is not None:
+            self.on_result(connection.worker_id, unit, result, error, stats)
+        self._dispatch()
+        self._check_done()
+
+    def _dispatch(self) -> None:
+        """向空闲的工作者派发工作单元"""
+        if not self._dispatching:
+            return
+        for connection in list(self.connections.values()):
+            if connection.inflight is not None:
+                continue
+            unit = self.scheduler.next_unit(self.node_id)
+            if unit is None:
+                return
+            connection.inflight = unit
+            try:
+                connection.send(("unit", unit))
+            except asyncio.QueueFull:
+                connection.inflight = None
+                self.scheduler.requeue(self.node_id, unit)
+                connection.writer.close()
+                continue
+            self.stats["units"] += 1
+
+    def _drop(self, connection: _Connection) -> None:
+        """移除断开的工作者，重新排队其正在执行的工作单元"""
+        if self.connections.get(connection.worker_id) is not connection:
+            return
+        del self.connections[connection.worker_id]
+        connection.writer.close()
+        if self._stopping:
+            return
+        self.stats["disconnected"] += 1
+        if self.node_manager is not None:
+            self.node_manager.update_node_status(connection.worker_id, "已断开")
+
+        unit, connection.inflight = connection.inflight, None
+        if unit is not None:
+            unit.attempts += 1
+            if unit.attempts < 2:
+                self.scheduler.requeue(self.node_id, unit)
+                self.stats["requeued"] += 1
+            else:
+                self.scheduler.release(self.node_id, unit)
+                if self.on_error is not None:
+                    self.on_error(unit, f"工作者 {connection.worker_id} 在执行该测试用例类时多次断开连接")
+        self._dispatch()
+        self._check_done()
+
+    def _check_done(self) -> None:
+        """所有工作单元完成时结束服务"""
+        if not self._dispatching or self._done.is_set():
+            return
+        if self.scheduler.pending_count(self.node_id) == 0 and self.scheduler.running_count(self.node_id) == 0:
+            self._done.set()
+
+    async def _monitor(self) -> None:
+        """定期断开心跳超时的工作者"""
+        while True:
+            await asyncio.sleep(min(self.heartbeat_interval, self.heartbeat_timeout) / 2)
+            now = time.monotonic()
+            for connection in list(self.connections.values()):
+                if now - connection.last_seen > self.heartbeat_timeout:
+                    print(f"工作者 {connection.worker_id} 心跳超时，断开连接")
+                    connection.writer.close()
+                    self._drop(connection)
+
+
+class RemoteWorker:
+    """远程工作者客户端，连接协调器并执行派发的工作单元
+
+    测试用例类按 "模块:类名" 在工作者进程中导入，工作者主机需要能够导入测试模块
+    """
+
+    def __init__(self, host: str, port: int, worker_id: Optional[str] = None,
+                 leak_detector: Optional[LeakDetector] = None, max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES,
+                 capture: Optional[CapturePolicy] = None):
+        """
+        Args:
+            host: 协调器地址
+            port: 协调器端口
+            worker_id: 工作者ID，默认由主机名和进程号生成
+            leak_detector: 内存泄漏检测器
+            max_frame_bytes: 单帧大小上限（字节）
+            capture: 测试输出的捕获策略，默认只为失败的测试保留输出
+        """
+        self.host = host
+        self.port = port
+        self.worker_id = worker_id or f"remote-{socket.gethostname()}-{os.getpid()}"
+        self.leak_detector = leak_detector
+        self.max_frame_bytes = max_frame_bytes
+        self.capture = capture or CapturePolicy()
+        self.units_run = 0
+        self._socket: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        self._encoder = WireEncoder()
+        self._decoder = WireDecoder()
+
+    def _send(self, message: Tuple) -> None:
+        with self._send_lock:
+            self._socket.sendall(_pack_frame(self._encoder, message))
+
+    def _recv_exactly(self, size: int) -> bytes:
+        chunks = []
+        while size:
+            chunk = self._socket.recv(min(size, 1024 * 1024))
+            if not chunk:
+                raise ConnectionError("协调器关闭了连接")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def _recv(self) -> Tuple:
+        (length,) = FRAME_LENGTH.unpack(self._recv_exactly(FRAME_LENGTH.size))
+        if length > self.max_frame_bytes:
+            raise ValueError(f"消息帧过大: {length} 字节，上限 {self.max_frame_bytes} 字节")
+        return self._decoder.decode_frame(self._recv_exactly(length))[0]
+
+    def _heartbeat_loop(self, interval: float, stopped: threading.Event) -> None:
+        while not stopped.wait(interval):
+            try:
+                self._send(("heartbeat",))
+            except OSError:
+                return
+
+    def run(self) -> int:
+        """连接协调器并执行工作单元，直到收到停止消息或连接断开
+
+        Returns:
+            执行的工作单元数
+        """
+        self._socket = socket.create_connection((self.host, self.port))
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stopped = threading.Event()
+        fixture_cache = FixtureCache()
+        suite_name = f"remote-{self.worker_id}"
+        tests_run = 0
+        if self.leak_detector:
+            self.leak_detector.start()
+            self.leak_detector.reset_worker(self.worker_id)
+        try:
+            self._send(("register", self.worker_id, {"host": socket.gethostname(), "pid": os.getpid()}))
+            _, interval = self._recv()
+            threading.Thread(target=self._heartbeat_loop, args=(interval, stopped), daemon=True).start()
+            while True:
+                message = self._recv()
+                if message[0] == "stop":
+                    break
+                unit = message[1]
+                result, error, fixture_setups = run_unit(unit, self.worker_id, suite_name,
+                                                         self.leak_detector, fixture_cache, self.capture)
+                tests_run += len(result.results) if result is not None else 0
+                self.units_run += 1
+                stats = {"pid": os.getpid(), "tests_run": tests_run, "fixture_setups": fixture_setups}
+                self._send(("result", unit.unit_id, result, error, stats))
+        except ConnectionError:
+            pass
+        finally:
+            stopped.set()
+            for fixture_error in fixture_cache.close():
+                print(f"工作者 {self.worker_id}: {fixture_error}")
+            self._socket.close()
+        return self.units_run
@@ -3,10 +3,13 @@ NodeManager类 - 节点管理器
 用于管理分布式测试节点
 """
 import socket
+import threading
 import time
 import uuid
 from typing import Dict, List, Optional, Any
 
+from ..core.resources import DEFAULT_CAPACITY
+
 
 class Node:
     """测试节点"""
@@ -33,17 +36,39 @@ class NodeManager:
     def __init__(self):
         self.nodes: Dict[str, Node] = {}
         self.master_node_id = f"master-{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        # 节点注册或注销时通知等待中的线程
+        self._changed = threading.Condition()
     
-    def register_node(self, host: str = "localhost") -> str:
-        """注册新节点"""
-        node_id = f"worker-{host}-{uuid.uuid4().hex[:8]}"
-        self.nodes[node_id] = Node(node_id, host)
+    def register_node(self, host: str = "localhost", node_id: Optional[str] = None,
+                      capacity: Optional[Dict[str, Optional[float]]] = None) -> str:
+        """注册新节点
+        
+        Args:
+            host: 节点主机名
+            node_id: 节点ID，为None时自动生成
+            capacity: 节点容量 {"cpu": ..., "memory": MB}，为None或缺少的项使用默认值，
+                记录在节点元数据的 capacity 中
+            
+        Returns:
+            节点ID
+        """
+        node_id = node_id or f"worker-{host}-{uuid.uuid4().hex[:8]}"
+        unknown = set(capacity or {}) - set(DEFAULT_CAPACITY)
+        if unknown:
+            raise ValueError(f"不支持的节点容量项: {', '.join(sorted(unknown))}，可选值: {', '.join(DEFAULT_CAPACITY)}")
+        node = Node(node_id, host)
+        node.metadata["capacity"] = dict(DEFAULT_CAPACITY, **(capacity or {}))
+        with self._changed:
+            self.nodes[node_id] = node
+            self._changed.notify_all()
         return node_id
     
     def unregister_node(self, node_id: str) -> None:
         """注销节点"""
-        if node_id in self.nodes:
-            del self.nodes[node_id]
+        with self._changed:
+            if node_id in self.nodes:
+                del self.nodes[node_id]
+            self._changed.notify_all()
     
     def get_node(self, node_id: str) -> Optional[Node]:
         """获取节点信息"""
@@ -64,7 +89,7 @@ class NodeManager:
             self.nodes[node_id].update_heartbeat()
     
     def wait_for_nodes(self, count: int, timeout: float = 60.0) -> bool:
-        """等待指定数量的节点注册
+        """等待指定数量的节点注册，节点注册时立即唤醒而不是定时轮询
         
         Args:
             count: 期望的节点数量
@@ -73,9 +98,5 @@ class NodeManager:
         Returns:
             是否在超时时间内达到期望的节点数量
         """
-        start_time = time.time()
-        while (time.time() - start_time) < timeout:
-            if len(self.get_alive_nodes()) >= count:
-                return True
-            time.sleep(1)
-        return False 
\ No newline at end of file
+        with self._changed:
+            return self._changed.wait_for(lambda: len(self.get_alive_nodes()) >= count, timeout) 
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+CpuPlacer类 - 工作进程的CPU绑定
+按CPU拓扑把子进程工作者绑定到固定的核心集合 (os.sched_setaffinity)：工作者轮流分布到
+各个NUMA节点（没有NUMA信息时为物理CPU插槽），同一插槽内选择绑定工作者最少的核心；
+可以为基准测试保留一组核心（优先使用内核隔离的核心），普通测试的工作者不会使用这些核心
+"""
+import glob
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+SYSFS_CPU = "/sys/devices/system/cpu"
+SYSFS_NODE = "/sys/devices/system/node"
+
+
+def parse_cpu_list(text: str) -> List[int]:
+    """解析内核的CPU列表格式，例如 "0-3,8,10-11" """
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cpus.extend(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+def format_cpu_list(cpus: List[int]) -> str:
+    """把CPU编号格式化为内核的CPU列表格式"""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+@dataclass
+class CpuTopology:
+    """可用CPU核心的拓扑"""
+    sockets: Dict[int, List[int]]  # NUMA节点（或物理CPU插槽）编号 -> 可用的核心
+    isolated: List[int]  # 内核隔离的核心 (isolcpus)
+
+    @classmethod
+    def detect(cls) -> "CpuTopology":
+        """从 /sys 读取当前进程可用核心的拓扑，读取不到时视为一个插槽"""
+        if hasattr(os, "sched_getaffinity"):
+            available = set(os.sched_getaffinity(0))
+        else:
+            available = set(range(os.cpu_count() or 1))
+        isolated = set(parse_cpu_list(_read(os.path.join(SYSFS_CPU, "isolated")) or ""))
+        # 隔离的核心不在默认的亲和性掩码中，但可以显式绑定
+        usable = available | isolated
+
+        sockets: Dict[int, List[int]] = {}
+        for path in glob.glob(os.path.join(SYSFS_NODE, "node[0-9]*", "cpulist")):
+            node = int(re.search(r"node(\d+)", path).group(1))
+            cpus = sorted(usable.intersection(parse_cpu_list(_read(path) or "")))
+            if cpus:
+                sockets[node] = cpus
+        if len(sockets) <= 1:
+            sockets = {}
+            for cpu in sorted(usable):
+                package = _read(os.path.join(SYSFS_CPU, f"cpu{cpu}", "topology", "physical_package_id"))
+                sockets.setdefault(int(package) if package and package.strip().isdigit() else 0, []).append(cpu)
+        return cls(sockets or {0: sorted(usable)}, sorted(isolated & usable))
+
+
+@dataclass(frozen=True)
+class Placement:
+    """一个工作者的绑定位置"""
+    cpus: Tuple[int, ...]
+    socket: int
+    reserved: bool = False  # 是否为基准测试保留的核心
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"cpus": format_cpu_list(list(self.cpus)), "socket": self.socket, "reserved": self.reserved}
+
+
+@dataclass
+class PlacementPolicy:
+    """CPU绑定策略"""
+    cores_per_worker: int = 1  # 每个工作者绑定的核心数
+    benchmark_cores: int = 0  # 为基准测试保留的核心数，优先使用内核隔离的核心
+
+
+class CpuPlacer:
+    """为工作者分配绑定的核心
+
+    普通工作者按 绑定的工作者数/核心数 选择最空闲的插槽，再选择插槽内绑定工作者最少的核心，
+    工作者数超过核心数时多个工作者共享核心。基准测试的工作者使用保留的核心，没有保留核心时
+    与普通工作者相同
+    """
+
+    def __init__(self, policy: PlacementPolicy, topology: Optional[CpuTopology] = None):
+        """
+        Args:
+            policy: CPU绑定策略
+            topology: CPU拓扑，默认从 /sys 读取
+        """
+        self.policy = policy
+        self.topology = topology or CpuTopology.detect()
+        all_cpus = [cpu for cpus in self.topology.sockets.values() for cpu in cpus]
+        # 保留核心优先取隔离的核心，不足时从编号最大的核心中取，至少为普通测试留一个核心
+        wanted = min(policy.benchmark_cores, len(all_cpus) - 1)
+        reserved = [cpu for cpu in self.topology.isolated][:wanted]
+        for cpu in sorted(all_cpus, reverse=True):
+            if len(reserved) >= wanted:
+                break
+            if cpu not in reserved:
+                reserved.append(cpu)
+        self.reserved = sorted(reserved)
+        isolated = set(self.topology.isolated)
+        # 未保留的隔离核心不分配给普通工作者
+        self.general: Dict[int, List[int]] = {}
+        for socket, cpus in self.topology.sockets.items():
+            left = [cpu for cpu in cpus if cpu not in reserved and cpu not in isolated]
+            if left:
+                self.general[socket] = left
+        if not self.general:
+            self.general = {socket: [cpu for cpu in cpus if cpu not in reserved]
+                            for socket, cpus in self.topology.sockets.items()
+                            if any(cpu not in reserved for cpu in cpus)}
+        self._socket_of = {cpu: socket for socket, cpus in self.topology.sockets.items() for cpu in cpus}
+        self._load: Counter = Counter()
+        self.assignments: Dict[str, Placement] = {}
+
+    def assign(self, worker_id: str, benchmark: bool = False) -> Placement:
+        """为工作者分配核心
+
+        Args:
+            worker_id: 工作者ID
+            benchmark: 是否为执行基准测试的工作者
+        """
+        count = max(1, self.policy.cores_per_worker)
+        if benchmark and self.reserved:
+            candidates = self.reserved
+            reserved = True
+        else:
+            socket = min(self.general, key=lambda socket: (
+                sum(self._load[cpu] for cpu in self.general[socket]) / len(self.general[socket]), socket))
+            candidates = self.general[socket]
+            reserved = False
+        cpus = sorted(sorted(candidates, key=lambda cpu: (self._load[cpu], cpu))[:count])
+        self._load.update(cpus)
+        placement = Placement(tuple(cpus), self._socket_of[cpus[0]], reserved)
+        self.assignments[worker_id] = placement
+        return placement
+
+    def release(self, worker_id: str) -> None:
+        """工作者退出后释放其核心"""
+        placement = self.assignments.pop(worker_id, None)
+        if placement is not None:
+            self._load.subtract(placement.cpus)
+
+
+def describe_placement(placement: Dict[str, Dict[str, object]]) -> str:
+    """把节点元数据中的绑定记录 {工作者ID: Placement.to_dict()} 格式化为一行文本"""
+    parts = []
+    for worker_id, entry in placement.items():
+        text = f"{worker_id.rsplit('-', 1)[-1]}: CPU {entry['cpus']} (插槽 {entry['socket']})"
+        parts.append(text + (" [基准测试保留]" if entry.get("reserved") else ""))
+    return ", ".join(parts)
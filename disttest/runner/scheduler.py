@@ -0,0 +1,301 @@
+"""
+Scheduler类 - 工作调度器
+以测试用例类（或参数化方法的分片）为工作单元，按节点维护待执行队列，
+并在节点容量范围内安排并发执行的工作单元
+"""
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple, Type
+
+from ..core import TestCase
+from ..core.marks import IDEMPOTENT, get_marks
+from ..core.parametrize import count_cases
+from ..core.resources import DEFAULT_CAPACITY, Resources, get_requirements
+
+# 推测执行的阈值：工作单元执行时间超过 max(speculate_after, SLOW_FACTOR * 已完成工作单元耗时的中位数)
+# 才会被推测执行
+SPECULATE_AFTER = 1.0
+SLOW_FACTOR = 2.0
+
+
+@dataclass
+class WorkUnit:
+    """调度的最小工作单元"""
+    unit_id: int
+    test_case: Type[TestCase]
+    attempts: int = 0
+    benchmark: bool = False  # 为True时执行该测试用例类的基准测试方法
+    methods: Optional[List[str]] = None  # 只执行这些测试方法，None表示全部
+    shard: Optional[Tuple[int, int]] = None  # 参数化方法的 (分片序号, 分片总数)
+    resources: Resources = Resources()  # 执行时占用的资源
+    idempotent: bool = False  # 包含的方法都标记为 idempotent，可以推测执行
+    speculative_of: Optional[int] = None  # 推测执行的副本对应的原始工作单元ID
+    started_at: Optional[float] = None  # 开始执行的时间
+
+    @property
+    def method_count(self) -> int:
+        """工作单元包含的测试用例数（参数表为生成器函数时按1计算）"""
+        if self.benchmark:
+            return len(self.methods or self.test_case.get_benchmark_methods())
+        total = 0
+        for method_name in self.methods or self.test_case.get_test_methods():
+            count = count_cases(getattr(self.test_case, method_name)) or 1
+            if self.shard is not None:
+                index, shards = self.shard
+                count = count // shards + (1 if index < count % shards else 0)
+            total += count
+        return total
+
+
+class Scheduler:
+    """工作调度器，由主控节点按需向各节点派发工作单元
+
+    每个节点有CPU与内存容量，正在执行的工作单元占用的资源之和不超过节点容量；
+    声明了独占锁的工作单元不会与持有同名锁的工作单元（无论在哪个节点上）同时执行。
+    需求超过节点总容量的工作单元在节点空闲时单独执行
+
+    开启推测执行时，所有队列为空后，有剩余容量的节点为执行时间明显偏长的幂等工作单元
+    （可以在任意节点上，包括本节点）启动一个副本，两份中先完成的结果生效，另一份由主控节点取消
+    """
+
+    def __init__(self, assignments: Dict[str, List[Type[TestCase]]], benchmark: bool = False,
+                 capacities: Optional[Dict[str, Dict[str, Any]]] = None,
+                 method_filter: Optional[Dict[Type[TestCase], List[str]]] = None,
+                 shards: Optional[int] = None, speculative: bool = False,
+                 speculate_after: float = SPECULATE_AFTER):
+        """
+        Args:
+            assignments: 节点ID到分配给该节点的测试用例类列表的映射
+            benchmark: 为True时调度基准测试方法
+            capacities: 节点ID到节点容量 {"cpu": ..., "memory": ...} 的映射，未指定的节点使用默认容量
+            method_filter: 测试用例类到需要执行的方法的映射，未出现的类执行全部方法
+            shards: 参数化方法的最大分片数，默认为节点数
+            speculative: 是否为执行尾部的幂等工作单元启动推测执行的副本
+            speculate_after: 工作单元至少执行该时间（秒）后才可能被推测执行
+        """
+        self.assignments = assignments
+        self.benchmark = benchmark
+        self.speculative = speculative
+        self.speculate_after = speculate_after
+        self.durations: List[float] = []  # 已完成的工作单元的执行时间（秒）
+        # 正在推测执行的工作单元ID -> (另一份所在的节点, 另一份工作单元)，原始与副本双向记录
+        self.twins: Dict[int, Tuple[str, WorkUnit]] = {}
+        self._speculated: Set[int] = set()
+        self.capacities: Dict[str, Dict[str, Any]] = {
+            node_id: dict(DEFAULT_CAPACITY, **((capacities or {}).get(node_id) or {})) for node_id in assignments
+        }
+        self.queues: Dict[str, Deque[WorkUnit]] = {node_id: deque() for node_id in assignments}
+        self.running: Dict[str, List[WorkUnit]] = {node_id: [] for node_id in assignments}
+        self.held_locks: Set[str] = set()
+        self._next_unit_id = 0
+        node_ids = list(assignments.keys())
+        for position, (node_id, test_cases) in enumerate(assignments.items()):
+            for test_case in test_cases:
+                allowed = (method_filter or {}).get(test_case)
+                if allowed is not None:
+                    methods = test_case.get_benchmark_methods() if benchmark else test_case.get_test_methods()
+                    allowed = [method_name for method_name in methods if method_name in allowed]
+                    if not allowed:
+                        continue
+                parametrized = [] if benchmark else [
+                    method_name for method_name in test_case.get_parametrized_methods()
+                    if allowed is None or method_name in allowed]
+                if not parametrized:
+                    self._add_unit(node_id, test_case, methods=allowed)
+                    continue
+                
+                # 普通方法留在分配的节点上，参数化方法按参数组序号分片到所有节点
+                plain = [method_name for method_name in test_case.get_test_methods()
+                         if method_name not in parametrized and (allowed is None or method_name in allowed)]
+                if plain:
+                    self._add_unit(node_id, test_case, methods=plain)
+                for method_name in parametrized:
+                    count = count_cases(getattr(test_case, method_name))
+                    limit = shards or len(node_ids)
+                    count_shards = limit if count is None else max(1, min(limit, count))
+                    for index in range(count_shards):
+                        target = node_ids[(position + index) % len(node_ids)]
+                        self._add_unit(target, test_case, methods=[method_name],
+                                       shard=(index, count_shards) if count_shards > 1 else None)
+        
+        if any(unit.resources != Resources() for queue in self.queues.values() for unit in queue):
+            self._place_by_capacity()
+
+    def _add_unit(self, node_id: str, test_case: Type[TestCase], methods: Optional[List[str]] = None,
+                  shard: Optional[Tuple[int, int]] = None) -> None:
+        """创建工作单元并加入节点队列"""
+        if self.benchmark:
+            resources = get_requirements(test_case, methods or test_case.get_benchmark_methods())
+        else:
+            resources = get_requirements(test_case, methods)
+        method_names = methods or (test_case.get_benchmark_methods() if self.benchmark else test_case.get_test_methods())
+        idempotent = bool(method_names) and all(IDEMPOTENT in get_marks(test_case, method_name)
+                                                for method_name in method_names)
+        unit = WorkUnit(self._next_unit_id, test_case, benchmark=self.benchmark, methods=methods, shard=shard,
+                        resources=resources, idempotent=idempotent)
+        self.queues[node_id].append(unit)
+        self._next_unit_id += 1
+
+    def _place_by_capacity(self) -> None:
+        """按资源需求调整队列
+
+        超过所在节点总容量、但能放入其它节点的工作单元移到这些节点中待执行单元最少的
+        一个；各节点队列按需求从大到小排序，重的工作单元先占用容量，轻的工作单元填补
+        剩余的空闲容量
+        """
+        for node_id, queue in self.queues.items():
+            for unit in list(queue):
+                if unit.resources.fits(self.capacities[node_id]):
+                    continue
+                candidates = [other for other in self.queues
+                              if other != node_id and unit.resources.fits(self.capacities[other])]
+                if candidates:
+                    target = min(candidates, key=lambda other: len(self.queues[other]))
+                    queue.remove(unit)
+                    self.queues[target].append(unit)
+        for node_id, queue in self.queues.items():
+            self.queues[node_id] = deque(sorted(queue, key=lambda unit: unit.resources.weight, reverse=True))
+
+    def _free_capacity(self, node_id: str) -> Dict[str, Optional[float]]:
+        """节点当前剩余的容量"""
+        capacity = self.capacities[node_id]
+        running = self.running[node_id]
+        free: Dict[str, Optional[float]] = {}
+        for key in ("cpu", "memory"):
+            if capacity.get(key) is None:
+                free[key] = None
+            else:
+                free[key] = capacity[key] - sum(getattr(unit.resources, key) for unit in running)
+        return free
+
+    def _can_start(self, node_id: str, unit: WorkUnit, free: Dict[str, Optional[float]]) -> bool:
+        """工作单元当前能否在节点上开始执行"""
+        if self.held_locks.intersection(unit.resources.locks):
+            return False
+        return not self.running[node_id] or unit.resources.fits(free)
+
+    def resize(self, node_id: str, cpu: Optional[float]) -> None:
+        """调整节点的CPU容量，已在执行的工作单元不受影响"""
+        self.capacities[node_id]["cpu"] = cpu
+
+    @property
+    def node_ids(self) -> List[str]:
+        """所有节点ID"""
+        return list(self.queues.keys())
+
+    def method_count(self, node_id: str) -> int:
+        """节点队列中待执行的测试用例数"""
+        return sum(unit.method_count for unit in self.queues[node_id])
+
+    def next_unit(self, node_id: str) -> Optional[WorkUnit]:
+        """取出节点队列中第一个能在剩余容量内执行的工作单元并占用其资源
+
+        Returns:
+            工作单元，队列为空或剩余容量不足时返回None
+        """
+        queue = self.queues.get(node_id)
+        if not queue:
+            return None
+        free = self._free_capacity(node_id)
+        if self.running[node_id] and free["cpu"] is not None and free["cpu"] <= 0:
+            return None
+        for index, unit in enumerate(queue):
+            if self._can_start(node_id, unit, free):
+                del queue[index]
+                unit.started_at = time.time()
+                self.running[node_id].append(unit)
+                self.held_locks.update(unit.resources.locks)
+                return unit
+        return None
+
+    def release(self, node_id: str, unit: WorkUnit) -> None:
+        """工作单元执行结束（或工作者崩溃）后释放其占用的资源"""
+        running = self.running[node_id]
+        if unit in running:
+            running.remove(unit)
+            self.held_locks.difference_update(unit.resources.locks)
+
+    def complete(self, node_id: str, unit: WorkUnit) -> None:
+        """工作单元执行完成：释放资源并记录执行时间"""
+        if unit.started_at is not None:
+            self.durations.append(time.time() - unit.started_at)
+        self.release(node_id, unit)
+
+    def speculation_threshold(self) -> float:
+        """工作单元执行时间超过该值（秒）才会被推测执行"""
+        if not self.durations:
+            return self.speculate_after
+        return max(self.speculate_after, SLOW_FACTOR * statistics.median(self.durations))
+
+    def speculate(self, node_id: str) -> Optional[WorkUnit]:
+        """所有队列为空时，为执行时间最长且超过阈值的幂等工作单元创建一个副本，在节点的剩余容量内执行
+
+        每个工作单元最多推测执行一次；声明了独占锁或超过节点剩余容量的工作单元不推测执行
+
+        Returns:
+            副本工作单元，没有可推测执行的工作单元时返回None
+        """
+        if not self.speculative or self.pending_count():
+            return None
+        free = self._free_capacity(node_id)
+        if self.running[node_id] and free["cpu"] is not None and free["cpu"] <= 0:
+            return None
+        started_before = time.time() - self.speculation_threshold()
+        candidates = [unit for running in self.running.values() for unit in running
+                      if unit.idempotent and unit.speculative_of is None and unit.unit_id not in self._speculated
+                      and unit.started_at is not None and unit.started_at <= started_before
+                      and not unit.resources.locks and unit.resources.fits(self.capacities[node_id])
+                      and (not self.running[node_id] or unit.resources.fits(free))]
+        if not candidates:
+            return None
+        original = min(candidates, key=lambda unit: unit.started_at)
+        original_node = next(other for other, running in self.running.items() if original in running)
+        copy = replace(original, unit_id=self._next_unit_id, attempts=0, speculative_of=original.unit_id,
+                       started_at=time.time())
+        self._next_unit_id += 1
+        self._speculated.add(original.unit_id)
+        self.running[node_id].append(copy)
+        self.twins[original.unit_id] = (node_id, copy)
+        self.twins[copy.unit_id] = (original_node, original)
+        return copy
+
+    def finish_speculation(self, unit: WorkUnit) -> Optional[Tuple[str, WorkUnit]]:
+        """推测执行的工作单元（原始或副本）先完成时，释放另一份占用的资源
+
+        Returns:
+            (另一份所在的节点, 另一份工作单元)，需要由主控节点取消；没有在推测执行时返回None
+        """
+        twin = self.drop_speculation(unit)
+        if twin is not None:
+            self.release(*twin)
+        return twin
+
+    def drop_speculation(self, unit: WorkUnit) -> Optional[Tuple[str, WorkUnit]]:
+        """解除工作单元与另一份的关联（例如执行它的工作者崩溃，另一份继续执行）
+
+        Returns:
+            (另一份所在的节点, 另一份工作单元)，没有在推测执行时返回None
+        """
+        twin = self.twins.pop(unit.unit_id, None)
+        if twin is not None:
+            self.twins.pop(twin[1].unit_id, None)
+        return twin
+
+    def requeue(self, node_id: str, unit: WorkUnit) -> None:
+        """将未完成的工作单元放回节点队列头部"""
+        self.release(node_id, unit)
+        self.queues[node_id].appendleft(unit)
+
+    def running_count(self, node_id: Optional[str] = None) -> int:
+        """获取正在执行的工作单元数量，未指定节点时统计所有节点"""
+        if node_id is not None:
+            return len(self.running[node_id])
+        return sum(len(running) for running in list(self.running.values()))
+
+    def pending_count(self, node_id: Optional[str] = None) -> int:
+        """获取待执行的工作单元数量"""
+        if node_id is not None:
+            return len(self.queues.get(node_id, ()))
+        return sum(len(queue) for queue in self.queues.values())
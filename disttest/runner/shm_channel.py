@@ -0,0 +1,246 @@
+"""
+共享内存结果通道
+子进程工作者将测试方法结果写入与主控节点共享的环形缓冲区，主控节点收到工作单元
+完成消息后批量读取，避免逐个序列化结果对象并经管道复制
+
+每个工作者独占一个环形缓冲区（单生产者单消费者），布局如下:
+
+    [0, 8)       写位置（工作者写入记录后更新，单调递增的字节计数）
+    [64, 72)     读位置（主控节点读取记录后更新）
+    [128, ...)   数据区
+
+每条记录由定长记录头和紧随其后的变长字符串区（方法名、类名、模块名和错误信息拼接后的
+UTF-8文本，以及序列化的附加数据）组成，长度按8字节对齐，不跨越数据区末尾；剩余空间不足时写入填充记录并
+从数据区开头继续
+"""
+import gc
+import math
+import pickle
+import struct
+from datetime import datetime
+from typing import Any, List, Sequence
+
+from ..core.test_result import TestMethodResult
+
+# 记录头: 记录长度, 类型, 标志, 执行时间, 开始时间, setup/call/teardown/end 时间,
+# 方法名/类名/模块名的字符数, 文本/附加数据的字节数
+RECORD_HEADER = struct.Struct("<IBB2x6d5I")
+POSITION = struct.Struct("<Q")
+
+WRITE_POS_OFFSET = 0
+READ_POS_OFFSET = 64
+DATA_OFFSET = 128
+
+KIND_RESULT = 1
+KIND_PADDING = 2
+
+FLAG_SUCCESS = 1
+FLAG_PHASE_TIMINGS = 2
+FLAG_ERROR = 4
+
+PHASE_KEYS = {"setup", "call", "teardown", "end"}
+NO_PHASES = (math.nan, math.nan, math.nan, math.nan)
+
+DEFAULT_RING_SIZE = 4 * 1024 * 1024
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def require_shared_memory() -> Any:
+    """导入 multiprocessing.shared_memory（需要 Python 3.8），只在使用共享内存通道时调用
+
+    Raises:
+        RuntimeError: 当前Python版本不支持共享内存
+    """
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        raise RuntimeError("共享内存结果通道 (shm) 需要 Python 3.8 及以上版本") from None
+    return shared_memory
+
+
+class ResultRing:
+    """结果环形缓冲区
+
+    主控节点使用 create 创建并负责 unlink，工作者使用 attach 按名称连接
+    """
+
+    def __init__(self, shm: Any, owner: bool):
+        """
+        Args:
+            shm: multiprocessing.shared_memory.SharedMemory 对象
+            owner: 是否由本进程创建（负责 unlink）
+        """
+        self.shm = shm
+        self.owner = owner
+        self.buf = shm.buf
+        self.capacity = (shm.size - DATA_OFFSET) & ~7
+
+    @classmethod
+    def create(cls, size: int = DEFAULT_RING_SIZE) -> "ResultRing":
+        """创建环形缓冲区"""
+        shm = require_shared_memory().SharedMemory(create=True, size=DATA_OFFSET + _align(size))
+        POSITION.pack_into(shm.buf, WRITE_POS_OFFSET, 0)
+        POSITION.pack_into(shm.buf, READ_POS_OFFSET, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "ResultRing":
+        """连接已创建的环形缓冲区"""
+        return cls(require_shared_memory().SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def _position(self, offset: int) -> int:
+        return POSITION.unpack_from(self.buf, offset)[0]
+
+    def write(self, results: Sequence[TestMethodResult]) -> int:
+        """依次写入测试方法结果，空间不足时停止
+
+        Returns:
+            写入的结果数，未写入的结果由调用方通过其它方式发送
+        """
+        buf = self.buf
+        capacity = self.capacity
+        pack_into = RECORD_HEADER.pack_into
+        header_size = RECORD_HEADER.size
+        write_pos = self._position(WRITE_POS_OFFSET)
+        free = capacity - (write_pos - self._position(READ_POS_OFFSET))
+        written = 0
+        for result in results:
+            # 方法名、类名、模块名和错误信息拼接后整体编码，记录头中保存各自的字符数
+            error = result.error_message
+            names = result.method_name + result.class_name + result.module
+            text = (names + error if error is not None else names).encode("utf-8")
+
+            flags = FLAG_SUCCESS if result.success else 0
+            if error is not None:
+                flags |= FLAG_ERROR
+            timings = result.timings
+            extra = {}
+            if timings.keys() == PHASE_KEYS:
+                flags |= FLAG_PHASE_TIMINGS
+                call = timings["call"]
+                phases = (timings["setup"], math.nan if call is None else call, timings["teardown"], timings["end"])
+            else:
+                phases = NO_PHASES
+                if timings:
+                    extra["timings"] = timings
+            if result.additional_data:
+                extra["additional_data"] = result.additional_data
+            extra_bytes = pickle.dumps(extra, pickle.HIGHEST_PROTOCOL) if extra else b""
+
+            text_size = len(text)
+            size = (header_size + text_size + len(extra_bytes) + 7) & ~7
+            offset = write_pos % capacity
+            padding = capacity - offset if capacity - offset < size else 0
+            if size + padding > free:
+                break
+            if padding:
+                # 剩余空间放不下记录头时读取方自行跳到数据区开头
+                if padding >= header_size:
+                    pack_into(buf, DATA_OFFSET + offset, padding, KIND_PADDING, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+                write_pos += padding
+                free -= padding
+                offset = 0
+
+            start = DATA_OFFSET + offset
+            pack_into(buf, start, size, KIND_RESULT, flags,
+                      result.execution_time, result.start_time.timestamp(), *phases,
+                      len(result.method_name), len(result.class_name), len(result.module), text_size,
+                      len(extra_bytes))
+            position = start + header_size
+            buf[position:position + text_size] = text
+            if extra_bytes:
+                buf[position + text_size:position + text_size + len(extra_bytes)] = extra_bytes
+            write_pos += size
+            free -= size
+            written += 1
+
+        # 记录内容全部写入后再发布写位置
+        POSITION.pack_into(buf, WRITE_POS_OFFSET, write_pos)
+        return written
+
+    def read(self, count: int) -> List[TestMethodResult]:
+        """读取 count 条结果（调用方需确保这些结果已经写入）
+
+        批量创建大量结果对象时会频繁触发垃圾回收，读取期间暂停垃圾回收
+        """
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._read(count)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def _read(self, count: int) -> List[TestMethodResult]:
+        buf = self.buf
+        capacity = self.capacity
+        unpack_from = RECORD_HEADER.unpack_from
+        header_size = RECORD_HEADER.size
+        fromtimestamp = datetime.fromtimestamp
+        new = object.__new__
+        read_pos = self._position(READ_POS_OFFSET)
+        results = []
+        while len(results) < count:
+            offset = read_pos % capacity
+            if capacity - offset < header_size:
+                read_pos += capacity - offset
+                continue
+            start = DATA_OFFSET + offset
+            (size, kind, flags, execution_time, start_time, setup, call, teardown, end,
+             name_len, class_len, module_len, text_size, extra_len) = unpack_from(buf, start)
+            read_pos += size
+            if kind == KIND_PADDING:
+                continue
+
+            position = start + header_size
+            text = str(buf[position:position + text_size], "utf-8")
+            name = text[:name_len]
+            class_end = name_len + class_len
+            class_name = text[name_len:class_end]
+            module_end = class_end + module_len
+            module = text[class_end:module_end]
+            error = text[module_end:] if flags & FLAG_ERROR else None
+            extra = None
+            if extra_len:
+                position += text_size
+                extra = pickle.loads(buf[position:position + extra_len])
+
+            if flags & FLAG_PHASE_TIMINGS:
+                timings = {"setup": setup, "call": None if call != call else call, "teardown": teardown, "end": end}
+            else:
+                timings = extra.get("timings", {}) if extra else {}
+
+            # 与pickle相同，直接设置实例属性而不经过 __init__
+            result = new(TestMethodResult)
+            result.__dict__.update({
+                "method_name": name,
+                "success": bool(flags & FLAG_SUCCESS),
+                "error_message": error,
+                "execution_time": execution_time,
+                "start_time": fromtimestamp(start_time),
+                "additional_data": extra.get("additional_data", {}) if extra else {},
+                "class_name": class_name,
+                "timings": timings,
+                "module": module,
+            })
+            results.append(result)
+
+        POSITION.pack_into(buf, READ_POS_OFFSET, read_pos)
+        return results
+
+    def close(self) -> None:
+        """断开连接，创建者同时释放共享内存"""
+        self.buf.release()
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
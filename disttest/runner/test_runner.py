@@ -2,16 +2,25 @@
 TestRunner类 - 测试运行器
 支持本地和分布式测试执行
 """
-import concurrent.futures
+import asyncio
 import os
 import socket
 import time
 import uuid
 import math
-from typing import Dict, List, Type, Any, Optional, Tuple
+from typing import Dict, List, Type, Any, Optional, Tuple, Union
 
-from ..core import TestCase, TestSuite, TestResult
-from .node_manager import NodeManager
+from ..core import TestCase, TestSuite, TestResult, LeakDetector, RegressionDetector
+from ..core.capture import CapturePolicy
+from ..core.fixtures import FixtureCache
+from ..core.selection import Selection
+from .autoscaler import AutoscalePolicy, Autoscaler
+from .checkpoint import RunJournal, remaining_methods
+from .coordinator import Coordinator
+from .node_manager import Node, NodeManager
+from .placement import CpuPlacer, PlacementPolicy, format_cpu_list
+from .scheduler import SPECULATE_AFTER, Scheduler, WorkUnit
+from .worker import WorkerPolicy, WorkerPool
 from ..plugins.base import PluginBase
 
 
@@ -26,6 +35,16 @@ class TestRunner:
         self.running_nodes: Dict[str, Dict[str, Any]] = {}
         self.merged_results = TestResult()
         self.merged_results.node_id = self.master_node_id
+        self.leak_detector: Optional[LeakDetector] = None
+        # 测试输出的捕获策略，默认只为失败的测试保留输出
+        self.capture = CapturePolicy()
+        self.regression_detector: Optional[RegressionDetector] = None
+        self.scheduler: Optional[Scheduler] = None
+        self.worker_pool: Optional[WorkerPool] = None
+        self.checkpoint: Optional[Dict[str, Any]] = None
+        self.journal: Optional[RunJournal] = None
+        # 当前（或最近一次）执行的模式: local、distributed 或 remote
+        self.mode = "local"
     
     def add_test_case(self, test_case_class: Type[TestCase]) -> None:
         """添加单个测试用例类"""
@@ -35,95 +54,332 @@ class TestRunner:
         """批量添加多个测试用例类"""
         self.test_suite.add_test_cases(test_case_classes)
     
+    def select(self, selection: Selection) -> int:
+        """只保留被选中的测试方法，没有方法被选中的测试用例类从套件中移除
+        
+        Args:
+            selection: 测试选择条件
+            
+        Returns:
+            被选中的方法数（包括基准测试方法）
+        """
+        selected = 0
+        test_cases = []
+        for test_case in self.test_suite.test_cases:
+            methods = selection.select_methods(test_case)
+            if not methods:
+                continue
+            test_cases.append(test_case)
+            selected += len(methods)
+            if len(methods) < len(test_case.get_test_methods()) + len(test_case.get_benchmark_methods()):
+                self.test_suite.method_filter[test_case] = methods
+        self.test_suite.test_cases = test_cases
+        return selected
+    
     def add_plugin(self, plugin: PluginBase) -> None:
         """添加插件"""
         self.plugins.append(plugin)
         plugin.setup(self)
     
+    def enable_leak_detection(self, threshold_kb: float = 100.0, scope: str = "method",
+                              memory_budget_mb: Optional[float] = None) -> LeakDetector:
+        """开启基于tracemalloc的内存泄漏检测
+        
+        Args:
+            threshold_kb: 单个测试残留内存超过该值（KB）时标记为疑似泄漏
+            scope: 快照粒度，method 或 class
+            memory_budget_mb: 单个工作者累计残留内存上限（MB），超过后自动回收该工作者
+            
+        Returns:
+            创建的内存泄漏检测器
+        """
+        self.leak_detector = LeakDetector(threshold_kb=threshold_kb, scope=scope,
+                                          memory_budget_mb=memory_budget_mb)
+        return self.leak_detector
+    
+    def set_output_capture(self, mode: str = "failures", limit: Optional[int] = None) -> CapturePolicy:
+        """设置测试输出的捕获策略
+        
+        Args:
+            mode: failures (只为失败的测试保留输出)、all (为所有测试保留输出) 或 off (不捕获，直接输出)
+            limit: 每个测试每个输出流保留的最大字符数，超出时只保留末尾
+            
+        Returns:
+            输出捕获策略
+        """
+        self.capture = CapturePolicy(mode, limit) if limit is not None else CapturePolicy(mode)
+        return self.capture
+    
+    def enable_regression_detection(self, db_path: str = None, baseline_runs: int = 10,
+                                    baseline_name: Optional[str] = None, threshold: float = 3.0,
+                                    min_ratio: float = 0.2) -> RegressionDetector:
+        """开启性能回归检测，测试完成后将耗时与历史基线比较
+        
+        检测结果保存在合并结果的 metadata["performance_regressions"] 中，
+        在触发 on_test_run_complete 之前完成，报告插件可以直接读取
+        
+        Args:
+            db_path: 历史数据库路径
+            baseline_runs: 使用最近N次执行作为基线
+            baseline_name: 命名基线，指定后忽略 baseline_runs
+            threshold: 超出基线中位数的MAD倍数
+            min_ratio: 相对基线中位数的最小变慢比例
+            
+        Returns:
+            创建的性能回归检测器
+        """
+        self.regression_detector = RegressionDetector(db_path=db_path, baseline_runs=baseline_runs,
+                                                      baseline_name=baseline_name, threshold=threshold,
+                                                      min_ratio=min_ratio)
+        return self.regression_detector
+    
+    def enable_checkpoint(self, directory: Optional[str] = None, resume: Optional[str] = None,
+                          fsync: bool = False) -> None:
+        """开启断点续跑，执行过程中把每个工作单元的结果追加写入执行日志
+        
+        Args:
+            directory: 执行日志目录，默认为 .disttest/runs
+            resume: 续跑的执行ID，指定后从该执行的日志恢复已完成的结果，只执行剩余的测试
+            fsync: 每条记录写入后是否调用fsync（可以在主机断电时保留记录，但写入更慢）
+        """
+        self.checkpoint = {"directory": directory, "resume": resume, "fsync": fsync}
+    
+    def _open_journal(self, mode: str) -> None:
+        """开始执行时打开执行日志；续跑时将已完成的结果合并到总结果，并设置需要执行的方法"""
+        if not self.checkpoint:
+            return
+        directory, resume, fsync = self.checkpoint["directory"], self.checkpoint["resume"], self.checkpoint["fsync"]
+        test_cases = self.test_suite.test_cases
+        class_paths = [f"{test_case.__module__}.{test_case.__name__}" for test_case in test_cases]
+        if not resume:
+            self.journal = RunJournal.create(directory, fsync=fsync, mode=mode, suite=self.test_suite.name,
+                                             master_node_id=self.master_node_id, test_cases=class_paths)
+            print(f"执行日志: {self.journal.path}，中断后可使用 --resume {self.journal.run_id} 继续执行")
+            return
+        
+        self.journal, completed = RunJournal.resume(resume, directory, fsync=fsync)
+        missing = set(self.journal.header.get("test_cases", [])) - set(class_paths)
+        if missing:
+            print(f"警告: 执行 {resume} 中的 {len(missing)} 个测试用例类未加载，其结果仍会保留: "
+                  f"{', '.join(sorted(missing))}")
+        # 与已有的方法过滤（-k/-m 选择）取交集
+        method_filter = self.test_suite.method_filter
+        for test_case, methods in remaining_methods(test_cases, completed).items():
+            allowed = method_filter.get(test_case)
+            method_filter[test_case] = methods if allowed is None else [method_name for method_name in methods
+                                                                        if method_name in allowed]
+        print(f"从执行日志 {self.journal.path} 恢复了 {len(completed.results)} 个已完成的测试，只执行剩余的测试")
+        
+        self.merged_results.merge(completed)
+        # 按原执行节点把恢复的结果作为工作单元重放，按工作单元统计的插件（指标、时间线）也能计入
+        for node_id in completed.node_ids:
+            restored = TestResult()
+            restored.node_id = node_id
+            for method_result in completed.get_results_by_node(node_id):
+                restored.add_result(method_result)
+            self._notify_unit_complete(node_id, restored)
+        for plugin in self.plugins:
+            plugin.on_test_progress_update(self.merged_results)
+    
+    def _checkpoint(self, result: TestResult) -> None:
+        """将工作单元（或测试用例类）的结果写入执行日志"""
+        if self.journal is not None:
+            self.journal.record(result)
+    
+    def _close_journal(self, completed: bool = True) -> None:
+        """执行结束时关闭执行日志，只有全部工作单元都执行完才记录完成
+        
+        Args:
+            completed: 是否在超时前执行完所有工作单元；未完成的日志可用 --resume 继续执行
+        """
+        if self.journal is not None:
+            if completed:
+                self.journal.complete()
+            self.journal.close()
+            print(f"执行日志已保存: {self.journal.path}" + ("" if completed else "（执行未完成，可用 --resume 继续）"))
+            self.journal = None
+    
     def run_local(self) -> TestResult:
         """在本地执行测试"""
         print(f"在本地节点 {self.master_node_id} 上开始执行测试...")
         
         # 重置结果
+        self.mode = "local"
         self.merged_results = TestResult()
         self.merged_results.node_id = self.master_node_id
         
         # 触发测试开始事件
         for plugin in self.plugins:
             plugin.on_test_run_start(self.test_suite)
+        self._open_journal(self.mode)
         
-        # 执行测试
-        result = self.test_suite.run(self.master_node_id)
+        # 执行测试，普通测试与基准测试共享夹具
+        fixture_cache = FixtureCache()
+        if self.leak_detector:
+            self.leak_detector.start()
+        try:
+            result = self.test_suite.run(self.master_node_id, self.leak_detector, fixture_cache=fixture_cache,
+                                         on_class_complete=self._checkpoint, capture=self.capture)
+        finally:
+            if self.leak_detector:
+                self.leak_detector.stop()
         self.merged_results.merge(result)
+        self._notify_unit_complete(self.master_node_id, result)
+        
+        # 普通测试全部完成后再串行执行基准测试
+        try:
+            benchmark_suite = self.test_suite.get_benchmark_suite()
+            if benchmark_suite:
+                print(f"开始执行 {benchmark_suite.get_total_method_count()} 个基准测试...")
+                benchmark_result = benchmark_suite.run(self.master_node_id, fixture_cache=fixture_cache,
+                                                       on_class_complete=self._checkpoint, capture=self.capture)
+                self.merged_results.merge(benchmark_result)
+                self._notify_unit_complete(self.master_node_id, benchmark_result)
+        finally:
+            for error in fixture_cache.close():
+                print(error)
+        self._close_journal()
+        self._detect_regressions()
         
         # 触发测试完成事件
         for plugin in self.plugins:
             plugin.on_test_run_complete(self.merged_results)
         
-        summary = result.get_summary()
+        summary = self.merged_results.get_summary()
         print(f"测试执行完成. 总测试用例数: {summary['total']}, 通过: {summary['passed']}, 失败: {summary['failed']}")
         return self.merged_results
     
-    def run_distributed(self, nodes: int = 2, timeout: float = 600) -> TestResult:
+    def run_distributed(self, nodes: int = 2, timeout: float = 600, executor: str = "thread",
+                        worker_policy: Optional[WorkerPolicy] = None,
+                        node_capacity: Optional[Union[Dict[str, float], List[Dict[str, float]]]] = None,
+                        transport: str = "pipe", autoscale: Optional[AutoscalePolicy] = None,
+                        speculative: bool = False, placement: Optional[PlacementPolicy] = None,
+                        speculate_after: float = SPECULATE_AFTER) -> TestResult:
         """分布式执行测试
         
         Args:
             nodes: 并行执行的节点数
             timeout: 测试执行超时时间（秒）
+            executor: 执行后端，thread (线程) 或 process (子进程)，开启内存泄漏检测时只支持process
+            worker_policy: 工作者生命周期策略，超过限制的工作者在完成当前工作单元后被回收
+            node_capacity: 节点容量 {"cpu": ..., "memory": MB}，传入列表时按顺序分别指定各节点的容量；
+                节点在容量范围内并发执行多个工作单元，默认每个节点同一时间只执行一个工作单元
+            transport: 子进程工作者与主控节点之间的通道，pipe (管道)、shm (共享内存环形缓冲区)
+                或 wire (二进制消息格式)
+            autoscale: 自动伸缩策略，指定后忽略 nodes，所有工作单元进入一个节点的队列，并发的工作者
+                数量根据队列深度和主机负载在策略的上下限之间调整（适合process后端）
+            speculative: 所有队列为空后，有剩余容量的节点为执行时间明显偏长的、标记为 idempotent 的
+                工作单元启动副本，先完成的一份生效，另一份被取消
+            placement: CPU绑定策略，指定后每个子进程工作者绑定到固定的CPU核心，工作者分散到各个
+                CPU插槽，基准测试使用保留的核心（只支持process后端）
+            speculate_after: 推测执行的最短执行时间（秒），工作单元的执行时间还需超过已完成
+                工作单元耗时中位数的 SLOW_FACTOR 倍
             
         Returns:
             合并后的测试结果
         """
-        print(f"开始分布式测试执行，节点数量: {nodes}")
+        if self.leak_detector and executor != "process":
+            raise ValueError("tracemalloc统计整个进程的内存分配，内存泄漏检测只支持process后端")
+        if autoscale is not None:
+            print("开始分布式测试执行，节点数量自动伸缩")
+        else:
+            print(f"开始分布式测试执行，节点数量: {nodes}")
         
         # 重置结果
+        self.mode = "distributed"
         self.merged_results = TestResult()
         self.merged_results.node_id = self.master_node_id
         
         # 触发测试开始事件
         for plugin in self.plugins:
             plugin.on_test_run_start(self.test_suite)
+        self._open_journal(self.mode)
             
-        # 获取所有测试用例
-        all_test_cases = self.test_suite.test_cases.copy()
+        # 获取所有测试用例（只包含基准测试的类在基准测试阶段执行，续跑时跳过已全部完成的类）
+        all_test_cases = [test_case for test_case in self.test_suite.test_cases
+                          if (test_case.get_test_methods() or not test_case.get_benchmark_methods())
+                          and self.test_suite.method_filter.get(test_case, True)]
         total_tests = len(all_test_cases)
         
-        # 如果节点数量大于测试用例类数量，调整节点数量
-        if nodes > total_tests:
-            nodes = max(1, total_tests)
-            print(f"警告: 节点数量({nodes})大于测试用例类数量({total_tests})，调整节点数量为: {nodes}")
-        
-        # 将测试用例分配到各个节点
-        node_ids = [f"node-{i+1}-{uuid.uuid4().hex[:8]}" for i in range(nodes)]
-        node_test_cases = self._distribute_test_cases(all_test_cases, nodes)
-        
-        print(f"总测试用例类数量: {total_tests}, 分配到 {nodes} 个节点执行")
-        
-        # 使用线程池模拟分布式执行
-        with concurrent.futures.ThreadPoolExecutor(max_workers=nodes) as executor:
-            futures = []
-            for i, node_id in enumerate(node_ids):
-                # 在每个"节点"上运行分配的测试用例
-                node_tests = node_test_cases[i]
-                futures.append(executor.submit(self._run_on_node, node_id, node_tests))
-            
-            # 等待所有节点完成并获取结果
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    node_result = future.result()
-                    self.merged_results.merge(node_result)
-                    # 实时汇总结果后触发进度更新事件
-                    for plugin in self.plugins:
-                        plugin.on_test_progress_update(self.merged_results)
-                except Exception as e:
-                    print(f"节点执行测试时出错: {str(e)}")
+        autoscaler = None
+        if autoscale is not None:
+            # 自动伸缩时所有测试用例类进入同一个节点的队列，节点的CPU容量即并发执行的工作者数，
+            # 由 Autoscaler 在执行过程中调整；参数化方法按工作者上限分片
+            autoscaler = Autoscaler(autoscale)
+            nodes = 1
+            node_ids = [f"auto-{uuid.uuid4().hex[:8]}"]
+            node_test_cases = [all_test_cases]
+            memory = node_capacity.get("memory") if isinstance(node_capacity, dict) else None
+            node_capacity = {"cpu": float(autoscaler.target), "memory": memory}
+            print(f"总测试用例类数量: {total_tests}, 工作者数量在 {autoscaler.min_workers}-"
+                  f"{autoscaler.max_workers} 之间自动伸缩")
+        else:
+            # 如果节点数量大于测试用例类数量，调整节点数量（参数化方法会被分片到所有节点，不做调整）
+            if nodes > total_tests and not any(test_case.get_parametrized_methods() for test_case in all_test_cases):
+                nodes = max(1, total_tests)
+                print(f"警告: 节点数量({nodes})大于测试用例类数量({total_tests})，调整节点数量为: {nodes}")
+            
+            # 将测试用例分配到各个节点
+            node_ids = [f"node-{i+1}-{uuid.uuid4().hex[:8]}" for i in range(nodes)]
+            node_test_cases = self._distribute_test_cases(all_test_cases, nodes)
+            
+            print(f"总测试用例类数量: {total_tests}, 分配到 {nodes} 个节点执行")
+        
+        # 注册节点，节点容量记录在节点元数据中
+        capacities = node_capacity if isinstance(node_capacity, list) else [node_capacity] * nodes
+        for i, node_id in enumerate(node_ids):
+            capacity = capacities[i] if i < len(capacities) else None
+            self.node_manager.register_node(node_id=node_id, capacity=capacity)
+        
+        if self.leak_detector:
+            self.leak_detector.start()
+        
+        # 由主控节点逐个派发工作单元，工作者在线程或子进程中执行
+        scheduler = Scheduler(dict(zip(node_ids, node_test_cases)),
+                              capacities={node_id: self.node_manager.get_node(node_id).metadata["capacity"]
+                                          for node_id in node_ids},
+                              method_filter=self.test_suite.method_filter,
+                              shards=autoscaler.max_workers if autoscaler else None, speculative=speculative,
+                              speculate_after=speculate_after)
+        pool = WorkerPool(executor, policy=worker_policy, leak_detector=self.leak_detector,
+                          suite_name=self.test_suite.name, transport=transport,
+                          placer=CpuPlacer(placement) if placement is not None else None, capture=self.capture)
+        if pool.placer is not None:
+            placer = pool.placer
+            print(f"CPU绑定: {len(placer.topology.sockets)} 个插槽, 每个工作者 {placement.cores_per_worker} 个核心"
+                  + (f", 为基准测试保留核心 {format_cpu_list(placer.reserved)}" if placer.reserved else ""))
+        self.scheduler, self.worker_pool = scheduler, pool
+        started = time.time()
+        try:
+            completed = self._run_scheduled(scheduler, pool, timeout, autoscaler)
+            benchmark_suite = self.test_suite.get_benchmark_suite()
+            # 普通测试超时后剩余时间已用尽，不再执行基准测试
+            if benchmark_suite and completed:
+                completed = self._run_benchmark_phase(benchmark_suite, pool,
+                                                      max(0.0, timeout - (time.time() - started)))
+        finally:
+            pool.shutdown()
+            if self.leak_detector:
+                self.leak_detector.stop()
+        
+        # 伸缩统计在触发完成事件前写入元数据，报告和导出插件才能读到
+        scaling = autoscaler.summary() if autoscaler is not None else None
+        if scaling is not None:
+            self.merged_results.metadata["autoscale"] = scaling
         
         self.merged_results.set_complete()
+        self._close_journal(completed)
+        self._detect_regressions()
         
         # 触发测试完成事件
         for plugin in self.plugins:
             plugin.on_test_run_complete(self.merged_results)
             
+        if scaling is not None:
+            utilization = scaling["mean_utilization"]
+            print(f"自动伸缩: 峰值 {scaling['peak']} 个工作者, 调整 {scaling['adjustments']} 次"
+                  + (f", 工作者平均利用率 {utilization * 100:.1f}%" if utilization is not None else ""))
+        
         summary = self.merged_results.get_summary()
         print(f"分布式测试执行完成. 总测试用例数: {summary['total']}, "
               f"通过: {summary['passed']}, 失败: {summary['failed']}, "
@@ -131,6 +387,125 @@ class TestRunner:
               
         return self.merged_results
     
+    def run_remote(self, host: str = "0.0.0.0", port: int = 0, min_workers: int = 1, timeout: float = 600,
+                   heartbeat_interval: float = 5.0, heartbeat_timeout: float = 15.0) -> TestResult:
+        """由远程工作者执行测试
+        
+        主控节点监听TCP端口，工作者通过 disttest worker HOST:PORT 连接并逐个领取工作单元，
+        注册的工作者达到 min_workers 后开始派发。所有工作者从同一个队列领取工作单元，插件将其
+        视为一个节点；基准测试在普通测试完成后由本机执行
+        
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示随机端口
+            min_workers: 开始派发前需要注册的工作者数量
+            timeout: 测试执行超时时间（秒）
+            heartbeat_interval: 工作者发送心跳的间隔（秒）
+            heartbeat_timeout: 超过该时间没有收到消息的工作者视为失联，其工作单元重新排队
+            
+        Returns:
+            合并后的测试结果
+        """
+        print(f"开始远程测试执行，等待 {min_workers} 个工作者连接")
+        
+        # 重置结果
+        self.mode = "remote"
+        self.merged_results = TestResult()
+        self.merged_results.node_id = self.master_node_id
+        
+        # 触发测试开始事件
+        for plugin in self.plugins:
+            plugin.on_test_run_start(self.test_suite)
+        self._open_journal(self.mode)
+        
+        test_cases = [test_case for test_case in self.test_suite.test_cases
+                      if (test_case.get_test_methods() or not test_case.get_benchmark_methods())
+                      and self.test_suite.method_filter.get(test_case, True)]
+        # 工作者逐个领取工作单元，节点容量不限制并发执行的工作单元数，独占锁仍然生效
+        node_id = f"remote-{uuid.uuid4().hex[:8]}"
+        unlimited = {"cpu": None, "memory": None}
+        self.node_manager.register_node(node_id=node_id, capacity=unlimited)
+        scheduler = Scheduler({node_id: test_cases}, capacities={node_id: unlimited},
+                              method_filter=self.test_suite.method_filter)
+        self.scheduler = scheduler
+        node_result = self._start_node(node_id, scheduler)
+        node = self.node_manager.get_node(node_id)
+        
+        def on_result(worker_id: str, unit: WorkUnit, result: Optional[TestResult], error: Optional[str],
+                      stats: Dict[str, Any]) -> None:
+            node.update_heartbeat()
+            node.metadata["tests_run"] += len(result.results) if result else 0
+            fixture_setups = node.metadata["fixture_setups"]
+            for name, count in stats["fixture_setups"].items():
+                fixture_setups[name] = fixture_setups.get(name, 0) + count
+            if result is not None:
+                result.worker_id = worker_id
+                node_result.merge(result)
+                self.merged_results.merge(result)
+                self._checkpoint(result)
+                self._notify_unit_complete(node_id, result)
+                for plugin in self.plugins:
+                    plugin.on_test_progress_update(self.merged_results)
+            if error is not None:
+                self._report_unit_error(node_id, unit, error)
+        
+        def on_error(unit: WorkUnit, error: str) -> None:
+            self._record_restart(node, "disconnect")
+            self._report_unit_error(node_id, unit, error)
+        
+        def on_ready(address: Tuple[str, int]) -> None:
+            print(f"协调器监听 {address[0]}:{address[1]}，"
+                  f"工作者可通过 disttest worker {address[0]}:{address[1]} 连接")
+        
+        coordinator = Coordinator(scheduler, node_id, host=host, port=port, node_manager=self.node_manager,
+                                  heartbeat_interval=heartbeat_interval, heartbeat_timeout=heartbeat_timeout,
+                                  on_result=on_result, on_error=on_error)
+        started = time.time()
+        completed = asyncio.run(coordinator.serve(min_workers, timeout, ready=on_ready))
+        if not completed:
+            print(f"警告: 远程执行未在 {timeout} 秒内完成，"
+                  f"已连接工作者: {len(coordinator.connections)}，待执行工作单元: {scheduler.pending_count()}")
+        self._complete_node(node_id, node_result, timed_out=not completed)
+        
+        benchmark_suite = self.test_suite.get_benchmark_suite()
+        if benchmark_suite and completed:
+            pool = WorkerPool("thread", suite_name=self.test_suite.name, capture=self.capture)
+            self.worker_pool = pool
+            try:
+                completed = self._run_benchmark_phase(benchmark_suite, pool,
+                                                      max(0.0, timeout - (time.time() - started)))
+            finally:
+                pool.shutdown()
+        
+        self.merged_results.set_complete()
+        self._close_journal(completed)
+        self._detect_regressions()
+        
+        # 触发测试完成事件
+        for plugin in self.plugins:
+            plugin.on_test_run_complete(self.merged_results)
+        
+        summary = self.merged_results.get_summary()
+        print(f"远程测试执行完成. 工作者数量: {coordinator.stats['registered']}, "
+              f"总测试用例数: {summary['total']}, 通过: {summary['passed']}, 失败: {summary['failed']}, "
+              f"通过率: {summary['pass_rate'] * 100:.2f}%")
+        
+        return self.merged_results
+    
+    def _detect_regressions(self) -> None:
+        """与历史基线比较，记录性能回归的测试"""
+        if not self.regression_detector:
+            return
+        try:
+            regressions = self.regression_detector.detect(self.merged_results.results)
+        except Exception as e:
+            error = f"性能回归检测失败: {str(e)}"
+            print(error)
+            for plugin in self.plugins:
+                plugin.on_error(error)
+            return
+        self.merged_results.metadata["performance_regressions"] = regressions
+    
     def _distribute_test_cases(self, test_cases: List[Type[TestCase]], nodes: int) -> List[List[Type[TestCase]]]:
         """将测试用例分配到各个节点
         
@@ -141,6 +516,9 @@ class TestRunner:
         Returns:
             分配到各个节点的测试用例列表
         """
+        if any(test_class.get_fixture_names() for test_class in test_cases):
+            return self._distribute_by_fixtures(test_cases, nodes)
+        
         # 计算每个节点分配的测试用例数量
         total = len(test_cases)
         base_count = total // nodes
@@ -165,43 +543,383 @@ class TestRunner:
             # 计算每个节点的测试方法数
             method_count = 0
             for test_class in node_tests:
-                method_count += len(test_class.get_test_methods())
+                method_count += test_class.get_test_case_count()
             
             print(f"节点 {i+1}: 分配了 {len(node_tests)} 个测试用例类, {method_count} 个测试用例")
         
         return result
     
-    def _run_on_node(self, node_id: str, test_cases: List[Type[TestCase]]) -> TestResult:
-        """在单个节点上执行测试套件
+    def _distribute_by_fixtures(self, test_cases: List[Type[TestCase]], nodes: int) -> List[List[Type[TestCase]]]:
+        """按夹具分组分配测试用例
+        
+        共用任一夹具的测试用例类（直接共用，或经由其它类间接共用）分到同一组，例如声明
+        ["db"] 与 ["db", "cache"] 的类在同一组，节点的工作者只需创建一次 db；
+        各组按测试用例数从大到小依次分配给当前负载最小的节点
         
-        这是一个内部方法，模拟在远程节点上执行测试
-        在实际的分布式环境中，这里应该是与远程节点通信的代码
+        Args:
+            test_cases: 所有测试用例
+            nodes: 节点数量
+            
+        Returns:
+            分配到各个节点的测试用例列表
         """
-        # 计算测试方法数
-        method_count = 0
+        # 按夹具名称合并分组（并查集），没有夹具的类各自成组
+        parent: Dict[str, str] = {}
+        
+        def find(name: str) -> str:
+            while parent.setdefault(name, name) != name:
+                parent[name] = parent[parent[name]]
+                name = parent[name]
+            return name
+        
+        for test_class in test_cases:
+            names = test_class.get_fixture_names()
+            for name in names[1:]:
+                parent[find(name)] = find(names[0])
+        groups: Dict[Any, List[Type[TestCase]]] = {}
         for test_class in test_cases:
-            method_count += len(test_class.get_test_methods())
+            names = test_class.get_fixture_names()
+            key = find(names[0]) if names else test_class
+            groups.setdefault(key, []).append(test_class)
+        
+        weighted = sorted(groups.values(),
+                          key=lambda group: sum(test_class.get_test_case_count() for test_class in group),
+                          reverse=True)
+        result: List[List[Type[TestCase]]] = [[] for _ in range(nodes)]
+        loads = [0] * nodes
+        for group in weighted:
+            target = loads.index(min(loads))
+            result[target].extend(group)
+            loads[target] += sum(test_class.get_test_case_count() for test_class in group)
+        
+        for i, node_tests in enumerate(result):
+            fixture_names = sorted({name for test_class in node_tests for name in test_class.get_fixture_names()})
+            fixture_info = f", 夹具: {', '.join(fixture_names)}" if fixture_names else ""
+            print(f"节点 {i+1}: 分配了 {len(node_tests)} 个测试用例类, {loads[i]} 个测试用例{fixture_info}")
+        
+        return result
+    
+    def _run_scheduled(self, scheduler: Scheduler, pool: WorkerPool, timeout: float,
+                       autoscaler: Optional[Autoscaler] = None) -> bool:
+        """主控循环：派发工作单元、汇总结果并按策略回收工作者
+        
+        每个工作者同一时间只持有一个工作单元，未派发的工作单元始终保留在
+        调度器中，因此回收或崩溃的工作者不会丢失排队中的工作。指定 autoscaler 时
+        定期调整（唯一的）节点并发执行的工作者数。超时时以已收到的结果完成
+        尚未完成的节点，并在节点元数据中标记 timed_out
+        
+        Returns:
+            是否在超时前执行完所有工作单元
+        """
+        deadline = time.time() + timeout
+        node_results: Dict[str, TestResult] = {}
+        poll_interval = 0.5 if autoscaler is None else min(0.5, autoscaler.policy.interval)
+        
+        for node_id in scheduler.node_ids:
+            node_results[node_id] = self._start_node(node_id, scheduler)
+            self._fill_node(node_id, scheduler, pool, node_results)
+        
+        while pool.has_workers():
+            if time.time() > deadline:
+                print(f"警告: 分布式测试执行超时({timeout}秒)，剩余 {scheduler.pending_count()} 个工作单元未执行，"
+                      f"{scheduler.running_count()} 个执行中")
+                for node_id in scheduler.node_ids:
+                    if self.node_manager.get_node(node_id).status != "已完成":
+                        self._complete_node(node_id, node_results[node_id], timed_out=True)
+                return False
+            if autoscaler is not None and autoscaler.due():
+                self._autoscale(autoscaler, scheduler, pool, node_results)
+            
+            message = pool.get_message(timeout=poll_interval)
+            if message is not None:
+                self._handle_worker_message(message, scheduler, pool, node_results)
+                continue
+            if scheduler.speculative:
+                self._poll_nodes(scheduler, pool, node_results)
             
+            # 先处理已退出工作者留下的消息，再判定其是否崩溃
+            dead_workers = pool.find_dead_workers()
+            if not dead_workers:
+                continue
+            while True:
+                message = pool.get_message(timeout=0)
+                if message is None:
+                    break
+                self._handle_worker_message(message, scheduler, pool, node_results)
+            for worker_id in dead_workers:
+                if worker_id in pool.workers:
+                    self._handle_crashed_worker(worker_id, scheduler, pool, node_results)
+        return True
+    
+    def _autoscale(self, autoscaler: Autoscaler, scheduler: Scheduler, pool: WorkerPool,
+                   node_results: Dict[str, TestResult]) -> None:
+        """按队列深度和主机负载调整节点的CPU容量（并发执行的工作者数），回收多余或空闲的工作者"""
+        node_id = scheduler.node_ids[0]
+        node = self.node_manager.get_node(node_id)
+        if node.status == "已完成":
+            return
+        workers = pool.node_workers(node_id)
+        utilization = (sum(pool.workers[worker_id].utilization for worker_id in workers) / len(workers)
+                       if workers else None)
+        previous = autoscaler.target
+        target = autoscaler.update(scheduler.pending_count(node_id), scheduler.running_count(node_id),
+                                   utilization)
+        scheduler.resize(node_id, float(target))
+        if target != previous:
+            print(f"节点 {node_id} 的工作者数量调整为 {target} (待执行工作单元: {scheduler.pending_count(node_id)})")
+        
+        # 工作者多于目标时回收空闲的工作者；队列为空后回收连续空闲超过 idle_timeout 的工作者
+        excess = len(workers) - target
+        now = time.time()
+        for worker_id in pool.idle_workers(node_id):
+            idle_for = now - pool.workers[worker_id].state_since
+            if excess > 0 or (not scheduler.pending_count(node_id) and idle_for >= autoscaler.policy.idle_timeout):
+                pool.stop(worker_id)
+                excess -= 1
+        node.metadata["autoscale"] = autoscaler.summary()
+        self._fill_node(node_id, scheduler, pool, node_results)
+    
+    def _run_benchmark_phase(self, benchmark_suite: TestSuite, pool: WorkerPool, timeout: float) -> bool:
+        """在普通测试全部完成后，由一个独占的节点串行执行所有基准测试
+        
+        此时其它节点的工作者均已退出，基准测试不会受到并发执行的测试干扰
+        
+        Returns:
+            是否在超时前执行完所有基准测试
+        """
+        node_id = f"bench-{uuid.uuid4().hex[:8]}"
+        print(f"普通测试执行完成，在独占节点 {node_id} 上执行 "
+              f"{benchmark_suite.get_total_method_count()} 个基准测试")
+        scheduler = Scheduler({node_id: benchmark_suite.test_cases}, benchmark=True,
+                              method_filter=benchmark_suite.method_filter)
+        self.scheduler = scheduler
+        return self._run_scheduled(scheduler, pool, timeout)
+    
+    def _start_node(self, node_id: str, scheduler: Scheduler) -> TestResult:
+        """注册节点并触发节点开始事件"""
+        test_cases = scheduler.assignments[node_id]
+        method_count = scheduler.method_count(node_id)
         print(f"节点 {node_id} 开始执行 {len(test_cases)} 个测试用例类 ({method_count} 个测试用例)...")
         
-        # 创建节点的测试套件
-        node_suite = TestSuite(f"{self.test_suite.name}-{node_id}")
-        node_suite.test_cases = test_cases
+        if self.node_manager.get_node(node_id) is None:
+            self.node_manager.register_node(node_id=node_id)
+        self.node_manager.update_node_status(node_id, "运行中")
+        self.node_manager.get_node(node_id).metadata.update({
+            "restarts": 0,
+            "recycle_reasons": {},
+            "tests_run": 0,
+            "fixture_setups": {},
+        })
         
-        # 触发节点开始事件
+        node_suite = TestSuite(f"{self.test_suite.name}-{node_id}", benchmark=scheduler.benchmark)
+        node_suite.test_cases = test_cases
+        # 参数化方法的分片可能分布在其它节点上，节点实际执行的用例数以调度器为准
+        node_suite.metadata["method_count"] = method_count
         for plugin in self.plugins:
             plugin.on_node_start(node_id, node_suite)
         
-        # 执行测试
-        result = node_suite.run(node_id)
+        node_result = TestResult()
+        node_result.test_case_name = node_suite.name
+        node_result.node_id = node_id
+        return node_result
+    
+    def _fill_node(self, node_id: str, scheduler: Scheduler, pool: WorkerPool,
+                   node_results: Dict[str, TestResult]) -> None:
+        """在节点剩余容量内派发工作单元，优先使用空闲的工作者，不足时启动新的工作者
+        
+        节点没有待执行和执行中的工作单元时关闭其工作者并完成节点；开启推测执行时，
+        只要其它节点还有执行中的工作单元，节点（及其空闲的工作者）就保持开放，以便为
+        执行时间过长的工作单元启动副本
+        """
+        if self.node_manager.get_node(node_id).status == "已完成":
+            return
+        while True:
+            unit = scheduler.next_unit(node_id)
+            if unit is None:
+                break
+            pool.send(self._acquire_worker(node_id, scheduler, pool), unit)
+        
+        # 所有队列为空时，在剩余容量内为执行时间过长的幂等工作单元启动副本
+        copy = scheduler.speculate(node_id)
+        if copy is not None:
+            original_node = scheduler.twins[copy.unit_id][0]
+            print(f"推测执行: 节点 {node_id} 为节点 {original_node} 上执行了 "
+                  f"{time.time() - scheduler.twins[copy.unit_id][1].started_at:.1f} 秒的 "
+                  f"{copy.test_case.__name__} 启动副本")
+            pool.send(self._acquire_worker(node_id, scheduler, pool), copy)
+        
+        if not scheduler.pending_count(node_id) and not scheduler.running_count(node_id):
+            if scheduler.speculative and any(scheduler.running_count(other) for other in scheduler.node_ids):
+                return
+            for worker_id in pool.idle_workers(node_id):
+                pool.stop(worker_id)
+            self._complete_node(node_id, node_results[node_id])
+    
+    def _acquire_worker(self, node_id: str, scheduler: Scheduler, pool: WorkerPool) -> str:
+        """获取节点上空闲的工作者，没有时启动新的工作者并在节点元数据中记录其绑定的CPU核心"""
+        idle = pool.idle_workers(node_id)
+        if idle:
+            return idle[0]
+        worker_id = pool.spawn(node_id, benchmark=scheduler.benchmark)
+        placement = pool.workers[worker_id].placement
+        if placement is not None:
+            self.node_manager.get_node(node_id).metadata.setdefault("placement", {})[worker_id] = placement.to_dict()
+        return worker_id
+    
+    def _after_release(self, node_id: str, unit: Optional[WorkUnit], scheduler: Scheduler,
+                       pool: WorkerPool, node_results: Dict[str, TestResult]) -> None:
+        """工作单元释放资源后继续派发；释放了独占锁时其它节点等待该锁的工作单元也可能可以执行，
+        开启推测执行时其它开放的节点可能可以启动副本或完成"""
+        self._fill_node(node_id, scheduler, pool, node_results)
+        if scheduler.speculative:
+            self._poll_nodes(scheduler, pool, node_results)
+        elif unit is not None and unit.resources.locks:
+            for other in scheduler.node_ids:
+                if other != node_id:
+                    self._fill_node(other, scheduler, pool, node_results)
+    
+    def _poll_nodes(self, scheduler: Scheduler, pool: WorkerPool, node_results: Dict[str, TestResult]) -> None:
+        """重新检查所有未完成的节点（推测执行的阈值随时间到达，空闲的节点需要定期检查）"""
+        for node_id in scheduler.node_ids:
+            self._fill_node(node_id, scheduler, pool, node_results)
+    
+    def _handle_worker_message(self, message: Tuple, scheduler: Scheduler, pool: WorkerPool,
+                               node_results: Dict[str, TestResult]) -> None:
+        """处理工作者完成一个工作单元后发送的消息"""
+        worker_id, unit_id, result, error, retire_reason, stats = message
+        if worker_id not in pool.workers:
+            # 推测执行中被取消的线程工作者执行完成后发送的消息
+            return
+        node_id = pool.node_of(worker_id)
+        unit = pool.take_inflight(worker_id)
+        if unit is not None:
+            scheduler.complete(node_id, unit)
+        twin = scheduler.finish_speculation(unit) if unit is not None else None
+        if twin is not None:
+            self._resolve_speculation(node_id, unit, twin, result, pool)
+        
+        node = self.node_manager.get_node(node_id)
+        node.update_heartbeat()
+        node.metadata["tests_run"] += len(result.results) if result else 0
+        node.metadata["pid"] = stats["pid"]
+        if stats["rss"] is not None:
+            node.metadata["rss"] = stats["rss"]
+        fixture_setups = node.metadata["fixture_setups"]
+        for name, count in stats["fixture_setups"].items():
+            fixture_setups[name] = fixture_setups.get(name, 0) + count
+        
+        if result is not None:
+            result.worker_id = worker_id
+            node_results[node_id].merge(result)
+            self.merged_results.merge(result)
+            self._checkpoint(result)
+            self._notify_unit_complete(node_id, result)
+            # 实时汇总结果后触发进度更新事件
+            for plugin in self.plugins:
+                plugin.on_test_progress_update(self.merged_results)
+        
+        if error is not None:
+            self._report_unit_error(node_id, unit, error)
         
-        # 设置节点ID
-        result.node_id = node_id
+        if retire_reason:
+            pool.retire(worker_id)
+            if scheduler.pending_count(node_id):
+                print(f"节点 {node_id} 的工作者 {worker_id} 达到 {retire_reason} 限制，回收后启动新的工作者")
+                self._record_restart(node, retire_reason)
+        
+        self._after_release(node_id, unit, scheduler, pool, node_results)
+        if twin is not None:
+            self._fill_node(twin[0], scheduler, pool, node_results)
+    
+    def _resolve_speculation(self, node_id: str, unit: WorkUnit, twin: Tuple[str, WorkUnit],
+                             result: Optional[TestResult], pool: WorkerPool) -> None:
+        """推测执行的工作单元有一份先完成：取消另一份，并在结果中记录生效的是哪一份"""
+        twin_node, twin_unit = twin
+        twin_worker = pool.worker_of(twin_unit)
+        if twin_worker is not None:
+            pool.cancel(twin_worker)
+        
+        speculative_won = unit.speculative_of is not None
+        original_node, speculative_node = (twin_node, node_id) if speculative_won else (node_id, twin_node)
+        original = twin_unit if speculative_won else unit
+        record = {
+            "winner": "speculative" if speculative_won else "original",
+            "original_node": original_node,
+            "speculative_node": speculative_node,
+            "elapsed": time.time() - original.started_at,
+        }
+        if result is not None:
+            for method_result in result.results:
+                method_result.additional_data["speculation"] = record
+        self.merged_results.metadata.setdefault("speculation", []).append(
+            dict(record, test_case=unit.test_case.__name__))
+        winner = f"节点 {speculative_node} 上的副本" if speculative_won else f"节点 {original_node} 上的原始执行"
+        loser = f"节点 {original_node} 上的原始执行" if speculative_won else f"节点 {speculative_node} 上的副本"
+        print(f"推测执行: {unit.test_case.__name__} 由{winner}先完成，取消{loser}")
+    
+    def _handle_crashed_worker(self, worker_id: str, scheduler: Scheduler, pool: WorkerPool,
+                               node_results: Dict[str, TestResult]) -> None:
+        """工作者意外退出时重新排队其工作单元并启动新的工作者
+        
+        同一工作单元连续导致两次崩溃时不再重试，记录为错误
+        """
+        node_id = pool.node_of(worker_id)
+        unit = pool.take_inflight(worker_id)
+        pool.retire(worker_id)
+        
+        print(f"节点 {node_id} 的工作者 {worker_id} 意外退出，启动新的工作者")
+        self._record_restart(self.node_manager.get_node(node_id), "crash")
+        
+        if unit is not None and scheduler.drop_speculation(unit) is not None:
+            # 推测执行的另一份仍在执行，不再重试
+            scheduler.release(node_id, unit)
+        elif unit is not None:
+            unit.attempts += 1
+            if unit.attempts < 2:
+                scheduler.requeue(node_id, unit)
+            else:
+                scheduler.release(node_id, unit)
+                self._report_unit_error(node_id, unit, "工作者在执行该测试用例类时多次意外退出")
+        
+        self._after_release(node_id, unit, scheduler, pool, node_results)
+    
+    def _notify_unit_complete(self, node_id: str, result: TestResult) -> None:
+        """工作单元结果合并后，逐个触发测试方法完成事件和工作单元完成事件"""
+        for plugin in self.plugins:
+            for method_result in result.results:
+                plugin.on_test_method_complete(node_id, method_result)
+            plugin.on_unit_complete(node_id, result)
+    
+    def _record_restart(self, node: Node, reason: str) -> None:
+        """记录节点的工作者重启次数及原因"""
+        node.metadata["restarts"] += 1
+        reasons = node.metadata["recycle_reasons"]
+        reasons[reason] = reasons.get(reason, 0) + 1
+    
+    def _report_unit_error(self, node_id: str, unit: WorkUnit, error: str) -> None:
+        """报告工作单元执行出错"""
+        print(f"节点执行测试时出错: {error}")
+        for plugin in self.plugins:
+            plugin.on_error(error, {"node_id": node_id, "test_case": unit.test_case.__name__})
+    
+    def _complete_node(self, node_id: str, result: TestResult, timed_out: bool = False) -> None:
+        """节点所有工作单元完成（或执行超时）后触发节点完成事件
+        
+        Args:
+            node_id: 节点ID
+            result: 节点已收到的测试结果
+            timed_out: 节点是否因执行超时而结束，超时的节点在元数据中标记 timed_out
+        """
+        result.set_complete()
+        self.node_manager.update_node_status(node_id, "已完成")
+        if timed_out:
+            self.node_manager.get_node(node_id).metadata["timed_out"] = True
         
         # 触发节点完成事件
         for plugin in self.plugins:
             plugin.on_node_complete(node_id, result)
         
         summary = result.get_summary()
-        print(f"节点 {node_id} 测试执行完成. 执行了 {summary['total']} 个测试用例, 通过: {summary['passed']}, 失败: {summary['failed']}")
-        return result 
\ No newline at end of file
+        restarts = self.node_manager.get_node(node_id).metadata["restarts"]
+        print(f"节点 {node_id} 测试执行{'超时' if timed_out else '完成'}. 执行了 {summary['total']} 个测试用例, "
+              f"通过: {summary['passed']}, 失败: {summary['failed']}, 工作者重启次数: {restarts}")
\ No newline at end of file
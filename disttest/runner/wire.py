@@ -0,0 +1,546 @@
+"""
+节点与主控节点之间的二进制消息格式
+msgpack风格的紧凑编码，直接支持 TestResult、TestMethodResult、WorkUnit 与 datetime，
+不依赖pickle，可以安全地在主机之间传递
+
+编码器和解码器按数据流保存状态，必须成对使用并按顺序处理帧:
+- 方法名、类名、模块名、节点ID和字典键等字符串首次出现时连同编号发送，之后只发送编号
+- 时间以与上一个时间戳的差值（纳秒/微秒）按zigzag变长整数编码
+
+帧格式: MAGIC(3) 版本(1) 标志(1) 载荷长度(varint) 载荷，载荷为若干条依次编码的消息，
+标志位 FLAG_ZLIB 表示载荷经过zlib压缩。版本 2 在 TestMethodResult 中增加了模块名
+
+集合按列表编码，其它不支持的类型（例如测试写入 additional_data 的自定义对象）按 repr 编码为字符串
+"""
+import gc
+import importlib
+import struct
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..core.resources import Resources
+from ..core.test_result import TestMethodResult, TestResult
+from .scheduler import WorkUnit
+
+MAGIC = b"DTW"
+VERSION = 2
+FLAG_ZLIB = 1
+
+# 值类型标记
+T_NIL = 0xc0
+T_FALSE = 0xc2
+T_TRUE = 0xc3
+T_BYTES = 0xc4
+T_FLOAT = 0xcb
+T_INT = 0xd0  # zigzag变长整数
+T_STR = 0xd9
+T_LIST = 0xdc
+T_MAP = 0xde
+T_STR_DEFINE = 0xe0  # 定义驻留字符串: 编号, 长度, 内容
+T_STR_REF = 0xe1  # 引用驻留字符串: 编号
+T_DATETIME = 0xe2  # 与上一个时间戳的微秒差
+T_METHOD_RESULT = 0xe3
+T_RESULT = 0xe4
+T_WORK_UNIT = 0xe5
+T_TUPLE = 0xe6
+
+# TestMethodResult 标志位
+M_SUCCESS = 1
+M_ERROR = 2
+M_ADDITIONAL = 4
+M_PHASES = 8  # timings 只包含 setup/call/teardown/end
+M_CALL = 16  # timings["call"] 不为None
+M_TIMINGS = 32  # 其它形式的 timings，按普通字典编码
+
+FLOAT = struct.Struct(">d")
+PHASE_KEYS = {"setup", "call", "teardown", "end"}
+EPOCH = datetime(1970, 1, 1)
+
+# 长度不超过该值的字符串在作为字典键、名称时驻留
+INTERN_MAX_LENGTH = 256
+
+DEFAULT_COMPRESS_THRESHOLD = 4096
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    byte = data[position]
+    position += 1
+    if byte < 0x80:
+        return byte, position
+    value = byte & 0x7f
+    shift = 7
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _class_path(cls: type) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _resolve_class(path: str) -> type:
+    module_name, _, qualname = path.partition(":")
+    target: Any = importlib.import_module(module_name)
+    for part in qualname.split("."):
+        target = getattr(target, part)
+    return target
+
+
+class WireEncoder:
+    """消息编码器，每个数据流使用一个实例"""
+
+    def __init__(self, compress_threshold: Optional[int] = DEFAULT_COMPRESS_THRESHOLD):
+        """
+        Args:
+            compress_threshold: 载荷超过该字节数时尝试zlib压缩，None表示不压缩
+        """
+        self.compress_threshold = compress_threshold
+        self._strings: Dict[str, int] = {}
+        self._last_micros = 0
+        self._last_nanos = 0
+
+    def encode_frame(self, messages: List[Any]) -> bytes:
+        """将多条消息编码为一帧"""
+        payload = bytearray()
+        for message in messages:
+            self.encode_value(payload, message)
+        return self.frame(payload)
+
+    def frame(self, payload: bytearray) -> bytes:
+        """为已编码的载荷加上帧头，按需压缩"""
+        flags = 0
+        if self.compress_threshold is not None and len(payload) > self.compress_threshold:
+            compressed = zlib.compress(payload, 1)
+            if len(compressed) < len(payload):
+                payload, flags = compressed, FLAG_ZLIB
+        header = bytearray(MAGIC)
+        header.append(VERSION)
+        header.append(flags)
+        _write_varint(header, len(payload))
+        return bytes(header + payload)
+
+    def encode_value(self, out: bytearray, value: Any) -> None:
+        """编码一个值"""
+        value_type = type(value)
+        if value_type is str:
+            self._write_str(out, value)
+        elif value_type is int:
+            if 0 <= value <= 0x7f:
+                out.append(value)
+            else:
+                out.append(T_INT)
+                _write_varint(out, _zigzag(value))
+        elif value_type is float:
+            out.append(T_FLOAT)
+            out += FLOAT.pack(value)
+        elif value is None:
+            out.append(T_NIL)
+        elif value_type is bool:
+            out.append(T_TRUE if value else T_FALSE)
+        elif value_type is dict:
+            out.append(T_MAP)
+            _write_varint(out, len(value))
+            for key, item in value.items():
+                if type(key) is str:
+                    self._write_name(out, key)
+                else:
+                    self.encode_value(out, key)
+                self.encode_value(out, item)
+        elif value_type is list or value_type is tuple:
+            out.append(T_LIST if value_type is list else T_TUPLE)
+            _write_varint(out, len(value))
+            for item in value:
+                self.encode_value(out, item)
+        elif value_type is TestMethodResult:
+            out.append(T_METHOD_RESULT)
+            self._write_method_result(out, value)
+        elif value_type is TestResult:
+            out.append(T_RESULT)
+            self._write_result(out, value)
+        elif value_type is WorkUnit:
+            out.append(T_WORK_UNIT)
+            self._write_work_unit(out, value)
+        elif value_type is datetime:
+            out.append(T_DATETIME)
+            self._write_datetime(out, value)
+        elif value_type is bytes or value_type is bytearray:
+            out.append(T_BYTES)
+            _write_varint(out, len(value))
+            out += value
+        elif isinstance(value, (int, float, str)):
+            # 枚举等子类按基础类型编码
+            for base in (int, float, str):
+                if isinstance(value, base):
+                    self.encode_value(out, base(value))
+                    break
+        elif isinstance(value, (set, frozenset)):
+            self.encode_value(out, list(value))
+        else:
+            # 测试写入 additional_data 等处的其它对象无法还原，按 repr 编码为字符串，
+            # 避免一个结果无法编码导致工作者退出
+            try:
+                text = repr(value)
+            except Exception:
+                text = f"<{value_type.__name__}>"
+            self._write_str(out, text)
+
+    def _write_str(self, out: bytearray, value: str) -> None:
+        data = value.encode("utf-8")
+        out.append(T_STR)
+        _write_varint(out, len(data))
+        out += data
+
+    def _write_name(self, out: bytearray, value: str) -> None:
+        """编码会重复出现的字符串（测试名称、字典键等），首次出现时定义编号"""
+        index = self._strings.get(value)
+        if index is not None:
+            out.append(T_STR_REF)
+            _write_varint(out, index)
+            return
+        if len(value) > INTERN_MAX_LENGTH:
+            self._write_str(out, value)
+            return
+        index = self._strings[value] = len(self._strings)
+        data = value.encode("utf-8")
+        out.append(T_STR_DEFINE)
+        _write_varint(out, index)
+        _write_varint(out, len(data))
+        out += data
+
+    def _write_datetime(self, out: bytearray, value: datetime) -> None:
+        delta = value - EPOCH
+        micros = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+        _write_varint(out, _zigzag(micros - self._last_micros))
+        self._last_micros = micros
+
+    def _write_nanos(self, out: bytearray, seconds: float) -> None:
+        """以与上一个时间的纳秒差编码时间戳"""
+        nanos = round(seconds * 1e9)
+        _write_varint(out, _zigzag(nanos - self._last_nanos))
+        self._last_nanos = nanos
+
+    def _write_method_result(self, out: bytearray, result: TestMethodResult) -> None:
+        timings = result.timings
+        flags = M_SUCCESS if result.success else 0
+        if result.error_message is not None:
+            flags |= M_ERROR
+        if result.additional_data:
+            flags |= M_ADDITIONAL
+        if timings.keys() == PHASE_KEYS:
+            flags |= M_PHASES
+            if timings["call"] is not None:
+                flags |= M_CALL
+        elif timings:
+            flags |= M_TIMINGS
+
+        out.append(flags)
+        self._write_name(out, result.method_name)
+        self._write_name(out, result.class_name)
+        self._write_name(out, result.module)
+        _write_varint(out, max(0, round(result.execution_time * 1e9)))
+        self._write_datetime(out, result.start_time)
+        if flags & M_PHASES:
+            self._write_nanos(out, timings["setup"])
+            if flags & M_CALL:
+                self._write_nanos(out, timings["call"])
+            self._write_nanos(out, timings["teardown"])
+            self._write_nanos(out, timings["end"])
+        elif flags & M_TIMINGS:
+            self.encode_value(out, timings)
+        if flags & M_ERROR:
+            self._write_str(out, result.error_message)
+        if flags & M_ADDITIONAL:
+            self.encode_value(out, result.additional_data)
+
+    def _write_result(self, out: bytearray, result: TestResult) -> None:
+        self._write_name(out, result.test_case_name)
+        self._write_name(out, result.node_id)
+        self._write_datetime(out, result.start_time)
+        self.encode_value(out, result.end_time)
+        _write_varint(out, len(result.results))
+        for method_result in result.results:
+            self._write_method_result(out, method_result)
+        self.encode_value(out, result.metadata)
+        self.encode_value(out, result.class_timings)
+
+    def _write_work_unit(self, out: bytearray, unit: WorkUnit) -> None:
+        _write_varint(out, unit.unit_id)
+        self._write_name(out, _class_path(unit.test_case))
+        _write_varint(out, unit.attempts)
+        out.append(T_TRUE if unit.benchmark else T_FALSE)
+        self.encode_value(out, unit.methods)
+        self.encode_value(out, list(unit.shard) if unit.shard is not None else None)
+        resources = unit.resources
+        self.encode_value(out, [resources.cpu, resources.memory, list(resources.locks)])
+
+
+class WireDecoder:
+    """消息解码器，与对端的 WireEncoder 一一对应"""
+
+    def __init__(self):
+        self._strings: List[str] = []
+        self._last_micros = 0
+        self._last_nanos = 0
+        self._classes: Dict[str, type] = {}
+        self._second: Optional[int] = None  # 最近解码的时间戳所在的整秒及其datetime
+        self._second_datetime = EPOCH
+
+    def decode_frame(self, frame: bytes) -> List[Any]:
+        """解码一帧，返回其中的消息列表
+
+        解码会创建大量对象并频繁触发垃圾回收，解码期间暂停垃圾回收
+        """
+        if frame[:3] != MAGIC:
+            raise ValueError("不是有效的消息帧")
+        if frame[3] != VERSION:
+            raise ValueError(f"不支持的消息格式版本: {frame[3]}，当前版本: {VERSION}")
+        flags = frame[4]
+        length, position = _read_varint(frame, 5)
+        payload = frame[position:position + length]
+        if len(payload) != length:
+            raise ValueError("消息帧不完整")
+        if flags & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+
+        messages = []
+        position = 0
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            while position < len(payload):
+                value, position = self.decode_value(payload, position)
+                messages.append(value)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return messages
+
+    def decode_value(self, data: bytes, position: int) -> Tuple[Any, int]:
+        """从 position 处解码一个值，返回 (值, 下一个位置)"""
+        tag = data[position]
+        position += 1
+        if tag <= 0x7f:
+            return tag, position
+        read_varint = _read_varint
+        if tag == T_STR_REF:
+            index, position = read_varint(data, position)
+            return self._strings[index], position
+        if tag == T_STR:
+            length, position = read_varint(data, position)
+            return data[position:position + length].decode("utf-8"), position + length
+        if tag == T_STR_DEFINE:
+            return self._read_definition(data, position)
+        if tag == T_INT:
+            value, position = read_varint(data, position)
+            return _unzigzag(value), position
+        if tag == T_FLOAT:
+            return FLOAT.unpack_from(data, position)[0], position + 8
+        if tag == T_NIL:
+            return None, position
+        if tag == T_TRUE:
+            return True, position
+        if tag == T_FALSE:
+            return False, position
+        if tag == T_MAP:
+            count, position = read_varint(data, position)
+            value = {}
+            for _ in range(count):
+                key, position = self.decode_value(data, position)
+                value[key], position = self.decode_value(data, position)
+            return value, position
+        if tag == T_LIST or tag == T_TUPLE:
+            count, position = read_varint(data, position)
+            items = []
+            for _ in range(count):
+                item, position = self.decode_value(data, position)
+                items.append(item)
+            return (items if tag == T_LIST else tuple(items)), position
+        if tag == T_METHOD_RESULT:
+            return self._read_method_result(data, position)
+        if tag == T_RESULT:
+            return self._read_result(data, position)
+        if tag == T_WORK_UNIT:
+            return self._read_work_unit(data, position)
+        if tag == T_DATETIME:
+            return self._read_datetime(data, position)
+        if tag == T_BYTES:
+            length, position = read_varint(data, position)
+            return bytes(data[position:position + length]), position + length
+        raise ValueError(f"未知的类型标记: 0x{tag:02x}")
+
+    def _read_definition(self, data: bytes, position: int) -> Tuple[str, int]:
+        index, position = _read_varint(data, position)
+        length, position = _read_varint(data, position)
+        value = data[position:position + length].decode("utf-8")
+        if index != len(self._strings):
+            raise ValueError(f"驻留字符串编号不连续: {index}")
+        self._strings.append(value)
+        return value, position + length
+
+    def _read_name(self, data: bytes, position: int) -> Tuple[str, int]:
+        tag = data[position]
+        if tag == T_STR_REF:
+            index = data[position + 1]
+            if index < 0x80:
+                return self._strings[index], position + 2
+            index, position = _read_varint(data, position + 1)
+            return self._strings[index], position
+        if tag == T_STR_DEFINE:
+            return self._read_definition(data, position + 1)
+        value, position = self.decode_value(data, position)
+        return value, position
+
+    def _read_datetime(self, data: bytes, position: int) -> Tuple[datetime, int]:
+        delta, position = _read_varint(data, position)
+        micros = self._last_micros = self._last_micros + _unzigzag(delta)
+        # 同一数据流中的时间戳大多落在相邻的整秒内，复用整秒部分的datetime
+        second, microsecond = divmod(micros, 1000000)
+        if second != self._second:
+            self._second = second
+            self._second_datetime = EPOCH + timedelta(seconds=second)
+        return self._second_datetime.replace(microsecond=microsecond), position
+
+    def _read_method_result(self, data: bytes, position: int) -> Tuple[TestMethodResult, int]:
+        flags = data[position]
+        method_name, position = self._read_name(data, position + 1)
+        class_name, position = self._read_name(data, position)
+        module, position = self._read_name(data, position)
+        execution_nanos, position = _read_varint(data, position)
+        start_time, position = self._read_datetime(data, position)
+
+        timings: Dict[str, Optional[float]] = {}
+        if flags & M_PHASES:
+            # 各阶段时间依次为与上一个时间的纳秒差
+            nanos = self._last_nanos
+            phases = []
+            for _ in range(4 if flags & M_CALL else 3):
+                delta, position = _read_varint(data, position)
+                nanos += (delta >> 1) ^ -(delta & 1)
+                phases.append(nanos / 1e9)
+            self._last_nanos = nanos
+            if flags & M_CALL:
+                timings = {"setup": phases[0], "call": phases[1], "teardown": phases[2], "end": phases[3]}
+            else:
+                timings = {"setup": phases[0], "call": None, "teardown": phases[1], "end": phases[2]}
+        elif flags & M_TIMINGS:
+            timings, position = self.decode_value(data, position)
+        error = None
+        if flags & M_ERROR:
+            error, position = self.decode_value(data, position)
+        additional_data: Dict[str, Any] = {}
+        if flags & M_ADDITIONAL:
+            additional_data, position = self.decode_value(data, position)
+
+        # 与pickle相同，直接设置实例属性而不经过 __init__
+        result = object.__new__(TestMethodResult)
+        result.__dict__.update({
+            "method_name": method_name,
+            "success": bool(flags & M_SUCCESS),
+            "error_message": error,
+            "execution_time": execution_nanos / 1e9,
+            "start_time": start_time,
+            "additional_data": additional_data,
+            "class_name": class_name,
+            "timings": timings,
+            "module": module,
+        })
+        return result, position
+
+    def _read_result(self, data: bytes, position: int) -> Tuple[TestResult, int]:
+        result = TestResult()
+        result.test_case_name, position = self._read_name(data, position)
+        result.node_id, position = self._read_name(data, position)
+        result.start_time, position = self._read_datetime(data, position)
+        result.end_time, position = self.decode_value(data, position)
+        count, position = _read_varint(data, position)
+        for _ in range(count):
+            method_result, position = self._read_method_result(data, position)
+            result.add_result(method_result)
+        result.metadata, position = self.decode_value(data, position)
+        result.class_timings, position = self.decode_value(data, position)
+        return result, position
+
+    def _read_work_unit(self, data: bytes, position: int) -> Tuple[WorkUnit, int]:
+        unit_id, position = _read_varint(data, position)
+        path, position = self._read_name(data, position)
+        test_case = self._classes.get(path)
+        if test_case is None:
+            test_case = self._classes[path] = _resolve_class(path)
+        attempts, position = _read_varint(data, position)
+        benchmark = data[position] == T_TRUE
+        methods, position = self.decode_value(data, position + 1)
+        shard, position = self.decode_value(data, position)
+        (cpu, memory, locks), position = self.decode_value(data, position)
+        unit = WorkUnit(unit_id, test_case, attempts=attempts, benchmark=benchmark, methods=methods,
+                        shard=tuple(shard) if shard is not None else None,
+                        resources=Resources(cpu=cpu, memory=memory, locks=tuple(locks)))
+        return unit, position
+
+
+class FrameBatcher:
+    """按大小或延迟上限把多条消息合并为一帧发送
+
+    消息先编码进缓冲区，缓冲区超过 max_bytes、或距第一条未发送消息超过 max_delay 秒时
+    发送一帧。没有后台线程，延迟上限在 add 和 poll 时检查，发送方在阻塞等待之前应调用 flush
+    """
+
+    def __init__(self, send: Callable[[bytes], None], encoder: Optional[WireEncoder] = None,
+                 max_bytes: int = 64 * 1024, max_delay: float = 0.05):
+        """
+        Args:
+            send: 发送一帧的函数
+            encoder: 编码器，默认新建
+            max_bytes: 一帧载荷的大小上限（字节）
+            max_delay: 消息在缓冲区中停留的最长时间（秒）
+        """
+        self.send = send
+        self.encoder = encoder or WireEncoder()
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self._payload = bytearray()
+        self._first_added: Optional[float] = None
+        self.frames_sent = 0
+
+    def add(self, message: Any) -> None:
+        """加入一条消息，达到大小或延迟上限时发送"""
+        if self._first_added is None:
+            self._first_added = time.monotonic()
+        self.encoder.encode_value(self._payload, message)
+        if len(self._payload) >= self.max_bytes:
+            self.flush()
+        else:
+            self.poll()
+
+    def poll(self) -> None:
+        """缓冲区中的消息超过延迟上限时发送"""
+        if self._first_added is not None and time.monotonic() - self._first_added >= self.max_delay:
+            self.flush()
+
+    def flush(self) -> None:
+        """立即发送缓冲区中的所有消息"""
+        if not self._payload:
+            return
+        payload, self._payload, self._first_added = self._payload, bytearray(), None
+        self.send(self.encoder.frame(payload))
+        self.frames_sent += 1
@@ -0,0 +1,407 @@
+"""
+WorkerPool类 - 工作者池
+在线程或子进程中执行工作单元，并按生命周期策略回收工作者
+"""
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+
+from ..core import TestSuite, TestResult, LeakDetector
+from ..core.capture import CapturePolicy
+from ..core.fixtures import FixtureCache
+from .placement import CpuPlacer, Placement
+from .scheduler import WorkUnit
+from .shm_channel import DEFAULT_RING_SIZE, ResultRing, require_shared_memory
+from .wire import WireDecoder, WireEncoder
+
+
+@dataclass
+class WorkerPolicy:
+    """工作者生命周期策略
+
+    任一限制被突破时，工作者在完成当前工作单元后退出，由主控节点启动新的工作者
+    继续执行该节点剩余的工作单元
+    """
+    max_tests: Optional[int] = None
+    max_rss_mb: Optional[float] = None
+    max_age: Optional[float] = None
+
+    def check(self, tests_run: int, age: float, rss: Optional[int] = None) -> Optional[str]:
+        """检查工作者是否需要回收
+
+        Args:
+            tests_run: 工作者已执行的测试方法数
+            age: 工作者已运行的时间（秒）
+            rss: 工作者进程的常驻内存（字节），线程模式下为None
+
+        Returns:
+            需要回收时返回触发的限制名称，否则返回None
+        """
+        if self.max_tests is not None and tests_run >= self.max_tests:
+            return "max_tests"
+        if self.max_rss_mb is not None and rss is not None and rss > self.max_rss_mb * 1024 * 1024:
+            return "max_rss"
+        if self.max_age is not None and age >= self.max_age:
+            return "max_age"
+        return None
+
+
+def run_unit(unit: WorkUnit, node_id: str, suite_name: str, leak_detector: Optional[LeakDetector],
+             fixture_cache: FixtureCache,
+             capture: Optional[CapturePolicy] = None) -> Tuple[Optional[TestResult], Optional[str], Dict[str, int]]:
+    """执行一个工作单元
+
+    Returns:
+        (测试结果, 错误信息, 本工作单元中各夹具的创建次数)
+    """
+    suite = TestSuite(suite_name, benchmark=unit.benchmark)
+    suite.test_cases = [unit.test_case]
+    result, error = None, None
+    setups_before = dict(fixture_cache.setup_counts)
+    try:
+        result = suite.run(node_id, leak_detector, unit.methods, unit.shard, fixture_cache, capture=capture)
+    except Exception as e:
+        error = f"{type(e).__name__}: {str(e)}"
+    fixture_setups = {name: count - setups_before.get(name, 0)
+                      for name, count in fixture_cache.setup_counts.items()
+                      if count != setups_before.get(name, 0)}
+    return result, error, fixture_setups
+
+
+def worker_main(worker_id: str, node_id: str, suite_name: str, task_queue: Any, result_channel: Any,
+                policy: WorkerPolicy, leak_detector: Optional[LeakDetector] = None,
+                in_process: bool = False, ring_name: Optional[str] = None, wire: bool = False,
+                cpus: Optional[Tuple[int, ...]] = None, capture: Optional[CapturePolicy] = None) -> None:
+    """工作者主循环，在线程或子进程中运行
+
+    从任务队列获取工作单元并执行，每个工作单元完成后发送消息:
+    (worker_id, unit_id, result, error, retire_reason, stats)
+    retire_reason不为None时工作者随即退出
+
+    子进程工作者通过独占的管道发送结果，进程崩溃时不会影响其他工作者的通道；
+    线程工作者共用一个进程内队列。指定 ring_name 时，测试方法结果先写入共享内存
+    环形缓冲区，消息中只携带写入的条数 (stats["ring_results"])，缓冲区放不下的结果
+    仍随消息发送。wire 为True时工作单元和消息均使用二进制消息格式（见 wire 模块）编码
+
+    工作者执行的所有工作单元共享一个夹具缓存，工作者退出时销毁缓存中的夹具。
+    指定 cpus 时子进程工作者启动后绑定到这些CPU核心，capture 为测试输出的捕获策略
+    """
+    if cpus:
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            print(f"工作者 {worker_id}: 无法绑定CPU {list(cpus)}: {e}")
+    started_at = time.time()
+    tests_run = 0
+    fixture_cache = FixtureCache()
+    process = psutil.Process() if in_process else None
+    emit = result_channel.send if in_process else result_channel.put
+    ring = ResultRing.attach(ring_name) if ring_name else None
+    if wire:
+        encoder, decoder = WireEncoder(), WireDecoder()
+        emit = lambda message: result_channel.send_bytes(encoder.encode_frame([message]))
+
+    if leak_detector:
+        leak_detector.start()
+        leak_detector.reset_worker(worker_id)
+
+    while True:
+        unit = task_queue.get()
+        if unit is None:
+            break
+        if wire:
+            unit = decoder.decode_frame(unit)[0]
+
+        result, error, fixture_setups = run_unit(unit, node_id, suite_name, leak_detector, fixture_cache, capture)
+        if result is not None:
+            tests_run += len(result.results)
+            if leak_detector:
+                leak_detector.record(worker_id, result.results)
+
+        age = time.time() - started_at
+        rss = process.memory_info().rss if process else None
+        retire_reason = policy.check(tests_run, age, rss)
+        if retire_reason is None and leak_detector and leak_detector.is_over_budget(worker_id):
+            retire_reason = "memory_budget"
+
+        stats = {"pid": os.getpid(), "tests_run": tests_run, "age": age, "rss": rss,
+                 "fixture_setups": fixture_setups, "ring_results": 0}
+        if ring is not None and result is not None and result.results:
+            written = ring.write(result.results)
+            result.results = result.results[written:]
+            stats["ring_results"] = written
+        emit((worker_id, unit.unit_id, result, error, retire_reason, stats))
+        if retire_reason:
+            break
+
+    for fixture_error in fixture_cache.close():
+        print(f"工作者 {worker_id}: {fixture_error}")
+    if ring is not None:
+        ring.close()
+
+
+class WorkerHandle:
+    """工作者句柄，记录工作者所属节点与正在执行的工作单元"""
+
+    def __init__(self, worker_id: str, node_id: str, task_queue: Any, runnable: Any,
+                 result_reader: Any = None, ring: Optional[ResultRing] = None, wire: bool = False,
+                 placement: Optional[Placement] = None):
+        self.worker_id = worker_id
+        self.node_id = node_id
+        self.task_queue = task_queue
+        self.runnable = runnable
+        self.result_reader = result_reader
+        self.ring = ring
+        self.encoder = WireEncoder() if wire else None
+        self.decoder = WireDecoder() if wire else None
+        self.placement = placement  # 绑定的CPU核心，未绑定时为None
+        self.inflight: Optional[WorkUnit] = None
+        self.started_at = time.time()
+        self.state_since = self.started_at  # 开始执行当前工作单元或开始空闲的时间
+        self.busy_time = 0.0  # 执行工作单元的累计时间（秒）
+
+    def close_channels(self) -> None:
+        """关闭结果管道并释放共享内存"""
+        if self.result_reader is not None:
+            self.result_reader.close()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def is_alive(self) -> bool:
+        """工作者是否仍在运行"""
+        return self.runnable.is_alive()
+
+    @property
+    def utilization(self) -> float:
+        """工作者存活期间执行工作单元的时间占比"""
+        now = time.time()
+        busy = self.busy_time + (now - self.state_since if self.inflight is not None else 0.0)
+        return busy / max(now - self.started_at, 1e-9)
+
+
+class WorkerPool:
+    """工作者池，负责创建、通信和回收工作者"""
+
+    BACKENDS = ("thread", "process")
+    TRANSPORTS = ("pipe", "shm", "wire")
+
+    def __init__(self, backend: str = "thread", policy: Optional[WorkerPolicy] = None,
+                 leak_detector: Optional[LeakDetector] = None, suite_name: str = "",
+                 transport: str = "pipe", ring_size: int = DEFAULT_RING_SIZE,
+                 placer: Optional[CpuPlacer] = None, capture: Optional[CapturePolicy] = None):
+        """
+        Args:
+            backend: 执行后端，thread 或 process
+            policy: 工作者生命周期策略
+            leak_detector: 内存泄漏检测器，只支持process后端
+            suite_name: 测试套件名称
+            transport: 子进程工作者的结果通道，pipe (pickle序列化后经管道发送)、shm (共享内存环形缓冲区)
+                或 wire (二进制消息格式，工作单元同样以该格式发送)；线程后端的结果直接在进程内传递，忽略该参数
+            ring_size: 每个工作者的共享内存环形缓冲区大小（字节）
+            placer: 为子进程工作者分配绑定的CPU核心，只支持process后端
+            capture: 测试输出的捕获策略
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"不支持的执行后端: {backend}，可选值: {', '.join(self.BACKENDS)}")
+        if transport not in self.TRANSPORTS:
+            raise ValueError(f"不支持的结果通道: {transport}，可选值: {', '.join(self.TRANSPORTS)}")
+        if transport == "shm" and backend == "process":
+            try:
+                require_shared_memory()
+            except RuntimeError as e:
+                raise ValueError(str(e)) from None
+        if leak_detector is not None and backend != "process":
+            raise ValueError("tracemalloc统计整个进程的内存分配，内存泄漏检测只支持process后端")
+        if placer is not None and (backend != "process" or not hasattr(os, "sched_setaffinity")):
+            raise ValueError("CPU绑定只支持process后端，且需要平台支持 os.sched_setaffinity")
+
+        self.backend = backend
+        self.policy = policy or WorkerPolicy()
+        self.leak_detector = leak_detector
+        self.suite_name = suite_name
+        self.transport = transport if backend == "process" else "pipe"
+        self.ring_size = ring_size
+        self.placer = placer
+        self.capture = capture
+        self.workers: Dict[str, WorkerHandle] = {}
+        self._pending_messages: deque = deque()
+        self._incarnations: Dict[str, int] = {}
+
+        if backend == "process":
+            self._context = multiprocessing.get_context()
+            self.result_queue = None
+        else:
+            self._context = None
+            self.result_queue = queue.Queue()
+
+    def spawn(self, node_id: str, benchmark: bool = False) -> str:
+        """为节点启动一个新的工作者
+
+        Args:
+            node_id: 节点ID
+            benchmark: 工作者是否执行基准测试，绑定CPU时使用为基准测试保留的核心
+
+        Returns:
+            工作者ID
+        """
+        incarnation = self._incarnations.get(node_id, 0) + 1
+        self._incarnations[node_id] = incarnation
+        worker_id = f"{node_id}-w{incarnation}"
+
+        suite_name = f"{self.suite_name}-{node_id}"
+        placement = self.placer.assign(worker_id, benchmark) if self.placer else None
+        if self.backend == "process":
+            task_queue = self._context.Queue()
+            result_reader, result_writer = self._context.Pipe(duplex=False)
+            ring = ResultRing.create(self.ring_size) if self.transport == "shm" else None
+            args = (worker_id, node_id, suite_name, task_queue, result_writer,
+                    self.policy, self.leak_detector, True, ring.name if ring else None,
+                    self.transport == "wire", placement.cpus if placement else None, self.capture)
+            runnable = self._context.Process(target=worker_main, args=args, name=worker_id, daemon=True)
+            runnable.start()
+            # 关闭父进程中的写端，工作进程退出后读端才能收到EOF
+            result_writer.close()
+        else:
+            task_queue = queue.Queue()
+            result_reader, ring = None, None
+            args = (worker_id, node_id, suite_name, task_queue, self.result_queue,
+                    self.policy, self.leak_detector, False, None, False, None, self.capture)
+            runnable = threading.Thread(target=worker_main, args=args, name=worker_id, daemon=True)
+            runnable.start()
+
+        self.workers[worker_id] = WorkerHandle(worker_id, node_id, task_queue, runnable, result_reader, ring,
+                                               wire=self.transport == "wire", placement=placement)
+        return worker_id
+
+    def send(self, worker_id: str, unit: WorkUnit) -> None:
+        """向工作者派发工作单元"""
+        worker = self.workers[worker_id]
+        worker.inflight = unit
+        worker.state_since = time.time()
+        worker.task_queue.put(worker.encoder.encode_frame([unit]) if worker.encoder else unit)
+
+    def take_inflight(self, worker_id: str) -> Optional[WorkUnit]:
+        """取回工作者正在执行的工作单元"""
+        worker = self.workers[worker_id]
+        unit, worker.inflight = worker.inflight, None
+        if unit is not None:
+            now = time.time()
+            worker.busy_time += now - worker.state_since
+            worker.state_since = now
+        return unit
+
+    def stop(self, worker_id: str) -> None:
+        """通知工作者在空闲时退出"""
+        worker = self._remove(worker_id)
+        worker.task_queue.put(None)
+        worker.close_channels()
+
+    def cancel(self, worker_id: str) -> None:
+        """取消工作者正在执行的工作单元
+
+        子进程工作者被直接终止，其尚未读取的消息一并丢弃；线程无法被终止，线程工作者
+        从池中移除，执行完当前工作单元后退出，之后发送的消息被忽略
+        """
+        worker = self._remove(worker_id)
+        worker.task_queue.put(None)
+        if self.backend == "process":
+            worker.runnable.terminate()
+            worker.runnable.join(1.0)
+            self._pending_messages = deque(message for message in self._pending_messages
+                                           if message[0] != worker_id)
+        worker.close_channels()
+
+    def _remove(self, worker_id: str) -> WorkerHandle:
+        """从池中移除工作者并释放其绑定的CPU核心"""
+        if self.placer is not None:
+            self.placer.release(worker_id)
+        return self.workers.pop(worker_id)
+
+    def worker_of(self, unit: WorkUnit) -> Optional[str]:
+        """正在执行工作单元的工作者"""
+        return next((worker_id for worker_id, worker in self.workers.items() if worker.inflight is unit), None)
+
+    def retire(self, worker_id: str, timeout: float = 5.0) -> None:
+        """等待已自行退出（或崩溃）的工作者结束"""
+        worker = self._remove(worker_id)
+        worker.runnable.join(timeout)
+        worker.close_channels()
+
+    def get_message(self, timeout: Optional[float] = None) -> Optional[Tuple]:
+        """获取一条工作者消息，超时返回None"""
+        if self._pending_messages:
+            return self._pending_messages.popleft()
+        if self.backend == "process":
+            readers = {worker.result_reader: worker for worker in self.workers.values()}
+            for reader in multiprocessing.connection.wait(list(readers), timeout):
+                worker = readers[reader]
+                try:
+                    if worker.decoder is not None:
+                        # 一帧可能包含多条消息
+                        self._pending_messages.extend(worker.decoder.decode_frame(reader.recv_bytes()))
+                        return self._pending_messages.popleft()
+                    message = reader.recv()
+                except EOFError:
+                    # 工作进程已退出，由 find_dead_workers 处理
+                    continue
+                return self._collect_ring_results(worker, message)
+            return None
+        try:
+            if timeout == 0:
+                return self.result_queue.get_nowait()
+            return self.result_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _collect_ring_results(self, worker: WorkerHandle, message: Tuple) -> Tuple:
+        """从工作者的环形缓冲区读取消息对应的结果，放回工作单元结果的开头"""
+        result, stats = message[2], message[5]
+        count = stats.get("ring_results", 0)
+        if count and worker.ring is not None and result is not None:
+            result.results[:0] = worker.ring.read(count)
+            result.reindex()
+        return message
+
+    def find_dead_workers(self) -> List[str]:
+        """找出意外退出的工作者"""
+        return [worker_id for worker_id, worker in self.workers.items() if not worker.is_alive()]
+
+    def node_of(self, worker_id: str) -> str:
+        """获取工作者所属的节点ID"""
+        return self.workers[worker_id].node_id
+
+    def idle_workers(self, node_id: str) -> List[str]:
+        """节点上没有正在执行工作单元的工作者"""
+        return [worker_id for worker_id, worker in self.workers.items()
+                if worker.node_id == node_id and worker.inflight is None]
+
+    def node_workers(self, node_id: str) -> List[str]:
+        """节点上的所有工作者"""
+        return [worker_id for worker_id, worker in self.workers.items() if worker.node_id == node_id]
+
+    def inflight_count(self) -> int:
+        """正在执行中的工作单元数量"""
+        return sum(1 for worker in self.workers.values() if worker.inflight is not None)
+
+    def has_workers(self) -> bool:
+        """是否还有运行中的工作者"""
+        return bool(self.workers)
+
+    def shutdown(self) -> None:
+        """关闭所有工作者"""
+        for worker_id in list(self.workers.keys()):
+            worker = self.workers[worker_id]
+            self.stop(worker_id)
+            if self.backend == "process" and worker.is_alive():
+                worker.runnable.join(1.0)
+                if worker.is_alive():
+                    worker.runnable.terminate()
@@ -0,0 +1,65 @@
+"""
+框架自身性能基准
+使用合成测试用例测量框架在调度、结果处理和报告生成上的开销: python -m disttest.selfbench
+"""
+import argparse
+from typing import List, Optional
+
+from .suite import SelfBenchmark
+
+__all__ = ['SelfBenchmark', 'main']
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """disttest selfbench 子命令入口
+
+    Args:
+        argv: 命令行参数
+    """
+    parser = argparse.ArgumentParser(prog="disttest selfbench", description="测量框架自身的性能开销")
+    parser.add_argument("--tests", type=int, default=2000, help="合成测试方法总数 [默认: 2000]")
+    parser.add_argument("--classes", type=int, default=20, help="合成测试用例类数量 [默认: 20]")
+    parser.add_argument("--nodes", type=int, default=4, help="分布式测量的节点数量 [默认: 4]")
+    parser.add_argument("--backends", nargs="+", choices=SelfBenchmark.BACKENDS, default=list(SelfBenchmark.BACKENDS),
+                        help="需要测量的执行后端 [默认: thread process]")
+    parser.add_argument("--repeat", type=int, default=3, help="每项测量的重复次数 [默认: 3]")
+    parser.add_argument("--plugins", type=int, default=10, help="插件分发测量中的插件数量 [默认: 10]")
+    parser.add_argument("--output", default=None, help="结果文件路径 [默认: selfbench_<时间戳>.json]")
+    args = parser.parse_args(argv)
+
+    bench = SelfBenchmark(tests=args.tests, classes=args.classes, nodes=args.nodes,
+                          backends=tuple(args.backends), repeat=args.repeat, plugins=args.plugins)
+    print(f"开始测量框架开销: {args.tests} 个合成测试方法, {args.classes} 个类, 每项重复 {args.repeat} 次...")
+    results = bench.run()
+
+    print(f"测试发现: {results['discovery']['median'] * 1000:.2f} ms "
+          f"({results['discovery']['per_test_us']:.2f} μs/测试)")
+    for name, backends in results.items():
+        if not name.startswith("execution_"):
+            continue
+        for backend, timing in backends.items():
+            efficiency = f"{timing['efficiency'] * 100:.1f}%" if timing["efficiency"] is not None else "-"
+            print(f"{name[len('execution_'):]:<10} {backend:<8} 总耗时: {timing['median']:.3f} s  "
+                  f"{timing['per_test_us']:.1f} μs/测试  框架开销: {timing['overhead_per_test_us']:.1f} μs/测试  "
+                  f"并行效率: {efficiency}")
+    result_ops = results["result_ops"]
+    print(f"TestResult.merge: {result_ops['merge']['per_result_us']:.2f} μs/结果, "
+          f"get_summary: {result_ops['get_summary']['per_result_us']:.2f} μs/结果")
+    print(f"插件分发: {results['plugin_dispatch']['per_event_us']:.2f} μs/事件")
+    serialization = results["serialization"]
+    for name in ("pickle", "json", "wire", "wire_zlib"):
+        timing = serialization[name]
+        print(f"消息格式 {name:<10} 编码: {timing['encode_us']:.2f} μs/结果  解码: {timing['decode_us']:.2f} μs/结果  "
+              f"大小: {timing['bytes_per_result']:.0f} 字节/结果")
+    if "transport" in results:
+        transport = results["transport"]
+        print(f"结果通道 ({transport['results']} 个结果): " + ", ".join(
+            f"{name} {transport[name]['results_per_sec']:,.0f} 结果/秒" for name in ("pipe", "shm")))
+    coordinator = results["coordinator"]
+    print(f"远程协调器 ({coordinator['workers']} 个模拟工作者): 注册耗时 {coordinator['registration_median_s']:.2f} s, "
+          f"派发 {coordinator['units_per_sec_median']:,.0f} 工作单元/秒")
+    for name, timing in results["reports"].items():
+        print(f"报告生成 {name}: {timing['median'] * 1000:.1f} ms")
+
+    path = bench.write(args.output)
+    print(f"结果已写入: {path}")
@@ -0,0 +1,471 @@
+"""
+SelfBenchmark类 - 框架自身性能基准
+使用合成测试用例测量发现、调度、结果合并、插件分发和报告生成的开销
+"""
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import pickle
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .. import __version__
+from ..core import TestSuite, TestResult
+from ..core.test_result import TestMethodResult
+from ..plugins import PluginBase, HTMLReportPlugin, JSONLoggerPlugin
+from ..runner import TestRunner
+from ..runner.coordinator import DEFAULT_MAX_FRAME_BYTES, Coordinator, _pack_frame, _read_frame
+from ..runner.scheduler import Scheduler
+from ..runner.shm_channel import ResultRing, require_shared_memory
+from ..runner.wire import WireDecoder, WireEncoder
+from . import synthetic
+
+# 结果通道测量中每条消息携带的结果数（相当于一个工作单元）
+TRANSPORT_BATCH = 100
+
+
+class _NoopPlugin(PluginBase):
+    """不做任何处理的插件，用于测量插件分发本身的开销"""
+
+
+def _result_to_json(result: TestResult) -> str:
+    """按JSON日志的字段序列化工作单元结果"""
+    return json.dumps({
+        "node_id": result.node_id,
+        "results": [{
+            "method_name": method_result.method_name,
+            "class_name": method_result.class_name,
+            "module": method_result.module,
+            "success": method_result.success,
+            "error_message": method_result.error_message,
+            "execution_time": method_result.execution_time,
+            "start_time": method_result.start_time.isoformat(),
+            "additional_data": method_result.additional_data,
+            "timings": method_result.timings,
+        } for method_result in result.results],
+    }, ensure_ascii=False)
+
+
+def _result_from_json(data: str) -> TestResult:
+    """_result_to_json 的逆过程"""
+    payload = json.loads(data)
+    result = TestResult()
+    result.node_id = payload["node_id"]
+    for item in payload["results"]:
+        item["start_time"] = datetime.fromisoformat(item["start_time"])
+        result.add_result(TestMethodResult(**item))
+    return result
+
+
+def _transport_producer(results: List[TestMethodResult], writer, ring_name: Optional[str], start) -> None:
+    """结果通道测量的工作进程：按批发送预先生成的结果，与工作者发送工作单元结果的方式相同"""
+    ring = ResultRing.attach(ring_name) if ring_name else None
+    start.wait()
+    for offset in range(0, len(results), TRANSPORT_BATCH):
+        batch = results[offset:offset + TRANSPORT_BATCH]
+        written = ring.write(batch) if ring else 0
+        writer.send((written, batch[written:]))
+    writer.close()
+    if ring:
+        ring.close()
+
+
+async def _simulated_worker(host: str, port: int, worker_id: str, result: TestResult) -> int:
+    """协调器测量中的模拟工作者：注册后对每个工作单元立即返回预先构造的结果"""
+    reader, writer = await asyncio.open_connection(host, port)
+    encoder, decoder = WireEncoder(), WireDecoder()
+    writer.write(_pack_frame(encoder, ("register", worker_id, {"host": "selfbench", "pid": os.getpid()})))
+    units = 0
+    try:
+        while True:
+            message = await _read_frame(reader, decoder, DEFAULT_MAX_FRAME_BYTES)
+            if message[0] == "stop":
+                break
+            if message[0] == "unit":
+                units += 1
+                writer.write(_pack_frame(encoder, ("result", message[1].unit_id, result, None,
+                                                   {"fixture_setups": {}})))
+                await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    writer.close()
+    return units
+
+
+class SelfBenchmark:
+    """框架自身性能基准
+
+    每项测量重复 repeat 次，记录最小值与中位数。执行过程中框架自身的控制台输出
+    会被屏蔽，结果写入JSON文件，便于在不同框架版本之间比较
+    """
+
+    BACKENDS = ("thread", "process")
+
+    def __init__(self, tests: int = 2000, classes: int = 20, nodes: int = 4,
+                 backends: Tuple[str, ...] = BACKENDS, repeat: int = 3, plugins: int = 10):
+        """
+        Args:
+            tests: 每项测量使用的合成测试方法总数
+            classes: 合成测试用例类数量
+            nodes: 分布式测量使用的节点数
+            backends: 需要测量的执行后端
+            repeat: 每项测量的重复次数
+            plugins: 插件分发测量中注册的空插件数量
+        """
+        self.tests = tests
+        self.classes = classes
+        self.nodes = nodes
+        self.backends = tuple(backends)
+        self.repeat = max(1, repeat)
+        self.plugins = plugins
+        self.results: Dict[str, Any] = {}
+
+    def _measure(self, func: Callable[[], Any]) -> Dict[str, float]:
+        """重复执行并统计耗时（秒）"""
+        samples = []
+        for _ in range(self.repeat):
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                func()
+                samples.append(time.perf_counter() - start)
+        return {"min": min(samples), "median": statistics.median(samples)}
+
+    def _runner(self, profile: str) -> TestRunner:
+        """创建加载了合成测试用例的运行器"""
+        runner = TestRunner()
+        runner.add_test_cases(synthetic.make_classes(profile, self.tests, self.classes))
+        return runner
+
+    def _make_result(self, count: int, failures: bool = False) -> TestResult:
+        """构造包含 count 个测试方法结果的TestResult"""
+        result = TestResult()
+        error = "AssertionError: 合成失败\n" + "  File \"synthetic.py\", line 1, in _recurse\n" * 40
+        for index in range(count):
+            failed = failures and index % 2 == 0
+            result.add_result(TestMethodResult(
+                method_name=f"test_{index:06d}",
+                success=not failed,
+                error_message=error if failed else None,
+                execution_time=0.001,
+                class_name=f"Synthetic_{index % self.classes}",
+            ))
+        result.set_complete()
+        return result
+
+    def measure_discovery(self) -> Dict[str, Any]:
+        """测试发现：生成测试用例类、枚举测试方法并加入套件"""
+        def discover():
+            synthetic._CLASSES.clear()
+            suite = TestSuite()
+            suite.add_test_cases(synthetic.make_classes("noop", self.tests, self.classes))
+            suite.get_total_method_count()
+
+        timing = self._measure(discover)
+        timing["per_test_us"] = timing["median"] / self.tests * 1e6
+        return timing
+
+    def measure_execution(self, profile: str, backend: str) -> Dict[str, Any]:
+        """执行一组合成测试，统计每个测试的调度开销
+
+        框架开销按 (总耗时 - 测试方法执行时间之和 / 并行节点数) / 测试数 估算；
+        负载均衡效率为理想完成时间与实际总耗时之比
+        """
+        executed: List[TestResult] = []
+
+        def execute():
+            runner = self._runner(profile)
+            if backend == "local":
+                executed.append(runner.run_local())
+            else:
+                executed.append(runner.run_distributed(nodes=self.nodes, executor=backend))
+
+        timing = self._measure(execute)
+        result = executed[-1]
+        count = len(result.results) or 1
+        parallelism = 1 if backend == "local" else min(self.nodes, self.classes)
+        ideal = sum(method_result.execution_time for method_result in result.results) / parallelism
+        timing.update({
+            "tests": len(result.results),
+            "per_test_us": timing["median"] / count * 1e6,
+            "overhead_per_test_us": max(0.0, timing["median"] - ideal) / count * 1e6,
+            "efficiency": ideal / timing["median"] if timing["median"] > 0 else None,
+        })
+        return timing
+
+    def measure_result_ops(self) -> Dict[str, Any]:
+        """TestResult.merge 与 get_summary 的开销"""
+        chunk_size = max(1, self.tests // self.classes)
+        merged = self._make_result(self.tests)
+        chunks = []
+        for offset in range(0, self.tests, chunk_size):
+            chunk = TestResult()
+            for method_result in merged.results[offset:offset + chunk_size]:
+                chunk.add_result(method_result)
+            chunks.append(chunk)
+
+        def merge():
+            target = TestResult()
+            for chunk in chunks:
+                target.merge(chunk)
+
+        merge_timing = self._measure(merge)
+        summary_timing = self._measure(merged.get_summary)
+        return {
+            "merge": dict(merge_timing, per_result_us=merge_timing["median"] / self.tests * 1e6),
+            "get_summary": dict(summary_timing, per_result_us=summary_timing["median"] / self.tests * 1e6),
+        }
+
+    def measure_plugin_dispatch(self) -> Dict[str, Any]:
+        """插件事件分发开销：每个工作单元结果向所有插件逐个触发测试方法完成事件"""
+        runner = TestRunner()
+        for _ in range(self.plugins):
+            runner.add_plugin(_NoopPlugin())
+        result = self._make_result(self.tests)
+
+        timing = self._measure(lambda: runner._notify_unit_complete("selfbench", result))
+        events = self.tests * self.plugins
+        timing.update({"plugins": self.plugins, "per_event_us": timing["median"] / max(1, events) * 1e6})
+        return timing
+
+    def measure_transport(self, count: int = 50000) -> Dict[str, Any]:
+        """子进程工作者向主控节点传递结果的吞吐量：管道 (pipe) 与共享内存环形缓冲区 (shm)
+
+        从工作进程开始发送到主控节点得到全部结果对象为止计时，结果中一部分带有较长的错误堆栈
+        """
+        context = multiprocessing.get_context()
+        results = self._transport_results(count)
+        
+        timings = {}
+        transports = ["pipe", "shm"]
+        try:
+            require_shared_memory()
+        except RuntimeError:
+            transports.remove("shm")
+        for transport in transports:
+            samples = []
+            for _ in range(self.repeat):
+                ring = ResultRing.create() if transport == "shm" else None
+                reader, writer = context.Pipe(duplex=False)
+                start = context.Event()
+                process = context.Process(target=_transport_producer,
+                                          args=(results, writer, ring.name if ring else None, start))
+                process.start()
+                writer.close()
+                
+                received = 0
+                started = time.perf_counter()
+                start.set()
+                while received < count:
+                    written, rest = reader.recv()
+                    if written:
+                        received += len(ring.read(written))
+                    received += len(rest)
+                samples.append(time.perf_counter() - started)
+                
+                process.join()
+                reader.close()
+                if ring:
+                    ring.close()
+            median = statistics.median(samples)
+            timings[transport] = {
+                "min": min(samples),
+                "median": median,
+                "results_per_sec": count / median if median > 0 else None,
+            }
+        timings["results"] = count
+        return timings
+
+    def _transport_results(self, count: int) -> List[TestMethodResult]:
+        """结果通道与消息格式测量使用的结果：每10个中有1个带不同的较长错误堆栈"""
+        results = self._make_result(count, failures=True).results
+        now = time.time()
+        for index, method_result in enumerate(results):
+            if index % 10:
+                method_result.error_message = None
+                method_result.success = True
+            else:
+                method_result.error_message = f"{method_result.error_message}\n#{index}"
+            method_result.timings = {"setup": now, "call": now + 0.0001, "teardown": now + 0.0009, "end": now + 0.001}
+        return results
+
+    def measure_serialization(self, count: int = 50000) -> Dict[str, Any]:
+        """工作单元结果在 pickle、JSON 与二进制消息格式 (wire) 下的编码、解码耗时与大小
+
+        结果按每 TRANSPORT_BATCH 个一组组成工作单元结果，wire 格式在同一数据流中连续编码
+        """
+        results = self._transport_results(count)
+        messages = []
+        for offset in range(0, count, TRANSPORT_BATCH):
+            message = TestResult()
+            message.node_id = "selfbench"
+            for method_result in results[offset:offset + TRANSPORT_BATCH]:
+                message.add_result(method_result)
+            messages.append(message)
+
+        def wire_codec(compress_threshold: Optional[int]) -> Tuple[Callable, Callable]:
+            encoder, decoder = WireEncoder(compress_threshold), WireDecoder()
+            return (lambda message: encoder.encode_frame([message]),
+                    lambda frame: decoder.decode_frame(frame)[0])
+
+        codecs = {
+            "pickle": lambda: (lambda message: pickle.dumps(message, pickle.HIGHEST_PROTOCOL), pickle.loads),
+            "json": lambda: (_result_to_json, _result_from_json),
+            "wire": lambda: wire_codec(None),
+            "wire_zlib": lambda: wire_codec(0),
+        }
+        timings = {}
+        for name, factory in codecs.items():
+            encode_samples, decode_samples = [], []
+            for _ in range(self.repeat):
+                encode, decode = factory()
+                start = time.perf_counter()
+                encoded = [encode(message) for message in messages]
+                encode_samples.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                for data in encoded:
+                    decode(data)
+                decode_samples.append(time.perf_counter() - start)
+            size = sum(len(data) for data in encoded)
+            timings[name] = {
+                "encode_us": statistics.median(encode_samples) / count * 1e6,
+                "decode_us": statistics.median(decode_samples) / count * 1e6,
+                "bytes_per_result": size / count,
+            }
+        timings["results"] = count
+        return timings
+
+    def measure_coordinator(self, workers: int = 1000, units_per_worker: int = 5) -> Dict[str, Any]:
+        """远程协调器的注册耗时与派发吞吐量
+
+        在同一进程的事件循环中模拟 workers 个工作者连接协调器，每个工作单元立即返回结果，
+        测得的是协调器本身（连接处理、编解码、调度）的开销。工作者数量受打开文件数上限限制
+        """
+        soft_limit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+        if soft_limit != resource.RLIM_INFINITY:
+            workers = max(1, min(workers, (soft_limit - 128) // 2))
+        units = workers * units_per_worker
+        test_cases = synthetic.make_classes("noop", units, units)
+        result = self._make_result(1)
+
+        async def simulate() -> Dict[str, Any]:
+            node_id = "selfbench"
+            unlimited = {"cpu": None, "memory": None}
+            coordinator = Coordinator(Scheduler({node_id: test_cases}, capacities={node_id: unlimited}), node_id,
+                                      heartbeat_timeout=60.0)
+            marks: Dict[str, float] = {}
+            tasks = []
+
+            async def launch(address: Tuple[str, int]) -> None:
+                marks["start"] = time.perf_counter()
+                tasks.extend(asyncio.create_task(_simulated_worker(address[0], address[1], f"sim-{index}", result))
+                             for index in range(workers))
+                await coordinator.wait_for_workers(workers, 60)
+                marks["registered"] = time.perf_counter()
+
+            completed = await coordinator.serve(workers, timeout=120, ready=launch)
+            finished = time.perf_counter()
+            handled = sum(await asyncio.gather(*tasks))
+            dispatch_time = finished - marks["registered"]
+            return {
+                "completed": completed,
+                "registration_s": marks["registered"] - marks["start"],
+                "dispatch_s": dispatch_time,
+                "units": handled,
+                "units_per_sec": handled / dispatch_time if dispatch_time > 0 else None,
+            }
+
+        samples = []
+        for _ in range(self.repeat):
+            with contextlib.redirect_stdout(io.StringIO()):
+                samples.append(asyncio.run(simulate()))
+        timing = min(samples, key=lambda sample: sample["dispatch_s"])
+        timing.update({
+            "workers": workers,
+            "registration_median_s": statistics.median(sample["registration_s"] for sample in samples),
+            "units_per_sec_median": statistics.median(sample["units_per_sec"] or 0 for sample in samples),
+        })
+        return timing
+
+    def measure_reports(self) -> Dict[str, Any]:
+        """报告生成耗时，一半结果带有较长的错误堆栈"""
+        result = self._make_result(self.tests, failures=True)
+        suite = TestSuite("selfbench")
+        runner = TestRunner()
+        timings = {}
+        with tempfile.TemporaryDirectory() as output_dir:
+            factories = {
+                "html_single": lambda: HTMLReportPlugin(output_dir=output_dir),
+                "html_paged": lambda: HTMLReportPlugin(output_dir=output_dir, paged=True),
+                "json_log": lambda: JSONLoggerPlugin(log_dir=output_dir),
+            }
+            for name, factory in factories.items():
+                def generate():
+                    plugin = factory()
+                    plugin.setup(runner)
+                    plugin.on_test_run_start(suite)
+                    plugin.on_test_run_complete(result)
+                timings[name] = self._measure(generate)
+        return timings
+
+    def run(self) -> Dict[str, Any]:
+        """执行所有测量
+
+        Returns:
+            测量结果
+        """
+        results: Dict[str, Any] = {"discovery": self.measure_discovery()}
+        for profile in synthetic.PROFILES:
+            results[f"execution_{profile}"] = {
+                backend: self.measure_execution(profile, backend) for backend in ("local",) + self.backends
+            }
+        results["result_ops"] = self.measure_result_ops()
+        results["plugin_dispatch"] = self.measure_plugin_dispatch()
+        results["serialization"] = self.measure_serialization()
+        if "process" in self.backends:
+            results["transport"] = self.measure_transport()
+        results["coordinator"] = self.measure_coordinator()
+        results["reports"] = self.measure_reports()
+        self.results = results
+        return results
+
+    def to_dict(self) -> Dict[str, Any]:
+        """带有环境信息的完整结果"""
+        return {
+            "framework_version": __version__,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": datetime.now().isoformat(),
+            "parameters": {
+                "tests": self.tests,
+                "classes": self.classes,
+                "nodes": self.nodes,
+                "backends": list(self.backends),
+                "repeat": self.repeat,
+                "plugins": self.plugins,
+            },
+            "results": self.results,
+        }
+
+    def write(self, path: Optional[str] = None) -> str:
+        """将结果写入JSON文件
+
+        Returns:
+            文件路径
+        """
+        path = path or f"selfbench_{int(time.time())}.json"
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        return path
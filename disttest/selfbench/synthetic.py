@@ -0,0 +1,103 @@
+"""
+合成测试用例
+按名称确定性地生成 TestCase 子类，用于测量框架自身的开销
+
+类名编码了生成参数（例如 Synthetic_noop_100_3 表示 noop 类型、100 个方法、序号 3），
+模块级 __getattr__ 会按类名重新生成类，因此子进程工作者在反序列化工作单元时，
+无论使用 fork 还是 spawn 启动方式都能找到对应的类
+"""
+import time
+from typing import Callable, Dict, List, Type
+
+from ..core import TestCase
+
+PROFILES = ("noop", "skewed", "traceback")
+
+# 已生成的类，按类名缓存
+_CLASSES: Dict[str, Type[TestCase]] = {}
+
+# skewed 类型中，每 SKEW_PERIOD 个方法有一个慢方法
+SKEW_PERIOD = 20
+SKEW_SLOW_TIME = 0.01
+
+# traceback 类型中失败方法的递归深度
+TRACEBACK_DEPTH = 40
+
+
+def _noop(self) -> None:
+    pass
+
+
+def _make_sleep(seconds: float) -> Callable:
+    def method(self) -> None:
+        time.sleep(seconds)
+    return method
+
+
+def _recurse(depth: int) -> None:
+    if depth <= 0:
+        raise AssertionError("合成失败: " + "x" * 2000)
+    _recurse(depth - 1)
+
+
+def _deep_failure(self) -> None:
+    _recurse(TRACEBACK_DEPTH)
+
+
+def _method_for(profile: str, index: int) -> Callable:
+    """生成第 index 个测试方法"""
+    if profile == "skewed":
+        return _make_sleep(SKEW_SLOW_TIME if index % SKEW_PERIOD == 0 else 0.0)
+    if profile == "traceback":
+        return _deep_failure if index % 2 == 0 else _noop
+    return _noop
+
+
+def class_name(profile: str, methods: int, index: int) -> str:
+    """合成测试用例类的类名"""
+    return f"Synthetic_{profile}_{methods}_{index}"
+
+
+def make_class(profile: str, methods: int, index: int) -> Type[TestCase]:
+    """生成（或从缓存获取）一个合成测试用例类
+
+    Args:
+        profile: 类型，noop（空方法）、skewed（少数方法明显更慢）或 traceback（一半方法以深调用栈失败）
+        methods: 测试方法数量
+        index: 类序号
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"不支持的合成类型: {profile}，可选值: {', '.join(PROFILES)}")
+    name = class_name(profile, methods, index)
+    cls = _CLASSES.get(name)
+    if cls is None:
+        # 方法名包含类序号，各类之间不重名
+        namespace = {f"test_{index}_{number:05d}": _method_for(profile, number) for number in range(methods)}
+        namespace["__module__"] = __name__
+        namespace["__qualname__"] = name
+        cls = type(name, (TestCase,), namespace)
+        _CLASSES[name] = cls
+    return cls
+
+
+def make_classes(profile: str, total_methods: int, classes: int) -> List[Type[TestCase]]:
+    """生成一组合成测试用例类，测试方法平均分配到各个类
+
+    Args:
+        profile: 类型
+        total_methods: 测试方法总数
+        classes: 类数量
+    """
+    per_class = max(1, total_methods // classes)
+    return [make_class(profile, per_class, index) for index in range(classes)]
+
+
+def __getattr__(name: str) -> Type[TestCase]:
+    # 供pickle按名称查找合成类
+    parts = name.split("_")
+    if len(parts) == 4 and parts[0] == "Synthetic" and parts[1] in PROFILES:
+        try:
+            return make_class(parts[1], int(parts[2]), int(parts[3]))
+        except ValueError:
+            pass
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")